@@ -0,0 +1,90 @@
+import os
+import yaml
+from agent import DEFAULT_PROFILE_DIR
+from pacing import Pacer
+
+## Default pacing for a WhatsApp account
+# EN: Same 1-4 minute gap the single runner uses, plus an hourly cap
+# ES: El mismo intervalo de 1 a 4 minutos del modo simple, más un límite por hora
+DEFAULT_MIN_INTERVAL = 60
+DEFAULT_MAX_INTERVAL = 240
+DEFAULT_MAX_PER_HOUR = 30
+
+## A WhatsApp account bound to its own Chrome profile
+# EN: Each worker sends from one account and respects that account's own send rate
+# ES: Cada worker envía desde una cuenta y respeta el ritmo de envío de esa cuenta
+class Account:
+    """A WhatsApp account with its Chrome profile and send-rate limits"""
+
+    def __init__(self, name, profile_dir, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, max_per_hour=DEFAULT_MAX_PER_HOUR):
+        self.name = name
+        self.profile_dir = os.path.expanduser(profile_dir)
+        # Several workers share one terminal, so account waits are never interactive
+        self.pacer = Pacer(min_interval, max_interval, max_per_hour=max_per_hour, interactive=False)
+        self.busy = False           # A contact is being processed on this account
+        self.retired = False        # Stop after the current contact (the worker pool was resized down)
+
+    def record_send(self):
+        """Register a send made from this account"""
+        self.pacer.record_send()
+
+    def seconds_until_ready(self):
+        """How long this account has to wait before its next send"""
+        return self.pacer.seconds_until_ready()
+
+    async def wait_turn(self):
+        # EN: Wait (without blocking other workers) until this account may send again
+        # ES: Espera (sin bloquear a los demás workers) hasta que esta cuenta pueda volver a enviar
+        """Wait until the account's rate limits allow another send"""
+        return await self.pacer.wait_turn(f"before next contact on {self.name}")
+
+    def __repr__(self):
+        return f"Account({self.name!r}, {self.profile_dir!r})"
+
+
+def load_accounts(path=None, workers=None, profile_dir=None, min_interval=None, max_interval=None,
+                  max_per_hour=None):
+    """
+    Load accounts from a YAML file, or create one account per worker with its own profile
+    Carga las cuentas desde un archivo YAML, o crea una cuenta por worker con su propio perfil
+
+    accounts.yml:
+        accounts:
+          - name: flor-es
+            profile_dir: ~/.chrome-automator/flor-es
+            min_interval: 60
+            max_interval: 240
+            max_per_hour: 30
+
+    min_interval / max_interval / max_per_hour replace the defaults (e.g. from the command line);
+    values set in the YAML still win.
+    """
+    defaults = {
+        'min_interval': DEFAULT_MIN_INTERVAL if min_interval is None else min_interval,
+        'max_interval': DEFAULT_MAX_INTERVAL if max_interval is None else max_interval,
+        'max_per_hour': DEFAULT_MAX_PER_HOUR if max_per_hour is None else max_per_hour,
+    }
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Accounts file not found: {path}")
+        with open(path, 'r') as f:
+            entries = (yaml.safe_load(f) or {}).get('accounts') or []
+        if not entries:
+            raise ValueError(f"No accounts defined in {path}")
+        accounts = []
+        for index, entry in enumerate(entries):
+            name = entry.get('name') or f"account-{index + 1}"
+            accounts.append(Account(
+                name=name,
+                profile_dir=entry.get('profile_dir') or f"{profile_dir or DEFAULT_PROFILE_DIR}-{name}",
+                min_interval=entry.get('min_interval', defaults['min_interval']),
+                max_interval=entry.get('max_interval', defaults['max_interval']),
+                max_per_hour=entry.get('max_per_hour', defaults['max_per_hour']),
+            ))
+        return accounts[:workers] if workers and workers < len(accounts) else accounts
+
+    workers = workers or 1
+    base_dir = profile_dir or os.getenv("CHROME_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+    return [Account(name=f"worker-{index + 1}", profile_dir=f"{base_dir}-{index + 1}", **defaults)
+            for index in range(workers)]
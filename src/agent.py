@@ -1,10 +1,17 @@
-from langchain_openai import ChatOpenAI
-from browser_use import Agent, BrowserConfig, Browser
+# browser_use (and the playwright and langchain stacks under it) is imported where a browser or an
+# agent is built, so starting the runner, --check and an empty queue never pay for it
+from whatsapp import (whatsapp_url, WHATSAPP_SELECTORS, run_action, open_chat, message_in_chat, page_fingerprint,
+                      phone_digits, ScriptedStepError, InvalidNumberError)
+from llm import get_registry
+from metrics import get_metrics
+from transcripts import get_conversation_log
+from dom_diet import DomDiet
+from routing import ModelRouter
+from plans import get_plan_cache, plan_key, REPLAY_DELAY
 import asyncio
-from pydantic import SecretStr
 import os
 import platform
-import requests
+from collections import deque
 
 ## Dictionary mapping operating systems to Chrome binary paths
 # EN: Maps each OS to the default Chrome executable path
@@ -29,15 +36,68 @@ SYSTEM_MAP = {
     'linux2': 'linux',       # Alternative Linux name
 }
 
+def detect_system():
+    # EN: Normalize platform.system() to one of the CHROME_PATHS keys
+    # ES: Normaliza platform.system() a una de las claves de CHROME_PATHS
+    """Return the normalized name of the current operating system"""
+    raw_system = platform.system().lower()
+    system = SYSTEM_MAP.get(raw_system)
+    if not system:
+        raise OSError(f"Unsupported operating system: {raw_system}. Please add it to SYSTEM_MAP.")
+    return system
+
+def chrome_executable(system=None):
+    """Chrome binary to launch: CHROME_EXECUTABLE, or the CHROME_PATHS entry of this system"""
+    return os.getenv("CHROME_EXECUTABLE") or CHROME_PATHS.get(system or detect_system())
+
+## Defaults for the persistent (warm) browser session
+# EN: Where the Chrome profile lives and how many contacts a session serves before recycling
+# ES: Dónde vive el perfil de Chrome y cuántos contactos atiende una sesión antes de reciclarse
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".chrome-automator", "profile")
+DEFAULT_RECYCLE_AFTER = 50
+DEFAULT_HISTORY_KEEP = 20       # Summaries of finished contacts kept on the agent (AGENT_HISTORY_KEEP)
+SUMMARY_TEXT_LIMIT = 200
+
+
+def summarize_history(history):
+    """A few fields of a browser_use AgentHistoryList that are worth keeping after the contact"""
+    if history is None:
+        return {'steps': 0, 'done': None, 'errors': 0, 'final_result': None}
+    final_result = history.final_result()
+    return {
+        'steps': len(getattr(history, 'history', None) or []),
+        'done': history.is_done(),
+        'errors': sum(1 for error in history.errors() if error),
+        'final_result': final_result[:SUMMARY_TEXT_LIMIT] if final_result else None,
+    }
+
 ## Main agent class for browser automation
 # EN: This class controls the browser and LLM for WhatsApp automation
 # ES: Esta clase controla el navegador y el LLM para la automatización de WhatsApp
 class BrowserAgent:
-    def __init__(self, name="Flor", on_complete=None):
+    def __init__(self, name="Flor", on_complete=None, persistent=False, profile_dir=None, recycle_after=None, dom_diet=None):
         # EN: Initialize the agent with name and completion callback
         # ES: Inicializa el agente con nombre y callback de finalización
         self.name = name
         self.on_complete = on_complete
+
+        # EN: Persistent mode keeps one logged-in WhatsApp tab open across contacts
+        # ES: El modo persistente mantiene una pestaña de WhatsApp abierta entre contactos
+        self.persistent = persistent
+        self.profile_dir = profile_dir or os.getenv("CHROME_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        self.recycle_after = int(recycle_after or os.getenv("SESSION_RECYCLE_AFTER", DEFAULT_RECYCLE_AFTER))
+        self.contacts_served = 0
+        self.fault_detected = False
+        self.context = None
+        self.history = None
+        self.last_path = None
+        self.prepared_chat = None     # Digits of the chat pre-opened for the next contact (see prefetch.py)
+        # Finished contacts keep only a compact summary, so a days-long run does not hold every history
+        self.recent_runs = deque(maxlen=int(os.getenv("AGENT_HISTORY_KEEP", DEFAULT_HISTORY_KEEP)))
+
+        # EN: WhatsApp-aware DOM pruning for the LLM agent's prompt (off, measure, on or report)
+        # ES: Recorte del DOM de WhatsApp para el prompt del agente LLM (off, measure, on o report)
+        self.dom_diet = DomDiet(dom_diet)
         
         # Try to initialize LLM with available API keys
         # EN: Try to initialize the LLM (AI model) with available API keys
@@ -49,24 +109,31 @@ class BrowserAgent:
         # Detect and normalize system
         # EN: Detect and normalize the operating system
         # ES: Detecta y normaliza el sistema operativo
-        raw_system = platform.system().lower()
-        self.system = SYSTEM_MAP.get(raw_system)
-        if not self.system:
-            raise OSError(f"Unsupported operating system: {raw_system}. Please add it to SYSTEM_MAP.")
+        self.system = detect_system()
         
         # Get the appropriate Chrome path based on the system
         # EN: Get the Chrome executable path for the current OS
         # ES: Obtiene la ruta del ejecutable de Chrome para el sistema actual
-        chrome_path = CHROME_PATHS.get(self.system)
+        chrome_path = chrome_executable(self.system)
         if not chrome_path:
             raise OSError(f"Chrome path not configured for system: {self.system}. Please add it to CHROME_PATHS.")
         
         # EN: Configure the browser for WhatsApp automation
         # ES: Configura el navegador para la automatización de WhatsApp
+        extra_browser_args = []
+        if self.persistent:
+            # EN: Reuse the same Chrome profile so WhatsApp stays linked between runs
+            # ES: Reutiliza el mismo perfil de Chrome para que WhatsApp siga vinculado entre ejecuciones
+            os.makedirs(self.profile_dir, exist_ok=True)
+            extra_browser_args.append(f"--user-data-dir={self.profile_dir}")
+
+        from browser_use import BrowserConfig, Browser
         self.b_config = BrowserConfig(
             browser_binary_path=chrome_path,
+            extra_browser_args=extra_browser_args,
+            keep_alive=self.persistent,
             initial_urls=[
-                "https://web.whatsapp.com/"
+                whatsapp_url()
             ],
             system_prompt="""You are a WhatsApp automation agent. Follow these instructions exactly:
             1. When opening WhatsApp Web, wait for the QR code or chat interface to load
@@ -77,7 +144,7 @@ class BrowserAgent:
                  * Click inside the input box
                  * Type the entire message as a single block
                - Only when the full message is ready, click the send button (paper plane icon) ONCE
-               - Wait to see double checkmarks (✓✓) before proceeding
+               - Once the message appears in the chat, move on; delivery (✓✓) is confirmed separately
             4. Never send a message in parts - each task's content must be sent as one complete message
             5. Avoid sending the message prematurely"""
         )
@@ -85,60 +152,13 @@ class BrowserAgent:
         self.tasks = []
 
     def _initialize_llm(self):
-        # EN: Initialize the LLM using DeepSeek or OpenAI API keys
-        # ES: Inicializa el LLM usando las claves API de DeepSeek o OpenAI
-        """Initialize LLM with available API keys, trying DeepSeek first, then OpenAI"""
-        # Try DeepSeek first
-        # EN: Try DeepSeek API first
-        # ES: Prueba primero la API de DeepSeek
-        deepseek_key = os.getenv("DEEPSEEK_API_KEY")
-        if deepseek_key:
-            try:
-                # Test the DeepSeek API
-                response = requests.post(
-                    "https://api.deepseek.com/v1/chat/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {deepseek_key}"
-                    },
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": [{"role": "user", "content": "test"}],
-                        "max_tokens": 1
-                    },
-                    timeout=10
-                )
-                
-                # If we get any response other than 402 (insufficient balance), use DeepSeek
-                if response.status_code != 402:
-                    print("✅ Using DeepSeek API")
-                    os.environ["OPENAI_API_KEY"] = deepseek_key
-                    return ChatOpenAI(
-                        base_url="https://api.deepseek.com/v1",
-                        model="deepseek-chat",
-                        api_key=SecretStr(deepseek_key),
-                    )
-                else:
-                    print("⚠️ DeepSeek API has insufficient balance, trying OpenAI...")
-            except Exception as e:
-                print(f"⚠️ DeepSeek API test failed: {e}, trying OpenAI...")
-        
-        # Try OpenAI
-        # EN: If DeepSeek fails, try OpenAI API
-        # ES: Si falla DeepSeek, prueba la API de OpenAI
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key and openai_key.strip():
-            try:
-                print("✅ Using OpenAI API")
-                return ChatOpenAI(
-                    model="gpt-4o-mini",
-                    api_key=SecretStr(openai_key),
-                )
-            except Exception as e:
-                print(f"❌ OpenAI API initialization failed: {e}")
-        
-        print("❌ No valid API key found. Please check your .env file.")
-        return None
+        # EN: Get the LLM client from the shared provider registry (DeepSeek first, then OpenAI)
+        # ES: Obtiene el cliente LLM del registro compartido de proveedores (primero DeepSeek, luego OpenAI)
+        """
+        Select the LLM client without any network call. Provider health comes from a cached
+        startup probe and a circuit breaker fed by real call errors (see llm.py).
+        """
+        return get_registry().select()
 
     def addTasks(self, tasks):
         # EN: Add one or more tasks to the agent
@@ -150,18 +170,323 @@ class BrowserAgent:
             self.tasks.append(tasks)
         return self
 
-    async def _run(self):
-        # EN: Run the agent asynchronously in the browser
-        # ES: Ejecuta el agente de forma asíncrona en el navegador
-        """Internal async run method"""
+    def release_history(self, contact_id=None):
+        # EN: Replace the finished contact's full history (model thoughts, DOM state) with a short summary
+        # ES: Reemplaza el historial completo del contacto terminado (pensamientos, estado del DOM) por un resumen
+        """Keep a compact summary of the last run and drop its history and completion handler"""
+        summary = summarize_history(self.history)
+        summary.update(contact_id=contact_id, path=self.last_path)
+        self.recent_runs.append(summary)
+        self.history = None
+        self.on_complete = None
+        return summary
+
+    def reset_tasks(self):
+        # EN: Clear the task list so a reused agent starts clean for the next contact
+        # ES: Limpia la lista de tareas para que un agente reutilizado empiece limpio
+        """Remove all queued tasks"""
+        self.tasks = []
+        return self
+
+    async def ensure_session(self, timeout=120):
+        # EN: Open (once) the WhatsApp tab and wait until the chat list is visible
+        # ES: Abre (una vez) la pestaña de WhatsApp y espera a que se vea la lista de chats
+        """Make sure the warm browser context has a logged-in WhatsApp tab"""
+        page = await self._get_page()
+        try:
+            with get_metrics().span('whatsapp_load'):
+                if whatsapp_url() not in (page.url or ""):
+                    await page.goto(whatsapp_url())
+                await page.wait_for_selector(WHATSAPP_SELECTORS['app_ready'], timeout=timeout * 1000)
+        except Exception:
+            if await page.query_selector(WHATSAPP_SELECTORS['qr_code']):
+                print("⚠️ WhatsApp Web is waiting for a QR scan on the persistent profile")
+                print("⚠️ WhatsApp Web espera que se escanee el código QR en el perfil persistente")
+            raise
+        return page
+
+    async def reload_tab(self, timeout=60):
+        # EN: Recover from a page fault without relaunching Chrome: reload WhatsApp in the same context
+        # ES: Se recupera de una falla de página sin relanzar Chrome: recarga WhatsApp en el mismo contexto
+        """Reload the WhatsApp tab (opening a new one if it was closed); the browser keeps running"""
+        self.prepared_chat = None
+        if self.context is None:
+            return False
+        try:
+            page = await self.current_page()
+        except Exception:
+            page = None
+        with get_metrics().span('tab_reload'):
+            if page is None:
+                await self.context.create_new_tab(whatsapp_url())
+            else:
+                await page.goto(whatsapp_url())
+            await self.ensure_session(timeout)
+        return True
+
+    async def preopen_chat(self, phone, timeout=60):
+        # EN: Open the next contact's chat during the pacing window, so its open_chat step costs nothing
+        # ES: Abre el chat del siguiente contacto durante la espera, para que su paso open_chat no cueste nada
+        """Open a contact's chat in the warm tab ahead of time"""
+        self.prepared_chat = None
+        if self.persistent:
+            await self.ensure_session()
+        page = await self._get_page()
+        with get_metrics().span('prefetch_open_chat'):
+            await open_chat(page, phone, timeout=timeout)
+        self.prepared_chat = phone_digits(phone)
+
+    async def _chat_prepared(self, page, step, prepared):
+        """True if this open_chat step's chat was pre-opened and is still on screen"""
+        fast_path = step.get('fast_path') or {}
+        if not prepared or fast_path.get('action') != 'open_chat' or phone_digits(fast_path.get('phone')) != prepared:
+            return False
+        return await page.query_selector(WHATSAPP_SELECTORS['composer']) is not None
+
+    async def _get_page(self):
+        # EN: Return the active tab, creating the browser context on first use
+        # ES: Devuelve la pestaña activa, creando el contexto del navegador la primera vez
+        """Get the current Playwright page of the shared browser context"""
+        if self.context is None:
+            with get_metrics().span('browser_launch'):
+                self.context = await self.browser.new_context()
+            self.dom_diet.install(self.context)
+        return await self.context.get_current_page()
+
+    async def current_page(self):
+        # EN: The open tab, without launching anything (used by background watchers)
+        # ES: La pestaña abierta, sin lanzar nada (usada por tareas en segundo plano)
+        """Return the current page, or None if the browser context is not open"""
+        if self.context is None:
+            return None
+        page = await self.context.get_current_page()
+        return None if page.is_closed() else page
+
+    async def run_steps(self, steps, checkpoint=None, routing=None, variables=None):
+        # EN: Run scripted fast_path steps and hand the rest to the LLM agent on the first failure
+        # ES: Ejecuta los pasos fast_path y pasa el resto al agente LLM en la primera falla
+        """
+        Run a contact's steps. Each step is a dict with the rendered LLM 'task' and an optional
+        rendered 'fast_path'. Sets self.last_path to 'scripted', 'replay', 'mixed' or 'llm'.
+        With a ContactCheckpoint, scripted steps are checkpointed one by one and the steps handed
+        to the LLM agent are marked started (the caller completes them once the run succeeds).
+        `routing` is the list's agent.routing block (see routing.py). With the contact's template
+        `variables`, the LLM steps replay a cached plan when one matches (see plans.py).
+        """
+        completed = 0
+        prepared, self.prepared_chat = self.prepared_chat, None   # A pre-opened chat is good for this run only
+        if any(step.get('fast_path') for step in steps):
+            page = await self._get_page()
+            for step in steps:
+                if not step.get('fast_path'):
+                    break
+                try:
+                    if checkpoint and checkpoint.uncertain(step) and await message_in_chat(
+                            page, step['fast_path'].get('text'), times=checkpoint.occurrence(step)):
+                        # A previous attempt sent it but stopped before the checkpoint was written
+                        print(f"↩️ Step {completed + 1} was already sent, skipping it")
+                        checkpoint.complete(step)
+                        completed += 1
+                        continue
+                    if checkpoint:
+                        checkpoint.begin(step)
+                    if not completed and await self._chat_prepared(page, step, prepared):
+                        get_metrics().incr('prefetch_hits')
+                    else:
+                        with get_metrics().span('fast_path_step', action=step['fast_path'].get('action')):
+                            await run_action(page, step['fast_path'])
+                except InvalidNumberError:
+                    raise  # A bad number is the contact's problem; the LLM agent would only burn steps on it
+                except ScriptedStepError as e:
+                    print(f"⚠️ Fast path failed at step {completed + 1}: {e}. Falling back to the LLM agent")
+                    break
+                except Exception as e:
+                    print(f"⚠️ Fast path error at step {completed + 1}: {e}. Falling back to the LLM agent")
+                    break
+                if checkpoint:
+                    checkpoint.complete(step)
+                completed += 1
+
+        metrics = get_metrics()
+        stats = metrics.current_contact()
+        if completed == len(steps):
+            self.last_path = 'scripted'
+            if stats:
+                stats.path = self.last_path
+            metrics.incr('contact_paths', path=self.last_path)
+            return None
+
+        if checkpoint:
+            checkpoint.begin(*steps[completed:])
+        self.reset_tasks()
+        self.addTasks(tuple(step['task'] for step in steps[completed:]))
+
+        # EN: A plan recorded for the same tasks and page state replaces the LLM run; a mismatch drops it
+        # ES: Un plan grabado para las mismas tareas y estado de página reemplaza al LLM; un desajuste lo descarta
+        plans = get_plan_cache()
+        key = plan_key(steps[completed:]) if plans.enabled and variables is not None else None
+        fingerprint = await self._fingerprint() if key else None
+        plan = plans.lookup(key, fingerprint, variables) if key else None
+        if plan is not None:
+            try:
+                await self._replay(plan)
+            except Exception as e:
+                print(f"⚠️ Cached plan no longer matches the page ({e}). Falling back to the LLM agent")
+                plans.invalidate(key, fingerprint)
+                key = None  # The page is now partway through the plan; do not record from here
+            else:
+                plans.hit(key, fingerprint)
+                if checkpoint:
+                    checkpoint.complete(*steps[completed:])
+                self.last_path = 'replay'
+                if stats:
+                    stats.path = self.last_path
+                metrics.incr('contact_paths', path=self.last_path)
+                return None
+
+        self.last_path = 'mixed' if completed else 'llm'
+        if stats:
+            stats.path = self.last_path
+        metrics.incr('contact_paths', path=self.last_path)
+        result = await self._run(routing, [step.get('tier') for step in steps[completed:]])
+        if key and result is not None and result.is_done() and not any(result.errors()):
+            plans.record(key, fingerprint, result.model_dump(), variables)
+        return result
+
+    async def _fingerprint(self):
+        """Coarse state of the page the LLM steps would start from (see whatsapp.page_fingerprint)"""
+        if self.persistent:
+            await self.ensure_session()
+        return await page_fingerprint(await self._get_page())
+
+    async def _replay(self, plan):
+        # EN: browser_use re-finds every recorded element in the live DOM and fails the step if it is gone
+        # ES: browser_use vuelve a buscar cada elemento grabado en el DOM actual y falla el paso si ya no está
+        """Run a filled plan through Agent.rerun_history; raises on the first step that does not match"""
+        from browser_use import Agent
+        from browser_use.agent.views import AgentHistoryList
         agent = Agent(
             task=self.tasks,
             use_vision=False,
-            save_conversation_path="logs/conversation",
             llm=self.llm,
             browser=self.browser,
+            browser_context=self.context,
         )
-        result = await agent.run()
+        for item in plan['history']:
+            item['model_output'] = agent.AgentOutput.model_validate(item['model_output'])
+        history = AgentHistoryList.model_validate(plan)
+        with get_metrics().span('plan_replay'):
+            results = await agent.rerun_history(history, max_retries=1, skip_failures=False,
+                                                delay_between_actions=REPLAY_DELAY)
+        errors = [result.error for result in results if getattr(result, 'error', None)]
+        if errors:
+            raise ScriptedStepError(errors[0])
+        self.history = history
+        return history
+
+    async def health_check(self):
+        # EN: Cheap check that the warm tab is still alive and logged in
+        # ES: Verificación rápida de que la pestaña sigue viva y con sesión iniciada
+        """Return True if the persistent WhatsApp tab is usable"""
+        if self.context is None:
+            return False
+        try:
+            page = await self.context.get_current_page()
+            if page.is_closed():
+                return False
+            ready_state = await page.evaluate("() => document.readyState")
+            if ready_state != "complete":
+                return False
+            return await page.query_selector(WHATSAPP_SELECTORS['app_ready']) is not None
+        except Exception as e:
+            print(f"⚠️ Browser health check failed: {e}")
+            return False
+
+    def mark_contact_done(self, fault=False):
+        # EN: Count a served contact and remember whether something went wrong
+        # ES: Cuenta un contacto atendido y recuerda si algo falló
+        """Record that a contact finished on this session"""
+        self.contacts_served += 1
+        if fault:
+            self.fault_detected = True
+
+    def needs_recycle(self):
+        # EN: Recycle after N contacts or once a fault has been detected
+        # ES: Recicla después de N contactos o cuando se detecta una falla
+        """Whether the browser session should be rebuilt"""
+        return self.fault_detected or self.contacts_served >= self.recycle_after
+
+    async def recycle(self):
+        # EN: Close the browser and start a fresh one on the same profile
+        # ES: Cierra el navegador y abre uno nuevo con el mismo perfil
+        """Rebuild the browser session"""
+        print(f"♻️ Recycling browser session after {self.contacts_served} contacts")
+        get_metrics().incr('browser_recycles')
+        try:
+            await self.close()
+        except Exception as e:
+            print(f"⚠️ Error closing browser during recycle: {e}")
+        from browser_use import Browser
+        self.browser = Browser(config=self.b_config)
+        self.contacts_served = 0
+        self.fault_detected = False
+        await self.ensure_session()
+
+    async def _run(self, routing=None, task_tiers=()):
+        # EN: Run the agent asynchronously in the browser
+        # ES: Ejecuta el agente de forma asíncrona en el navegador
+        """Internal async run method"""
+        if self.persistent:
+            await self.ensure_session()
+        elif self.dom_diet.enabled and self.context is None:
+            await self._get_page()  # Our own context, so the DOM diet applies to the agent's steps
+        # Re-select per run so a provider whose circuit opened is skipped from now on;
+        # the router then picks the model tier of every step from the task it belongs to
+        router = ModelRouter(get_registry(), routing)
+        metrics = get_metrics()
+        stats = metrics.current_contact()
+
+        # EN: Transcripts go to the compressed, size-capped conversation log, written off the event loop
+        # ES: Las conversaciones van al registro comprimido y con tamaño limitado, escrito fuera del bucle
+        conversation = get_conversation_log().begin(stats.contact_id if stats else None)
+        from browser_use import Agent
+        from browser_use.agent.views import AgentHistoryList
+        segments = router.segments(self.tasks, task_tiers) or [(router.tier, self.tasks)]
+        history = []
+        try:
+            # EN: Consecutive tasks of the same tier share one agent; the page state carries over to the next
+            # ES: Las tareas seguidas del mismo nivel comparten un agente; el estado de la página pasa al siguiente
+            for tier, tasks in segments:
+                router.begin(tier)
+                self.llm = router.initial_llm() or self.llm
+                agent = Agent(
+                    task=tasks,
+                    use_vision=False,
+                    llm=self.llm,
+                    browser=self.browser,
+                    browser_context=self.context,
+                    register_new_step_callback=lambda state, output, step: conversation.step(agent, state, output, step),
+                )
+                router.install(agent)
+                with metrics.span('llm_agent'):
+                    result = await agent.run()
+                history.extend(result.history)
+                if not result.is_done() or result.has_errors():
+                    break  # The remaining tasks would start from a page this segment left unfinished
+        except Exception as e:
+            conversation.finish(error=str(e))
+            raise
+        if len(segments) > 1:
+            result = AgentHistoryList(history=history)
+        conversation.finish(result)
+        self.history = result
+
+        # EN: Count the agent steps this run took
+        # ES: Cuenta los pasos que tomó el agente en esta ejecución
+        steps = len(getattr(result, 'history', None) or [])
+        metrics.incr('agent_steps', steps)
+        if stats:
+            stats.agent_steps += steps
         
         # Call the callback if it exists
         if self.on_complete:
@@ -179,4 +504,10 @@ class BrowserAgent:
         # EN: Close the browser session
         # ES: Cierra la sesión del navegador
         """Close the browser"""
+        self.prepared_chat = None
+        if self.context is not None:
+            try:
+                await self.context.close()
+            finally:
+                self.context = None
         await self.browser.close() 
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from standins import StandInServer
+from metrics import rss_bytes
+from dom_diet import DIET_MODES
+
+## Offline benchmark for the follow-up runner
+# EN: Runs the real runner against local stand-ins for the API, WhatsApp Web and the LLM, and reports throughput
+# ES: Ejecuta el runner real contra reemplazos locales de la API, WhatsApp Web y el LLM, e informa el rendimiento
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_INTERVAL = 5      # Seconds between memory samples
+
+
+def load_runner():
+    """Import followup-next.py (its file name is not a valid module name)"""
+    spec = importlib.util.spec_from_file_location('followup_next', os.path.join(SRC_DIR, 'followup-next.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def read_contact_events(jsonl_path, event_type='contact'):
+    """The per-contact summary lines written by metrics.finish_contact (or other events of a type)"""
+    events = []
+    if not os.path.exists(jsonl_path):
+        return events
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            event = json.loads(line)
+            if event.get('type') == event_type:
+                events.append(event)
+    return events
+
+
+async def sample_memory(samples, server, started):
+    # EN: Record RSS and traced Python memory while the run progresses, to spot growth per contact
+    # ES: Registra RSS y memoria de Python mientras avanza la ejecución, para detectar crecimiento por contacto
+    while True:
+        current, _ = tracemalloc.get_traced_memory()
+        samples.append({
+            'elapsed': round(time.time() - started, 1),
+            'contacts': server.finished_count(),
+            'rss': rss_bytes(),
+            'traced': current,
+        })
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+
+async def run_benchmark(runner, args, server, list_config):
+    """Run the runner until every stand-in contact has a final status (or the timeout expires)"""
+    run_args = argparse.Namespace(
+        list=[args.list],
+        page_size=args.page_size,
+        claim=args.claim,
+        persistent_session=not args.fresh_browser,
+        profile_dir=os.environ['CHROME_PROFILE_DIR'],
+        recycle_after=args.recycle_after,
+        dom_diet=args.dom_diet,
+        prefetch=args.prefetch,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        max_per_hour=args.max_per_hour,
+        metrics_port=None,
+        workers=args.workers,
+        accounts=None,
+        outbox=runner.StatusOutbox(),
+    )
+    runner.set_status_outbox(run_args.outbox)
+    loop = asyncio.get_running_loop()
+    scheduler = runner.build_scheduler(run_args, {args.list: list_config})
+    if args.workers > 1:
+        task = asyncio.create_task(runner.run_workers(run_args, scheduler, loop))
+    else:
+        task = asyncio.create_task(runner.main_loop(run_args, scheduler, loop))
+
+    samples = []
+    started = time.time()
+    sampler = asyncio.create_task(sample_memory(samples, server, started))
+    try:
+        while server.finished_count() < args.contacts and time.time() - started < args.timeout:
+            if task.done():
+                task.result()  # Surface a crash of the runner
+                break
+            await asyncio.sleep(0.5)
+    finally:
+        for pending in (task, sampler):
+            pending.cancel()
+        await asyncio.gather(task, sampler, return_exceptions=True)
+        await run_args.outbox.close()
+        runner.set_status_outbox(None)
+        await runner.get_conversation_log().close()
+        runner.reset_checkpoints()
+        runner.reset_plan_cache()
+    return time.time() - started, samples
+
+
+def summarize(args, server, events, elapsed, samples, snapshots, diet_events=()):
+    # EN: Turn the metrics log and memory samples into the benchmark report
+    # ES: Convierte el registro de métricas y las muestras de memoria en el informe
+    """Build the report dictionary"""
+    durations = [event['duration'] for event in events]
+    llm_calls = [event['llm_calls'] for event in events]
+    stages = {}
+    for event in events:
+        for stage, value in event['stages'].items():
+            stages.setdefault(stage, []).append(value)
+    paths = {}
+    for event in events:
+        paths[event['path']] = paths.get(event['path'], 0) + 1
+    tiers = {}
+    for event in events:
+        for tier, entry in (event.get('tiers') or {}).items():
+            total = tiers.setdefault(tier, {'calls': 0, 'latency': 0.0, 'cost': 0.0})
+            for key in total:
+                total[key] += entry[key]
+
+    first, last = samples[0] if samples else {}, samples[-1] if samples else {}
+    growth = snapshots[1].compare_to(snapshots[0], 'lineno')[:5] if len(snapshots) == 2 else []
+    contacts_done = len(events)
+    rss_growth = (last.get('rss') or 0) - (first.get('rss') or 0) if first.get('rss') is not None else None
+    traced_growth = (last.get('traced') or 0) - (first.get('traced') or 0)
+    return {
+        'contacts': contacts_done,
+        'elapsed_seconds': round(elapsed, 1),
+        'contacts_per_hour': round(contacts_done * 3600 / elapsed, 1) if elapsed else None,
+        'latency_p50': percentile(durations, 50),
+        'latency_p95': percentile(durations, 95),
+        'llm_calls_per_contact': round(sum(llm_calls) / contacts_done, 2) if contacts_done else None,
+        'llm_cost_per_contact': round(sum(event.get('llm_cost', 0) for event in events) / contacts_done, 6) if contacts_done else None,
+        'tiers': {
+            tier: {
+                'calls': total['calls'],
+                'latency_mean': round(total['latency'] / total['calls'], 3) if total['calls'] else None,
+                'cost': round(total['cost'], 6),
+            }
+            for tier, total in sorted(tiers.items())
+        },
+        'paths': paths,
+        'stage_means': {stage: round(sum(values) / len(values), 3) for stage, values in sorted(stages.items())},
+        'dom_tokens_per_step': {
+            phase: round(sum(event[f'tokens_{phase}'] for event in diet_events) / len(diet_events))
+            for phase in ('before', 'after')
+        } if diet_events else None,
+        'memory': {
+            'rss_start': first.get('rss'),
+            'rss_end': last.get('rss'),
+            'rss_growth_per_contact': round(rss_growth / contacts_done) if rss_growth is not None and contacts_done else None,
+            'traced_growth': traced_growth,
+            'traced_growth_per_contact': round(traced_growth / contacts_done) if contacts_done else None,
+            'traced_peak': tracemalloc.get_traced_memory()[1],
+            'top_growth': [str(stat) for stat in growth],
+        },
+        'server': server.stats(),
+        'settings': {
+            'workers': args.workers,
+            'min_interval': args.min_interval,
+            'max_interval': args.max_interval,
+            'persistent_session': not args.fresh_browser,
+            'llm_only': args.llm_only,
+            'claim': args.claim,
+            'dom_diet': args.dom_diet or os.getenv('DOM_DIET', 'off'),
+            'plan_cache': args.plan_cache,
+            'prefetch': args.prefetch,
+        },
+        'memory_samples': samples,
+    }
+
+
+def print_report(report):
+    mb = lambda value: f"{value / 1048576:.1f} MB" if value is not None else "n/a"
+    print("\n📊 Benchmark results / Resultados")
+    print(f"  Contacts processed:      {report['contacts']} in {report['elapsed_seconds']}s")
+    print(f"  Contacts per hour:       {report['contacts_per_hour']}")
+    print(f"  Latency p50 / p95:       {report['latency_p50']}s / {report['latency_p95']}s")
+    print(f"  LLM calls per contact:   {report['llm_calls_per_contact']}")
+    print(f"  LLM cost per contact:    ${report['llm_cost_per_contact']}")
+    for tier, entry in report['tiers'].items():
+        print(f"    tier {tier:<17} {entry['calls']} calls, {entry['latency_mean']}s mean, ${entry['cost']}")
+    print(f"  Paths:                   {report['paths']}")
+    for stage, mean in report['stage_means'].items():
+        print(f"    {stage:<22} {mean}s")
+    if report['dom_tokens_per_step']:
+        tokens = report['dom_tokens_per_step']
+        print(f"  DOM tokens per step:     {tokens['before']} -> {tokens['after']}")
+    memory = report['memory']
+    print(f"  RSS start / end:         {mb(memory['rss_start'])} / {mb(memory['rss_end'])}")
+    print(f"  RSS growth per contact:  {memory['rss_growth_per_contact']} bytes")
+    print(f"  Python heap growth:      {mb(memory['traced_growth'])} (peak {mb(memory['traced_peak'])})")
+    for line in memory['top_growth']:
+        print(f"    {line}")
+
+
+def main():
+    # EN: Parses the benchmark options and runs one offline benchmark
+    # ES: Analiza las opciones del benchmark y ejecuta una prueba sin conexión
+    parser = argparse.ArgumentParser(description='Benchmark the follow-up runner offline against local stand-ins')
+    parser.add_argument('--list', default='4ga-lost', help='List configuration to render (default: 4ga-lost)')
+    parser.add_argument('--contacts', type=int, default=50, help='Number of fake PENDING contacts (default: 50)')
+    parser.add_argument('--workers', type=int, default=1, help='Concurrent workers (default: 1)')
+    parser.add_argument('--min-interval', type=float, default=0, help='Minimum seconds between sends (default: 0)')
+    parser.add_argument('--max-interval', type=float, default=0, help='Maximum seconds between sends (default: 0)')
+    parser.add_argument('--max-per-hour', type=int, default=100000, help='Hourly send cap (default: effectively none)')
+    parser.add_argument('--page-size', type=int, default=None, help='Fetch contacts in pages of this size')
+    parser.add_argument('--claim', action='store_true', help='Claim contacts with leases (the stand-in reports double starts)')
+    parser.add_argument('--recycle-after', type=int, default=None, help='Recycle the browser after this many contacts')
+    parser.add_argument('--fresh-browser', action='store_true', help='Launch a new browser per contact instead of a persistent session')
+    parser.add_argument('--llm-only', action='store_true', help='Ignore fast_path steps so every contact goes through the LLM agent')
+    parser.add_argument('--dom-diet', choices=DIET_MODES, default=None, help='DOM pruning mode for the LLM agent (default: DOM_DIET or off)')
+    parser.add_argument('--prefetch', action='store_true', help='Prepare the next contact during pacing (pair with --min-interval)')
+    parser.add_argument('--plan-cache', action='store_true', help='Replay cached agent plans instead of calling the LLM for every contact')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='Seconds added to each stand-in API request (default: 0.05)')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Seconds added to each stand-in LLM call (default: 0.5)')
+    parser.add_argument('--delivery-delay', type=float, default=0.5, help='Seconds until a sent message shows ✓✓ (default: 0.5)')
+    parser.add_argument('--timeout', type=float, default=1800, help='Stop after this many seconds (default: 1800)')
+    parser.add_argument('--output', default=None, help='Also write the report as JSON to this file')
+    parser.add_argument('--keep-workdir', action='store_true', help='Keep the temporary outbox, metrics and profile directory')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='followup-benchmark-')
+    server = StandInServer(args.list, contacts=args.contacts, api_latency=args.api_latency,
+                           llm_latency=args.llm_latency, delivery_delay=args.delivery_delay).start()
+    print(f"🧪 Stand-ins on {server.base_url}, work dir {workdir}")
+
+    # Importing the runner loads .env, so the stand-in settings are applied afterwards
+    runner = load_runner()
+    os.environ.update(server.env())
+    os.environ.update({
+        'ENVIRONMENT': 'production',
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'METRICS_JSONL_PATH': os.path.join(workdir, 'metrics.jsonl'),
+        'METRICS_PROM_PATH': os.path.join(workdir, 'metrics.prom'),
+        'CHROME_PROFILE_DIR': os.path.join(workdir, 'profile'),
+        'CONVERSATION_LOG_DIR': os.path.join(workdir, 'conversation'),
+        'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoints.sqlite3'),
+        'MEMORY_DUMP_PATH': os.path.join(workdir, 'memory.txt'),
+        'PLAN_CACHE_PATH': os.path.join(workdir, 'plans.sqlite3') if args.plan_cache else '',
+    })
+
+    list_config = runner.load_list_config(args.list)
+    if args.llm_only:
+        for task in list_config.compiled.tasks:
+            task['fast_path'] = None
+
+    tracemalloc.start()
+    snapshots = [tracemalloc.take_snapshot()]
+    try:
+        elapsed, samples = asyncio.run(run_benchmark(runner, args, server, list_config))
+        snapshots.append(tracemalloc.take_snapshot())
+        runner.get_metrics().close()
+        jsonl_path = os.environ['METRICS_JSONL_PATH']
+        report = summarize(args, server, read_contact_events(jsonl_path), elapsed, samples, snapshots,
+                           read_contact_events(jsonl_path, 'dom_diet'))
+    finally:
+        server.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
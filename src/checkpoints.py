@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from metrics import get_metrics
+
+## Defaults for the step checkpoint store
+# EN: Where per-contact step progress is kept and for how long
+# ES: Dónde se guarda el avance de cada contacto por paso y durante cuánto tiempo
+DEFAULT_CHECKPOINT_PATH = os.path.join('data', 'checkpoints.sqlite3')
+DEFAULT_CHECKPOINT_DAYS = 7     # Older checkpoints are purged, after that a contact can be messaged again
+
+STARTED = 'started'             # The step was handed to the browser; a send may or may not have happened
+DONE = 'done'                   # The step finished; a send step is never repeated
+
+
+def step_kind(step):
+    """'navigate' for steps that only open the chat, 'send' for everything else"""
+    fast_path = step.get('fast_path') or {}
+    return 'navigate' if fast_path.get('action') == 'open_chat' else 'send'
+
+
+def step_key(step):
+    """Fingerprint of a rendered step, so a changed template does not match an old checkpoint"""
+    return hashlib.sha1(json.dumps(step, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+## Progress of one contact through its rendered steps
+# EN: Retries resume at the first unfinished step instead of replaying the whole conversation
+# ES: Los reintentos continúan en el primer paso sin terminar en lugar de repetir toda la conversación
+class ContactCheckpoint:
+    """
+    Per-contact state machine over the rendered steps: pending -> started -> done.
+
+    A send step that is done is never run again, across retries and process restarts.
+    Navigation steps are cheap and do not send anything, so the last one before the
+    first unfinished step is run again to get the chat back on screen.
+    """
+
+    def __init__(self, store, list_name, contact_id, steps):
+        self.store = store
+        self.list_name = list_name
+        self.contact_id = str(contact_id)
+        self.steps = list(steps)
+        self._index = {id(step): index for index, step in enumerate(self.steps)}
+        self._states = store.load(list_name, self.contact_id)
+
+    def state(self, step):
+        index = self._index[id(step)]
+        saved = self._states.get(index)
+        if saved is None or saved[0] != step_key(step):
+            return None
+        return saved[1]
+
+    def remaining(self):
+        # EN: The steps still to run, with the chat re-opened before a resumed send
+        # ES: Los pasos que faltan, volviendo a abrir el chat antes de un envío retomado
+        """Return the steps a (re)try has to run, in order"""
+        first = next((i for i, step in enumerate(self.steps) if self.state(step) != DONE), None)
+        if first is None:
+            return []
+        reopen = [step for step in self.steps[:first] if step_kind(step) == 'navigate'][-1:]
+        return reopen + [step for step in self.steps[first:] if self.state(step) != DONE]
+
+    def uncertain(self, step):
+        """True for a send step that was started but never confirmed (the message may be in the chat)"""
+        return step_kind(step) == 'send' and self.state(step) == STARTED
+
+    def occurrence(self, step):
+        """How many send steps up to this one type the same text (this step's copy is the n-th in the chat)"""
+        text = (step.get('fast_path') or {}).get('text')
+        return sum(1 for other in self.steps[:self._index[id(step)] + 1]
+                   if step_kind(other) == 'send' and (other.get('fast_path') or {}).get('text') == text)
+
+    def all_sent(self):
+        """True once every send step is done (False when there is nothing to send)"""
+        sends = [step for step in self.steps if step_kind(step) == 'send']
+        return bool(sends) and all(self.state(step) == DONE for step in sends)
+
+    def resumed(self):
+        """True if an earlier attempt already got somewhere"""
+        return any(self.state(step) is not None for step in self.steps)
+
+    def begin(self, *steps):
+        self._save(steps, STARTED)
+
+    def complete(self, *steps):
+        self._save(steps, DONE)
+
+    def _save(self, steps, state):
+        for step in steps:
+            index = self._index[id(step)]
+            self._states[index] = (step_key(step), state)
+            self.store.save(self.list_name, self.contact_id, index, step_key(step), step_kind(step), state)
+
+
+## Durable store of step checkpoints and sent-message records
+# EN: One SQLite file, written synchronously: a checkpoint must be on disk before the next step starts
+# ES: Un archivo SQLite escrito de forma síncrona: el checkpoint debe estar en disco antes del siguiente paso
+class CheckpointStore:
+    """
+    SQLite table of (list, contact, step index) -> (step fingerprint, kind, state).
+
+    Rows older than CHECKPOINT_DAYS are purged when the store opens. An empty
+    CHECKPOINT_PATH disables checkpoints (every attempt starts from the first step).
+    """
+
+    def __init__(self, path=None, max_days=None):
+        self.path = os.getenv('CHECKPOINT_PATH', DEFAULT_CHECKPOINT_PATH) if path is None else path
+        self.max_age = float(max_days or os.getenv('CHECKPOINT_DAYS', DEFAULT_CHECKPOINT_DAYS)) * 86400
+        self.enabled = bool(self.path)
+        self._lock = threading.Lock()
+        self._db = None
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS steps (
+                list_name TEXT NOT NULL,
+                contact_id TEXT NOT NULL,
+                step_index INTEGER NOT NULL,
+                step_key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (list_name, contact_id, step_index)
+            )
+        """)
+        self._db.execute("DELETE FROM steps WHERE updated_at < ?", (time.time() - self.max_age,))
+
+    def contact(self, list_name, contact_id, steps):
+        """The checkpoint of one contact's rendered steps"""
+        return ContactCheckpoint(self, list_name, contact_id, steps)
+
+    def load(self, list_name, contact_id):
+        if not self.enabled:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT step_index, step_key, state FROM steps WHERE list_name = ? AND contact_id = ?",
+                (list_name, str(contact_id))
+            ).fetchall()
+        return {index: (key, state) for index, key, state in rows}
+
+    def save(self, list_name, contact_id, index, key, kind, state):
+        get_metrics().incr('checkpoints', kind=kind, state=state)
+        if not self.enabled:
+            return
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO steps (list_name, contact_id, step_index, step_key, kind, state, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(list_name, contact_id, step_index) DO UPDATE SET
+                    step_key = excluded.step_key,
+                    kind = excluded.kind,
+                    state = excluded.state,
+                    updated_at = excluded.updated_at
+            """, (list_name, str(contact_id), index, key, kind, state, time.time()))
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+
+_checkpoints = None
+
+def get_checkpoints():
+    """
+    The process-wide checkpoint store
+    El almacén de checkpoints compartido por todo el proceso
+    """
+    global _checkpoints
+    if _checkpoints is None:
+        _checkpoints = CheckpointStore()
+    return _checkpoints
+
+
+def reset_checkpoints():
+    """Close the process-wide store (the next get_checkpoints() opens it again)"""
+    global _checkpoints
+    if _checkpoints is not None:
+        _checkpoints.close()
+    _checkpoints = None
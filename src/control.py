@@ -0,0 +1,306 @@
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import time
+import yaml
+from urllib.parse import urlparse, parse_qs
+from metrics import get_metrics
+from templates import TemplateError
+from utils import load_list_config
+
+## Run states and limits of the admin interface
+# EN: Pause holds the loops before their next contact; drain lets the contacts in flight finish and exits
+# ES: La pausa detiene los bucles antes del siguiente contacto; el drenado deja terminar los que están en curso y sale
+RUNNING = 'running'
+PAUSED = 'paused'
+DRAINING = 'draining'
+QUEUE_PREVIEW = 10              # Contact ids listed per list in the status
+
+
+class ControlError(Exception):
+    """A command that cannot be applied in the current mode (answered with HTTP 400)"""
+
+
+def _number(query, name, kind=float):
+    value = query.get(name, [None])[0]
+    if value in (None, ''):
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        raise ControlError(f"{name} must be a number")
+
+
+## Runtime control plane
+# EN: Shared by the processing loops and the admin endpoint, so behaviour changes without a restart
+# ES: Compartido por los bucles de procesamiento y el endpoint de administración, para cambiar sin reiniciar
+class RunControl:
+    """
+    Runtime controls of the running process.
+
+    The loops call wait_resumed() before taking a contact and stop once `draining` is set, so
+    pause and drain never interrupt a contact in flight (its browser, LLM client and checkpoint
+    stay consistent). Pacing changes go to the registered pacers right away; a worker resize
+    is applied by run_workers; a list reload serves the next contacts with the new YAML.
+    """
+
+    def __init__(self):
+        self.state = RUNNING
+        self.scheduler = None
+        self.pacers = {}            # name -> Pacer (the main loop's, or one per account)
+        self.workers = None         # name -> Account in worker-pool mode, else None
+        self.target_workers = None
+        self.queue = None
+        self.pacing = {}            # Pacing changed at runtime, also applied to pacers registered later
+        self._resumed = None
+        self._changed = None
+
+    def attach(self, scheduler, pacers, workers=None, queue=None):
+        """Bind the control to a running loop's scheduler and pacers (called by main_loop / run_workers)"""
+        self.scheduler = scheduler
+        self.workers = workers
+        self.target_workers = len(workers) if workers is not None else None
+        self.queue = queue
+        self._resumed = asyncio.Event()
+        if self.state != PAUSED:
+            self._resumed.set()
+        self._changed = asyncio.Event()
+        self.pacers = {}
+        for name, pacer in pacers.items():
+            self.register_pacer(name, pacer)
+        return self
+
+    def register_pacer(self, name, pacer):
+        self.pacers[name] = pacer
+        self._apply_pacing(pacer)
+
+    @property
+    def draining(self):
+        return self.state == DRAINING
+
+    async def wait_resumed(self):
+        """Return once the run is not paused"""
+        if self._resumed is not None:
+            await self._resumed.wait()
+
+    async def changed(self):
+        """Wait for a resize or drain request (used by run_workers)"""
+        await self._changed.wait()
+        self._changed.clear()
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    # ---- commands --------------------------------------------------------
+
+    def pause(self):
+        if self.draining:
+            raise ControlError("the run is draining")
+        self.state = PAUSED
+        if self._resumed is not None:
+            self._resumed.clear()
+
+    def resume(self):
+        if self.draining:
+            raise ControlError("the run is draining")
+        self.state = RUNNING
+        if self._resumed is not None:
+            self._resumed.set()
+
+    def drain(self):
+        # EN: Finish the contacts in flight, read their receipts and exit; waits in progress are cut short
+        # ES: Termina los contactos en curso, lee sus recibos y sale; las esperas en curso se interrumpen
+        self.state = DRAINING
+        if self._resumed is not None:
+            self._resumed.set()
+        for pacer in self.pacers.values():
+            pacer.skip()
+        self._notify()
+
+    def set_pacing(self, min_interval=None, max_interval=None, max_per_hour=None):
+        """Change the send gap and/or hourly cap of every pacer (max_per_hour=0 removes the cap)"""
+        if min_interval is not None and min_interval < 0 or max_interval is not None and max_interval < 0:
+            raise ControlError("intervals must not be negative")
+        if min_interval is not None and max_interval is not None and max_interval < min_interval:
+            raise ControlError("max must not be below min")
+        changes = {key: value for key, value in (('min_interval', min_interval), ('max_interval', max_interval),
+                                                 ('max_per_hour', max_per_hour)) if value is not None}
+        if not changes:
+            raise ControlError("give min, max and/or per_hour")
+        self.pacing.update(changes)
+        for pacer in self.pacers.values():
+            self._apply_pacing(pacer)
+
+    def _apply_pacing(self, pacer):
+        if 'min_interval' in self.pacing or 'max_interval' in self.pacing:
+            pacer.set_intervals(self.pacing.get('min_interval', pacer.min_interval),
+                                self.pacing.get('max_interval', pacer.max_interval))
+        if 'max_per_hour' in self.pacing:
+            pacer.set_max_per_hour(self.pacing['max_per_hour'])
+
+    def resize(self, count):
+        if self.workers is None:
+            raise ControlError("the worker count can only change in worker-pool mode (--workers or --accounts)")
+        if count is None or count < 1:
+            raise ControlError("count must be at least 1")
+        if self.draining:
+            raise ControlError("the run is draining")
+        self.target_workers = count
+        self._notify()
+
+    def reload(self, name=None):
+        # EN: Re-read the list YAML files; a list that fails to load keeps its current configuration
+        # ES: Vuelve a leer los YAML de las listas; una lista que no carga mantiene su configuración actual
+        """Reload one list (or all) and return {list name: 'reloaded' | 'unchanged'}"""
+        if self.scheduler is None:
+            raise ControlError("the run has not started yet")
+        sources = [source for source in self.scheduler.sources if name is None or source.name == name]
+        if not sources:
+            raise ControlError(f"no list named {name!r} is being served")
+        configs = {}
+        for source in sources:
+            try:
+                configs[source.name] = load_list_config(source.name)
+            except (FileNotFoundError, TemplateError, yaml.YAMLError) as e:
+                raise ControlError(f"list {source.name} was not reloaded: {e}")
+        result = {}
+        for source in sources:
+            config = configs[source.name]
+            result[source.name] = 'unchanged' if config is source.config else 'reloaded'
+            if config is not source.config:
+                source.reload(config)
+        return result
+
+    # ---- inspection ------------------------------------------------------
+
+    @staticmethod
+    def _order(source, contacts):
+        """The order the list would serve its cached contacts in (scores only, no pick is counted)"""
+        if source.priority is None:
+            return contacts
+        return sorted(contacts, key=lambda contact: -source.priority.score(contact))
+
+    def status(self):
+        """State, pacing, workers, queued contacts, the contacts in flight and recent stage timings"""
+        metrics = get_metrics()
+        now = time.time()
+        lists = []
+        for source in self.scheduler.sources if self.scheduler else ():
+            cached = source.feed.cached()
+            lists.append({
+                'name': source.name,
+                'weight': source.weight,
+                'served': source.served,
+                'idle_for': round(max(0.0, source.idle_until - now), 1),
+                'queued': len(cached),
+                'next': [contact.get('id') for contact in self._order(source, cached)[:QUEUE_PREVIEW]],
+            })
+        return {
+            'state': self.state,
+            'pacing': {
+                name: {
+                    'min_interval': pacer.min_interval,
+                    'max_interval': pacer.max_interval,
+                    'max_per_hour': round(pacer.bucket.rate * 3600) if pacer.bucket else None,
+                    'next_send_in': round(pacer.seconds_until_ready(), 1),
+                }
+                for name, pacer in self.pacers.items()
+            },
+            'workers': {
+                'target': self.target_workers,
+                'running': sorted(name for name, account in self.workers.items() if not account.retired),
+                'busy': sorted(name for name, account in self.workers.items() if account.busy),
+                'retiring': sorted(name for name, account in self.workers.items() if account.retired),
+                'queue': self.queue.qsize() if self.queue is not None else None,
+            } if self.workers is not None else None,
+            'lists': lists,
+            'current': metrics.active_contacts(),
+            'recent': metrics.recent_contacts(),
+            'stages': metrics.stage_summary(),
+            'contacts_per_hour': round(metrics.contacts_per_hour(), 1),
+        }
+
+    # ---- admin endpoint --------------------------------------------------
+
+    def dispatch(self, method, target, headers=None, token=None):
+        """Run one admin request and return (HTTP status, JSON-able body)"""
+        headers = headers or {}
+        if headers.get('origin'):
+            # Browsers add Origin to cross-site requests; a web page must never drive the runner
+            return 403, {'error': 'requests from a browser page are refused'}
+        if token and not hmac.compare_digest(headers.get('authorization', ''), f"Bearer {token}"):
+            return 401, {'error': 'missing or wrong bearer token'}
+        url = urlparse(target)
+        command = url.path.strip('/') or 'status'
+        query = parse_qs(url.query)
+        if command == 'status':
+            return (200, self.status()) if method == 'GET' else (405, {'error': 'use GET'})
+        commands = {
+            'pause': lambda: self.pause(),
+            'resume': lambda: self.resume(),
+            'drain': lambda: self.drain(),
+            'pacing': lambda: self.set_pacing(_number(query, 'min'), _number(query, 'max'), _number(query, 'per_hour', int)),
+            'workers': lambda: self.resize(_number(query, 'count', int)),
+            'reload': lambda: self.reload(query.get('list', [None])[0]),
+        }
+        if command not in commands:
+            return 404, {'error': f"unknown command {command!r}", 'commands': ['status'] + list(commands)}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        try:
+            result = commands[command]()
+        except ControlError as e:
+            return 400, {'error': str(e)}
+        get_metrics().incr('admin_commands', command=command)
+        print(f"🎛️ Admin command: {command} {url.query}".rstrip())
+        return 200, {'ok': True, 'state': self.state, **({'result': result} if result else {})}
+
+    async def serve(self, port, host='127.0.0.1', token=None):
+        # EN: Minimal localhost HTTP endpoint, like the metrics one: GET /status, POST /<command>
+        # ES: Endpoint HTTP mínimo en localhost, como el de métricas: GET /status, POST /<comando>
+        """Start the admin HTTP server (token: bearer token, default ADMIN_TOKEN, else a generated one)"""
+        generated = not (token or os.getenv('ADMIN_TOKEN'))
+        token = token or os.getenv('ADMIN_TOKEN') or secrets.token_urlsafe(24)
+
+        async def handle(reader, writer):
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                method, target = request_line.split(' ')[:2]
+                headers = {}
+                for line in header_lines:
+                    key, _, value = line.partition(':')
+                    if key:
+                        headers[key.strip().lower()] = value.strip()
+                status, body = self.dispatch(method, target, headers, token)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                status, body = 400, {'error': 'malformed request'}
+            payload = json.dumps(body, indent=2, default=str).encode()
+            reason = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+                      405: 'Method Not Allowed'}[status]
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        print(f"🎛️ Admin interface at http://{host}:{port}/status")
+        if generated:
+            print(f"🔑 Admin token (set ADMIN_TOKEN to choose it): {token}")
+        return server
+
+
+_control = None
+
+def get_control():
+    """
+    The process-wide run control
+    El control de ejecución compartido por todo el proceso
+    """
+    global _control
+    if _control is None:
+        _control = RunControl()
+    return _control
@@ -0,0 +1,167 @@
+import os
+from metrics import get_metrics
+
+## Token-diet modes for the LLM agent's view of WhatsApp Web
+# EN: off = full DOM, measure = full DOM but count what pruning would save, on = prune, report = prune and print each step
+# ES: off = DOM completo, measure = DOM completo contando el ahorro, on = recortar, report = recortar e imprimir cada paso
+DIET_MODES = ('off', 'measure', 'on', 'report')
+DEFAULT_RECENT_MESSAGES = 6     # Message bubbles kept, newest first
+
+## Regions of the WhatsApp page the agent actually needs
+# EN: Active chat header, composer and send button, dialogs/popups and the latest messages
+# ES: Cabecera del chat activo, caja de texto y botón de enviar, diálogos/avisos y los últimos mensajes
+KEEP_TAGS = ('header', 'footer')
+KEEP_ROLES = ('dialog', 'alertdialog', 'textbox', 'button')
+KEEP_ATTRIBUTES = ('data-animate-modal-popup',)
+MESSAGE_CLASSES = ('message-out', 'message-in')
+DROP_IDS = ('side', 'pane-side')    # The chat list: by far the largest part of the page
+ACTIVE_CHAT_ID = 'main'             # Only present once a chat is open
+
+
+def _is_element(node):
+    return hasattr(node, 'tag_name')
+
+
+def _classes(node):
+    return (node.attributes or {}).get('class', '').split()
+
+
+def _is_message(node):
+    return any(name in _classes(node) for name in MESSAGE_CLASSES)
+
+
+def _is_dropped(node):
+    return (node.attributes or {}).get('id') in DROP_IDS
+
+
+def _is_kept(node):
+    attributes = node.attributes or {}
+    if attributes.get('role') in KEEP_ROLES or any(name in attributes for name in KEEP_ATTRIBUTES):
+        return True
+    if attributes.get('contenteditable') == 'true':
+        return True
+    return node.tag_name in KEEP_TAGS
+
+
+def _walk(node):
+    yield node
+    for child in getattr(node, 'children', None) or []:
+        if _is_element(child):
+            yield from _walk(child)
+
+
+def count_nodes(node):
+    return sum(1 for _ in _walk(node))
+
+
+def estimate_tokens(text):
+    """Approximate token count (tiktoken when available, otherwise ~4 characters per token)"""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding('cl100k_base').encode(text))
+    except Exception:
+        return len(text) // 4
+
+
+def prune_whatsapp_tree(root, recent_messages=DEFAULT_RECENT_MESSAGES):
+    # EN: Keep only the kept regions (and the path to them); everything else, including the chat list, is cut
+    # ES: Conserva solo las regiones necesarias (y el camino hasta ellas); lo demás, incluida la lista de chats, se corta
+    """
+    Prune a browser_use DOM tree in place. Returns False (and leaves the tree untouched)
+    when no chat is open, e.g. on the QR login page.
+    """
+    if not any((node.attributes or {}).get('id') == ACTIVE_CHAT_ID for node in _walk(root)):
+        return False
+    messages = [node for node in _walk(root) if _is_message(node)]
+    kept_messages = set(map(id, messages[-recent_messages:])) if recent_messages else set()
+    dropped_messages = set(map(id, messages)) - kept_messages
+
+    def keep(node):
+        """Return True if the node survives; prune its children as a side effect"""
+        if _is_dropped(node) or id(node) in dropped_messages:
+            return False
+        if id(node) in kept_messages or _is_kept(node):
+            return True
+        survivors = [child for child in node.children if _is_element(child) and keep(child)]
+        node.children = survivors
+        return bool(survivors)
+
+    keep(root)
+    return True
+
+
+## Per-context DOM filter for the LLM agent
+# EN: Wraps BrowserContext.get_state so every step's element tree is pruned before it reaches the prompt
+# ES: Envuelve BrowserContext.get_state para recortar el árbol de elementos antes de que llegue al prompt
+class DomDiet:
+    """
+    WhatsApp-aware DOM filter. The selector map is left intact, so element indexes the LLM
+    sees keep working for clicks; only the text sent to the model shrinks.
+    """
+
+    def __init__(self, mode=None, recent_messages=None):
+        self.mode = (mode or os.getenv('DOM_DIET', 'off')).lower()
+        if self.mode not in DIET_MODES:
+            raise ValueError(f"Unknown DOM diet mode '{self.mode}', expected one of: {', '.join(DIET_MODES)}")
+        self.recent_messages = int(recent_messages or os.getenv('DOM_DIET_MESSAGES', DEFAULT_RECENT_MESSAGES))
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def install(self, context):
+        """Patch a browser_use BrowserContext so its states go through apply()"""
+        if not self.enabled or getattr(context, '_dom_diet', None) is self:
+            return context
+        original = context.get_state
+
+        async def get_state(*args, **kwargs):
+            state = await original(*args, **kwargs)
+            try:
+                self.apply(state)
+            except Exception as e:
+                print(f"⚠️ DOM diet skipped for this step: {e}")
+            return state
+
+        context.get_state = get_state
+        context._dom_diet = self
+        return context
+
+    def apply(self, state):
+        # EN: Measure (and, unless measuring only, prune) one browser state
+        # ES: Mide (y, salvo en modo measure, recorta) un estado del navegador
+        """Prune state.element_tree and record token counts before and after"""
+        root = getattr(state, 'element_tree', None)
+        if root is None:
+            return state
+        nodes_before = count_nodes(root)
+        tokens_before = estimate_tokens(root.clickable_elements_to_string())
+
+        if self.mode == 'measure':
+            # Prune a throwaway copy of the child lists, then put the originals back
+            saved = {id(node): (node, list(node.children)) for node in _walk(root)}
+            pruned = prune_whatsapp_tree(root, self.recent_messages)
+            nodes_after = count_nodes(root)
+            tokens_after = estimate_tokens(root.clickable_elements_to_string())
+            for node, children in saved.values():
+                node.children = children
+        else:
+            pruned = prune_whatsapp_tree(root, self.recent_messages)
+            nodes_after = count_nodes(root)
+            tokens_after = estimate_tokens(root.clickable_elements_to_string())
+
+        metrics = get_metrics()
+        stats = metrics.current_contact()
+        metrics.incr('dom_tokens', tokens_before, phase='before')
+        metrics.incr('dom_tokens', tokens_after, phase='after')
+        metrics.emit({
+            'type': 'dom_diet', 'mode': self.mode, 'pruned': pruned, 'url': getattr(state, 'url', None),
+            'contact_id': stats.contact_id if stats else None,
+            'nodes_before': nodes_before, 'nodes_after': nodes_after,
+            'tokens_before': tokens_before, 'tokens_after': tokens_after,
+        })
+        if self.mode in ('report', 'measure'):
+            saved_pct = 100 * (tokens_before - tokens_after) / tokens_before if tokens_before else 0
+            print(f"🥗 DOM diet ({self.mode}): {tokens_before} -> {tokens_after} tokens "
+                  f"({saved_pct:.0f}% less), {nodes_before} -> {nodes_after} nodes")
+        return state
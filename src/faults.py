@@ -0,0 +1,67 @@
+import requests
+from llm import classify_llm_error
+from templates import TemplateError
+from whatsapp import ScriptedStepError, InvalidNumberError
+from metrics import get_metrics
+
+## Fault classes
+# EN: Which component an error came from decides what is recovered: never more than that component
+# ES: El componente del que viene un error decide qué se recupera: nunca más que ese componente
+LLM = 'llm'                 # Provider errors: rotate to another provider or back off the LLM only
+BROWSER = 'browser'         # Playwright / page errors: reload the tab, relaunch only if that keeps failing
+API = 'api'                 # Followups API: status writes are queued in the outbox, so only wait and retry
+CONTACT = 'contact'         # Bad contact data: skip this contact, nothing else is touched
+UNKNOWN = 'unknown'         # Anything else: the old full teardown of the browser agent
+
+BROWSER_RELOADS = 3         # Consecutive browser faults handled by a tab reload before the browser is relaunched
+
+
+def _module(error):
+    return type(error).__module__ or ''
+
+
+def classify_fault(error):
+    # EN: Map an exception to the component that failed
+    # ES: Asocia una excepción con el componente que falló
+    """Return LLM, BROWSER, API, CONTACT or UNKNOWN for an exception"""
+    declared = getattr(error, 'fault_kind', None)
+    if declared in (LLM, BROWSER, API, CONTACT):
+        return declared  # Errors injected by the simulator say which component they stand for
+    if isinstance(error, (InvalidNumberError, TemplateError)):
+        return CONTACT
+    if isinstance(error, requests.exceptions.RequestException):
+        return API
+    module = _module(error)
+    if module.startswith(('playwright', 'browser_use.browser', 'browser_use.dom')) or 'TargetClosed' in type(error).__name__:
+        return BROWSER
+    if module.startswith(('openai', 'langchain', 'httpx')) or classify_llm_error(error) == 'fatal':
+        return LLM
+    if isinstance(error, ScriptedStepError):
+        return BROWSER  # The page was not in the state a scripted step expected
+    return UNKNOWN
+
+
+## Consecutive faults per class
+# EN: A success clears every class; a fault only escalates its own class
+# ES: Un éxito reinicia todas las clases; una falla solo escala su propia clase
+class FaultTracker:
+    """Counts consecutive faults of each class and records them in the metrics"""
+
+    def __init__(self):
+        self.counts = {}
+
+    def record(self, error):
+        """Classify an error, count it and return (fault class, consecutive count)"""
+        kind = classify_fault(error)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        get_metrics().incr('faults', kind=kind)
+        return kind, self.counts[kind]
+
+    def count(self, kind):
+        return self.counts.get(kind, 0)
+
+    def clear(self, kind=None):
+        if kind is None:
+            self.counts.clear()
+        else:
+            self.counts.pop(kind, None)
@@ -0,0 +1,348 @@
+import asyncio
+import os
+import socket
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils import api_base_url
+from metrics import get_metrics
+
+## Defaults for the contact feed
+# EN: How often the cache is refreshed, page size and how long finished contacts are remembered
+# ES: Cada cuánto se refresca la caché, tamaño de página y cuánto se recuerdan los contactos terminados
+DEFAULT_REFRESH_INTERVAL = 60   # Seconds before the cached list is considered stale
+DEFAULT_DONE_TTL = 3600         # Seconds a processed contact is hidden while its status update propagates
+DEFAULT_TIMEOUT = 30            # Seconds per HTTP request
+LOW_WATER_MARK = 5              # Prefetch the next page when fewer contacts than this are cached
+DEFAULT_CLAIM_BATCH = 10        # Contacts claimed per request in claim mode
+DEFAULT_LEASE_SECONDS = 600     # How long a claim lasts unless it is renewed
+
+## Local, incrementally refreshed cache of PENDING contacts
+# EN: Keeps pending contacts in memory and only re-downloads them when the API says they changed
+# ES: Mantiene los contactos pendientes en memoria y solo los vuelve a descargar si la API indica cambios
+class ContactFeed:
+    """
+    In-memory feed of pending contacts for one list.
+
+    Without a page size the whole PENDING list is fetched with conditional requests
+    (ETag / If-Modified-Since), so an unchanged list costs a 304 and no JSON parsing.
+    With a page size, pages are fetched one at a time (`page` and `limit` query params)
+    and the next page is prefetched in the background when the cache runs low. Processed
+    contacts leave the PENDING set and shift the rest into earlier pages, so after any
+    contact is done the walk starts again from page 1, skipping pages that bring nothing new.
+    Rejected and recently processed contacts are never handed out again.
+    """
+
+    def __init__(self, list_name, page_size=None, refresh_interval=None, done_ttl=DEFAULT_DONE_TTL,
+                 base_url=None, timeout=DEFAULT_TIMEOUT):
+        self.list_name = list_name
+        self.page_size = int(page_size or os.getenv('FEED_PAGE_SIZE', 0)) or None
+        self.refresh_interval = float(refresh_interval or os.getenv('FEED_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL))
+        self.done_ttl = done_ttl
+        self.base_url = base_url or api_base_url()
+        self.timeout = timeout
+
+        self._contacts = {}          # contact id -> contact, in API order
+        self._rejected = set()       # ids rejected by should_process_contact
+        self._done = {}              # id -> time until which the contact stays hidden
+        self._etag = None
+        self._last_modified = None
+        self._fetched_at = 0
+        self._next_page = 1
+        self._exhausted = False      # Paged mode: the last page has been reached
+        self._shifted = False        # Paged mode: a contact left PENDING since the walk started
+        self._prefetch = None
+
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+    def _hidden(self, contact_id):
+        until = self._done.get(contact_id)
+        if until is not None and until < time.time():
+            del self._done[contact_id]
+            until = None
+        return contact_id in self._rejected or until is not None
+
+    def _fetch(self, page=None):
+        """Blocking HTTP fetch, run in a worker thread. Returns (status_code, contacts or None)"""
+        url = f"{self.base_url}/{self.list_name}"
+        params = {'status': 'PENDING'}
+        headers = {}
+        if page is not None:
+            params.update({'page': page, 'limit': self.page_size})
+        else:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+
+        with get_metrics().span('fetch_contacts', paged=page is not None):
+            response = self._session.get(url, params=params, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            get_metrics().incr('feed_not_modified')
+            return 304, None
+        if response.status_code != 200:
+            print(f"Error fetching contacts for {url}:", response.status_code)
+            print(f"Error al obtener contactos para {url}:", response.status_code)
+            return response.status_code, None
+
+        if page is None:
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+        json_response = response.json()
+        if 'data' in json_response and isinstance(json_response['data'], list):
+            return 200, json_response['data']
+        print("No contacts array found in the response")
+        print("No se encontró el arreglo de contactos en la respuesta")
+        return 200, []
+
+    async def refresh(self):
+        # EN: Bring the cache up to date with a conditional request or the next page
+        # ES: Actualiza la caché con una solicitud condicional o la siguiente página
+        """Refresh the cached contacts from the API"""
+        if self.page_size:
+            if self._exhausted or self._shifted:
+                # Start over from the first page once the list has been walked completely, or once
+                # processed contacts moved the following ones up into pages already read
+                self._next_page = 1
+                self._exhausted = False
+                self._shifted = False
+            while True:
+                status, contacts = await asyncio.to_thread(self._fetch, self._next_page)
+                if contacts is None:
+                    return False
+                self._next_page += 1
+                if len(contacts) < self.page_size:
+                    self._exhausted = True
+                # A page of contacts already cached or hidden (e.g. rejected) moves on to the next one
+                if self._merge(contacts, replace=False) or self._exhausted:
+                    break
+        else:
+            status, contacts = await asyncio.to_thread(self._fetch)
+            if status == 304:
+                self._fetched_at = time.time()
+                return True
+            if contacts is None:
+                return False
+            self._merge(contacts, replace=True)
+        self._fetched_at = time.time()
+        return True
+
+    def _merge(self, contacts, replace):
+        """Add (or with replace, set) the visible contacts; returns how many were not cached before"""
+        fresh = {}
+        for contact in contacts:
+            contact_id = contact.get('id')
+            if contact_id is None or self._hidden(contact_id):
+                continue
+            fresh[contact_id] = contact
+        added = sum(1 for contact_id in fresh if contact_id not in self._contacts)
+        if replace:
+            self._contacts = fresh
+        else:
+            for contact_id, contact in fresh.items():
+                self._contacts.setdefault(contact_id, contact)
+        return added
+
+    def _stale(self):
+        return time.time() - self._fetched_at >= self.refresh_interval
+
+    def _start_prefetch(self):
+        if self._prefetch is None or self._prefetch.done():
+            self._prefetch = asyncio.create_task(self.refresh())
+
+    async def pending(self):
+        # EN: Return cached pending contacts, refreshing only when empty or stale
+        # ES: Devuelve los contactos pendientes en caché, refrescando solo si está vacía o desactualizada
+        """List the pending contacts that can still be handed out"""
+        if self._prefetch is not None and not self._prefetch.done() and not self._contacts:
+            await self._prefetch
+        if not self._contacts or (self._stale() and not self.page_size):
+            try:
+                await self.refresh()
+            except requests.exceptions.RequestException as e:
+                print(f"Network error while fetching contacts: {e}")
+                print(f"Error de red al obtener contactos: {e}")
+        elif self.page_size and (len(self._contacts) < LOW_WATER_MARK or self._stale()):
+            # Keep the next page coming in while the current ones are processed
+            self._start_prefetch()
+        return self.cached()
+
+    def cached(self):
+        """The contacts that can be handed out, from the cache only (never fetches)"""
+        return [contact for contact_id, contact in self._contacts.items() if not self._hidden(contact_id)]
+
+    def reject(self, contact):
+        """Never hand this contact out again in this process (rejected by should_process_contact)"""
+        contact_id = contact.get('id')
+        self._rejected.add(contact_id)
+        self._contacts.pop(contact_id, None)
+
+    def mark_done(self, contact):
+        """Hide a processed contact until its new status has reached the API"""
+        contact_id = contact.get('id')
+        self._done[contact_id] = time.time() + self.done_ttl
+        self._contacts.pop(contact_id, None)
+        self._shifted = True
+
+    async def close(self):
+        """Cancel any background prefetch and release the HTTP session"""
+        if self._prefetch is not None and not self._prefetch.done():
+            self._prefetch.cancel()
+            try:
+                await self._prefetch
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._session.close()
+
+
+def runner_id():
+    """Identity this process claims contacts under (RUNNER_ID, or host and pid)"""
+    return os.getenv('RUNNER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+
+## Claim-based feed for several runners on the same list
+# EN: Contacts are leased from the API instead of read, so two machines never get the same contact
+# ES: Los contactos se reservan en la API en lugar de leerse, así dos máquinas nunca reciben el mismo contacto
+class ClaimFeed(ContactFeed):
+    """
+    Contact feed that claims batches of PENDING contacts with a lease.
+
+    POST <list>/claim atomically leases up to `batch_size` contacts to this runner for
+    `lease_seconds`. A background task renews the leases of held contacts every third of
+    the lease; contacts whose lease could not be renewed are dropped (another runner may
+    own them now). Finished and rejected contacts are released, as is everything still
+    held on close(). After a crash the server lets the leases expire.
+    """
+
+    def __init__(self, list_name, batch_size=None, lease_seconds=None, worker=None, **kwargs):
+        super().__init__(list_name, **kwargs)
+        self.batch_size = int(batch_size or self.page_size or os.getenv('CLAIM_BATCH_SIZE', DEFAULT_CLAIM_BATCH))
+        self.lease_seconds = float(lease_seconds or os.getenv('CLAIM_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+        self.worker = worker or runner_id()
+        self._leases = {}            # contact id -> local deadline of its lease (time.monotonic())
+        self._releases = set()       # ids to release on the next renewal pass
+        self._renewer = None
+
+    def _post(self, action, payload):
+        """Blocking claim-protocol request, run in a worker thread"""
+        url = f"{self.base_url}/{self.list_name}/claim" + (f"/{action}" if action else '')
+        with get_metrics().span('claim_contacts', action=action or 'claim'):
+            response = self._session.post(url, json={'worker': self.worker, **payload}, timeout=self.timeout)
+        if response.status_code in (404, 405, 501):
+            raise RuntimeError(f"The followups API does not support contact claims ({url} returned "
+                               f"{response.status_code}); run without --claim")
+        response.raise_for_status()
+        return response.json()
+
+    def _deadline(self, result, sent_at):
+        """Local monotonic deadline of the leases a response grants (the server's clock is never compared with ours)"""
+        lease = self.lease_seconds
+        if result.get('lease_expires') and result.get('now'):
+            lease = min(lease, float(result['lease_expires']) - float(result['now']))
+        return sent_at + lease
+
+    async def refresh(self):
+        # EN: Claim a new batch; the server only hands out contacts nobody holds a live lease on
+        # ES: Reserva un nuevo lote; el servidor solo entrega contactos sin una reserva vigente
+        """Claim the next batch of contacts"""
+        sent_at = time.monotonic()
+        result = await asyncio.to_thread(self._post, None, {
+            'limit': self.batch_size, 'lease_seconds': self.lease_seconds, 'status': 'PENDING'})
+        contacts = result.get('data') or []
+        expires = self._deadline(result, sent_at)
+        for contact in contacts:
+            self._leases[contact.get('id')] = expires
+        get_metrics().incr('contacts_claimed', len(contacts), list=self.list_name)
+        self._merge(contacts, replace=False)
+        self._fetched_at = time.time()
+        if self._leases and (self._renewer is None or self._renewer.done()):
+            self._renewer = asyncio.create_task(self._renew_loop())
+        return True
+
+    async def pending(self):
+        """List the claimed contacts that can still be handed out, claiming more when none are left"""
+        now = time.monotonic()
+        for contact_id in [cid for cid, expires in self._leases.items() if expires <= now]:
+            self._lose(contact_id)
+        if not self._contacts:
+            try:
+                await self.refresh()
+            except requests.exceptions.RequestException as e:
+                print(f"Network error while claiming contacts: {e}")
+                print(f"Error de red al reservar contactos: {e}")
+        return self.cached()
+
+    def _lose(self, contact_id):
+        """Forget a contact whose lease ran out or was taken over"""
+        self._leases.pop(contact_id, None)
+        if self._contacts.pop(contact_id, None) is not None:
+            get_metrics().incr('leases_lost', list=self.list_name)
+            print(f"⚠️ Lease on contact {contact_id} was lost; leaving it to the runner that holds it now")
+
+    async def _renew_loop(self):
+        # EN: Keep held leases alive and hand back the contacts this runner is done with
+        # ES: Mantiene vigentes las reservas y devuelve los contactos que este runner ya terminó
+        while self._leases or self._releases:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.renew()
+            except (requests.exceptions.RequestException, RuntimeError, ValueError) as e:
+                # The loop stays alive: a later pass may succeed before the leases run out
+                get_metrics().incr('lease_renewal_errors', list=self.list_name)
+                print(f"⚠️ Could not renew contact leases: {e}")
+
+    async def renew(self):
+        """Release finished contacts and extend the lease of the rest"""
+        if self._releases:
+            released = list(self._releases)
+            self._releases.clear()
+            try:
+                await asyncio.to_thread(self._post, 'release', {'ids': released})
+            except (requests.exceptions.RequestException, RuntimeError, ValueError) as e:
+                # Retried on the next pass; the renewal below still runs
+                self._releases.update(released)
+                print(f"⚠️ Could not release contact leases: {e}")
+        held = list(self._leases)
+        if not held:
+            return
+        sent_at = time.monotonic()
+        result = await asyncio.to_thread(self._post, 'renew', {'ids': held, 'lease_seconds': self.lease_seconds})
+        renewed = set(result.get('renewed') or [])
+        expires = self._deadline(result, sent_at)
+        for contact_id in held:
+            if contact_id in renewed:
+                self._leases[contact_id] = expires
+            elif contact_id in self._leases:
+                self._lose(contact_id)
+
+    def _release(self, contact_id):
+        if self._leases.pop(contact_id, None) is not None:
+            self._releases.add(contact_id)
+
+    def reject(self, contact):
+        super().reject(contact)
+        self._release(contact.get('id'))
+
+    def mark_done(self, contact):
+        super().mark_done(contact)
+        self._release(contact.get('id'))
+
+    async def close(self):
+        """Stop renewing and release every lease still held"""
+        if self._renewer is not None and not self._renewer.done():
+            self._renewer.cancel()
+            try:
+                await self._renewer
+            except (asyncio.CancelledError, Exception):
+                pass
+        remaining = list(self._releases | set(self._leases))
+        if remaining:
+            try:
+                await asyncio.to_thread(self._post, 'release', {'ids': remaining})
+            except (requests.exceptions.RequestException, RuntimeError, ValueError) as e:
+                print(f"⚠️ Could not release contact leases (they will expire): {e}")
+        self._leases.clear()
+        self._releases.clear()
+        await super().close()
@@ -1,14 +1,29 @@
 import argparse
-from agent import BrowserAgent
+from agent import BrowserAgent, detect_system
 from utils import (
-    get_pending_contacts, 
     update_contact, 
-    get_message, 
     load_list_config, 
-    process_template_string, 
-    countdown
+    set_status_outbox
 )
-import random, os, asyncio
+from outbox import StatusOutbox
+from scheduler import ListSource, FairScheduler, parse_list_specs
+from accounts import load_accounts
+from pacing import Pacer, BackoffPolicy
+from llm import get_registry
+from metrics import get_metrics
+from transcripts import get_conversation_log
+from receipts import ReceiptWatcher
+from dom_diet import DIET_MODES
+from checkpoints import get_checkpoints, reset_checkpoints
+from plans import reset_plan_cache
+from memory import get_memory_monitor, configure_memory_monitor, MEMORY_EXIT_CODE
+from prefetch import Prefetcher
+from preflight import run_preflight, EXIT_FAILED
+from control import get_control
+from templates import TemplateError
+from faults import FaultTracker, classify_fault, LLM, BROWSER, API, CONTACT, BROWSER_RELOADS
+import os, sys, asyncio
+import yaml
 from dotenv import load_dotenv
 
 ## Main entry point for follow-up automation
@@ -16,6 +31,32 @@ from dotenv import load_dotenv
 # ES: Carga variables de entorno y comienza el procesamiento de contactos
 load_dotenv(override=True)
 
+def last_evaluation(history):
+    # EN: The agent's own evaluation of its last step, or None if it recorded no thoughts
+    # ES: La evaluación del agente sobre su último paso, o None si no registró pensamientos
+    """Return the last thought's evaluation text"""
+    thoughts = history.model_thoughts()
+    if not thoughts:
+        return None
+    last_thought = thoughts[-1]
+    return getattr(last_thought, 'evaluation_previous_goal', None) or str(last_thought)
+
+def agent_succeeded(history):
+    """True when the LLM agent finished without errors and judged its last step a success"""
+    if not history or not history.is_done() or history.has_errors():
+        return False
+    message = last_evaluation(history)
+    return bool(message) and "success" in message.lower()
+
+def confirm_delivery(contact, agent, receipts, message):
+    # EN: Hand the sent contact to the receipt watcher, or mark it COMPLETE right away without one
+    # ES: Pasa el contacto enviado al vigilante de recibos, o lo marca COMPLETE de inmediato si no hay
+    """Report a sent contact as COMPLETE once its delivery receipt arrives"""
+    if receipts is None:
+        update_contact(contact.get('id'), "COMPLETE", message)
+    else:
+        receipts.watch(contact, agent)
+
 def create_completion_handler(contact):
     # EN: Creates a callback to handle completion for each contact
     # ES: Crea un callback para manejar la finalización de cada contacto
@@ -24,20 +65,12 @@ def create_completion_handler(contact):
         """Handle the completion of agent tasks"""
         if history.is_done() and not history.has_errors():
             print("Agent completed tasks successfully")
-            # Get the last thought from the history
-            thoughts = history.model_thoughts()
-            if thoughts and len(thoughts) > 0:
-                last_thought = thoughts[-1]
-                
-                if hasattr(last_thought, 'evaluation_previous_goal'):
-                    message = last_thought.evaluation_previous_goal
-                else:
-                    message = str(last_thought)
-
-                status = "COMPLETE" if "success" in message.lower() else "INCOMPLETE"
-                update_contact(contact.get('id'), status, message)
-            else:
+            # A successful run is reported COMPLETE by process_contact once delivery is confirmed
+            message = last_evaluation(history)
+            if not message:
                 update_contact(contact.get('id'), "INCOMPLETE", "No thoughts found on the browser agent")
+            elif "success" not in message.lower():
+                update_contact(contact.get('id'), "INCOMPLETE", message)
         else:
             print("Agent failed to complete tasks")
             error_message = "Failed to draft message"
@@ -70,197 +103,586 @@ def should_process_contact(contact):
         
     return True
 
-async def process_contact(contact, _agent, list_config):
+async def process_contact(contact, _agent, list_config, steps=None, receipts=None):
+    # EN: Processes a single contact, recording its stage timings, LLM usage and result
+    # ES: Procesa un solo contacto, registrando tiempos por etapa, uso del LLM y resultado
+    """Process a single contact"""
+    with get_metrics().contact(contact.get('id') if contact else None, list_config.name) as stats:
+        try:
+            result = await _process_contact(contact, _agent, list_config, steps, receipts)
+        finally:
+            # Only a compact summary of the run outlives the contact
+            _agent.release_history(contact.get('id') if contact else None)
+        stats.result = 'success' if result else 'failed'
+        return result
+
+async def _process_contact(contact, _agent, list_config, steps=None, receipts=None):
     # EN: Processes a single contact, sending messages and updating status
     # ES: Procesa un solo contacto, enviando mensajes y actualizando el estado
-    """Process a single contact"""
+    """Send the messages to a single contact"""
     if not contact:
         print("Invalid contact object")
         return False
-
-    if not should_process_contact(contact):
-        return False
+    # should_process_contact already accepted the contact when it entered the feed cache (prepare_source)
 
     update_contact(contact.get('id'), "STARTED", "Agent has started contacting the contact")
 
+    # A reused (persistent) agent still holds the previous contact's tasks
+    _agent.reset_tasks()
+
+    checkpoint = None
     max_retries = 3
     for attempt in range(max_retries):
+        if attempt:
+            get_metrics().incr('contact_retries')
+            get_metrics().current_contact().retries += 1
         try:
-            # Process tasks from the YML configuration
-            tasks = []
-            
-            for task_item in list_config['agent']['tasks']:
-                # Skip tasks that are specific to a different system
-                if 'system' in task_item and task_item['system'] != _agent.system:
-                    continue
-                    
-                task = task_item['task']
-                # Process any template variables in the task
-                processed_task = process_template_string(task, contact, _agent.name, list_config)
-                tasks.append(processed_task)
+            # Render the tasks from the compiled YML configuration (unless already rendered in batch)
+            if steps is None:
+                steps = list_config.compiled.render_steps(contact, _agent.name, _agent.system)
+
+            # EN: Checkpoints make a retry (or a restarted process) resume at the first unfinished step
+            # ES: Los checkpoints hacen que un reintento (o un proceso reiniciado) siga en el primer paso sin terminar
+            if checkpoint is None:
+                checkpoint = get_checkpoints().contact(list_config.name, contact.get('id'), steps)
+            if checkpoint.all_sent():
+                print(f"Contact {contact.get('id')} already received every message, not sending again")
+                get_metrics().incr('duplicate_sends_avoided')
+                confirm_delivery(contact, _agent, receipts, "Messages already sent in an earlier attempt")
+                return True
+            remaining = checkpoint.remaining()
+            if checkpoint.resumed():
+                print(f"Resuming contact {contact.get('id')} at step {checkpoint.steps.index(remaining[0]) + 1}/{len(steps)}")
+
+            # Run the scripted fast path, falling back to the LLM agent when a step fails
+            await _agent.run_steps(remaining, checkpoint, list_config.compiled.routing,
+                                   list_config.compiled.variables(contact, _agent.name))
+            print(f"Contact {contact.get('id')} processed via {_agent.last_path} path")
+
+            # The runner moves on right after the send; delivery (✓✓) is confirmed in the background
+            if _agent.last_path in ('scripted', 'replay'):
+                confirm_delivery(contact, _agent, receipts, f"Messages sent via {_agent.last_path} path")
+                return True
+
+            if agent_succeeded(_agent.history):
+                checkpoint.complete(*remaining)
+                confirm_delivery(contact, _agent, receipts, last_evaluation(_agent.history))
+                return True
 
-            # Add tasks for this contact
-            _agent.addTasks(tuple(tasks))
-            
-            # Run the agent with await since it's an async operation
-            await _agent._run()
-
-            # Verify the chat was properly loaded and message sent by checking agent completion
-            if hasattr(_agent, 'history') and _agent.history:
-                thoughts = _agent.history.model_thoughts()
-                if thoughts:
-                    # Check for successful message sending indicators
-                    success_indicators = [
-                        "message sent",
-                        "checkmark appears",
-                        "message delivered",
-                        "type a message"  # Indicates chat is loaded
-                    ]
-                    thought_texts = [str(thought).lower() for thought in thoughts]
-                    if any(indicator in " ".join(thought_texts) for indicator in success_indicators):
-                        print("Message sending verified with delivery indicators")
-                        return True
-                    
             print("Could not verify message sending completion")
             if attempt < max_retries - 1:
                 print(f"Retrying attempt {attempt + 1}/{max_retries}...")
             return False
         except Exception as e:
-            print(f"Error on attempt {attempt + 1}/{max_retries}: {str(e)}")
+            kind = classify_fault(e)
+            get_metrics().incr('faults', kind=kind)
+            print(f"Error on attempt {attempt + 1}/{max_retries} ({kind}): {str(e)}")
+            if kind == CONTACT:
+                # Retrying cannot fix the contact's own data; skip it without touching the browser
+                update_contact(contact.get('id'), "ERROR", f"Contact cannot be messaged: {str(e)}")
+                return False
             if attempt < max_retries - 1:
-                print("Retrying in 5 seconds...")
-                await asyncio.sleep(5)
+                if kind == BROWSER:
+                    print("Reloading the WhatsApp tab before retrying...")
+                    try:
+                        await _agent.reload_tab()
+                    except Exception as reload_error:
+                        print(f"⚠️ Tab reload failed: {reload_error}")
+                elif kind == LLM and not get_registry().healthy():
+                    print("No LLM provider available, backing off before retrying...")
+                    await asyncio.sleep(BackoffPolicy(base=15, kind='exponential').delay(attempt + 1))
+                else:
+                    print("Retrying in 5 seconds...")
+                    await asyncio.sleep(5)
                 continue
             else:
                 print("Max retries reached, marking contact as error")
                 update_contact(contact.get('id'), "ERROR", f"Failed after {max_retries} attempts: {str(e)}")
                 return False
 
-async def process_contact_queue(contacts, list_config, loop, browserAgent=None):
+def prepare_contacts(contacts, list_config, feed=None):
+    # EN: Renders the pending contacts in one pass and drops the ones whose templates fail
+    # ES: Procesa los contactos pendientes de una vez y descarta los que tienen plantillas inválidas
+    """Return (contacts that rendered, {contact id: rendered steps})"""
+    # Rendering happens before a browser starts, so bad templates never cost a launch
+    with get_metrics().span('render_contacts'):
+        rendered, render_errors = list_config.compiled.render_contacts(
+            contacts, list_config['agent']['name'], detect_system()
+        )
+    for bad_contact in [c for c in contacts if c.get('id') in render_errors]:
+        print(f"Template error for contact {bad_contact.get('id')}: {render_errors[bad_contact.get('id')]}")
+        update_contact(bad_contact.get('id'), "ERROR", f"Template error: {render_errors[bad_contact.get('id')]}")
+        if feed:
+            feed.reject(bad_contact)
+    return [c for c in contacts if c.get('id') not in render_errors], rendered
+
+async def process_contact_queue(contacts, list_config, loop, browserAgent=None, args=None, feed=None):
     # EN: Finds the next valid contact to process from the queue
     # ES: Busca el siguiente contacto válido para procesar de la cola
     """Process a queue of contacts"""
     if not contacts:
         return None, None
         
+    # The contacts were validated by prepare_source when they entered the feed cache
     for current_contact in contacts:
-        # Check if we should process this contact
-        if should_process_contact(current_contact):
-            # We found a valid contact to process
-            agent = browserAgent or BrowserAgent(
+        handler = create_completion_handler(current_contact)
+        if browserAgent:
+            # Reusing a warm session: bind the completion handler to this contact
+            browserAgent.on_complete = handler
+            return current_contact, browserAgent
+        with get_metrics().span('agent_init'):
+            agent = BrowserAgent(
                 name=list_config['agent']['name'],
-                on_complete=create_completion_handler(current_contact)
+                on_complete=handler,
+                persistent=getattr(args, 'persistent_session', False),
+                profile_dir=getattr(args, 'profile_dir', None),
+                recycle_after=getattr(args, 'recycle_after', None),
+                dom_diet=getattr(args, 'dom_diet', None),
             )
-            return current_contact, agent
+        return current_contact, agent
                 
     # No valid contacts to process
     return None, browserAgent
 
-async def main_loop(args, list_config, loop):
+async def start_services(args):
+    # EN: Starts the background services shared by every run mode
+    # ES: Inicia los servicios en segundo plano comunes a todos los modos
+    """Start the status outbox, the LLM probe, the metrics writer, the conversation log, memory sampling and the metrics/admin endpoints"""
+    outbox = getattr(args, 'outbox', None)
+    if outbox:
+        outbox.start()
+    # Probe the LLM providers once, in the background, while the first contacts are fetched
+    get_registry().probe_in_background()
+    get_metrics().start()
+    get_conversation_log().start()
+    # Crossing the memory growth limit cancels the run loop that started the services
+    get_memory_monitor().start(asyncio.current_task())
+    if getattr(args, 'metrics_port', None):
+        args.metrics_server = await get_metrics().serve(args.metrics_port)
+    if getattr(args, 'admin_port', None):
+        args.admin_server = await get_control().serve(args.admin_port)
+
+def build_scheduler(args, list_configs):
+    # EN: One contact feed per list, all served by one weighted scheduler
+    # ES: Una fuente de contactos por lista, todas atendidas por un único planificador ponderado
+    """Create the FairScheduler for the lists given with --list"""
+    return FairScheduler([
+        ListSource(name, list_configs[name], weight, page_size=getattr(args, 'page_size', None),
+                   claim=getattr(args, 'claim', False), prioritize=getattr(args, 'prioritize', False))
+        for name, weight in parse_list_specs(args.list)
+    ])
+
+def prepare_source(contacts, source, in_flight=None):
+    # EN: Contacts are rendered and validated once, when they enter the feed cache; each pick only looks them up
+    # ES: Los contactos se procesan y validan una vez, al entrar en la caché; cada turno solo los consulta
+    """Return (the list's contacts that can be sent now, {contact id: rendered steps})"""
+    prepared = source.prepared
+    new = []
+    for contact in contacts:
+        entry = prepared.get(contact.get('id'))
+        if entry is None or (entry[0] is not contact and entry[0] != contact):
+            new.append(contact)  # First seen, or its data changed in the API
+        elif entry[0] is not contact:
+            prepared[contact.get('id')] = (contact, entry[1])  # Same data re-fetched: keep the rendering
+    if new:
+        new, rendered = prepare_contacts(new, source.config, source.feed)
+        for contact in new:
+            if should_process_contact(contact):
+                prepared[contact.get('id')] = (contact, rendered[contact.get('id')])
+            else:
+                # Remember the rejection so the contact is not re-evaluated (and re-PUT) every loop
+                source.feed.reject(contact)
+        source.prune_prepared()
+    ready = [contact for contact in contacts if contact.get('id') in prepared
+             and (in_flight is None or contact.get('id') not in in_flight)]
+    if source.priority:
+        # Best expected value first: local time window, lead age and language (see priority.py)
+        ready = source.priority.rank(ready)
+    return ready, {contact.get('id'): prepared[contact.get('id')][1] for contact in ready}
+
+async def recover_from_fault(error, faults, browserAgent, wait, backoff):
+    # EN: Recover only the component that failed; the warm browser survives LLM, API and contact faults
+    # ES: Recupera solo el componente que falló; el navegador sigue abierto ante fallas del LLM, la API o el contacto
+    """Handle an error from the processing loop and return the browser agent to keep using (or None)"""
+    kind, count = faults.record(error)
+    print(f"Error processing contact ({kind}): {str(error)}")
+    if kind == CONTACT:
+        return browserAgent
+    if kind == LLM:
+        if get_registry().healthy():
+            print("Switching to the next available LLM provider")
+        else:
+            await wait(backoff.delay(count), "before retrying the LLM")
+        return browserAgent
+    if kind == API:
+        # Status writes are already journaled in the outbox; only the read side has to wait
+        await wait(backoff.delay(count), "before retrying the followups API")
+        return browserAgent
+    if kind == BROWSER and browserAgent and count <= BROWSER_RELOADS:
+        try:
+            await browserAgent.reload_tab()
+            return browserAgent
+        except Exception as e:
+            print(f"⚠️ Tab reload failed, relaunching the browser: {e}")
+    # Repeated page faults and unclassified errors: relaunch the browser agent
+    if browserAgent:
+        try:
+            await browserAgent.close()
+        except Exception:
+            pass
+    await wait(backoff.delay(count), "before retrying")
+    return None
+
+async def main_loop(args, scheduler, loop):
     # EN: Main loop for processing contacts, handles errors and retries
     # ES: Bucle principal para procesar contactos, maneja errores y reintentos
-    """Main processing loop"""
+    """Main processing loop (one shared browser session for every list)"""
     browserAgent = None
-    consecutive_errors = 0
+    faults = FaultTracker()
+    await start_services(args)
+    # Waits run on the event loop, so status flushes and prefetching continue in the meantime
+    pacer = Pacer(args.min_interval, args.max_interval, max_per_hour=args.max_per_hour,
+                  interactive=getattr(args, 'interactive', None), clock=getattr(args, 'clock', None))
+    backoff = BackoffPolicy()
+    receipts = ReceiptWatcher().start()
+    # With --prefetch the next contact is prepared (and its chat opened) while the current one is paced
+    prefetcher = Prefetcher(scheduler, prepare_source) if getattr(args, 'prefetch', False) else None
+    # The admin interface pauses, drains and re-paces this loop between contacts
+    control = get_control().attach(scheduler, {'main': pacer})
     try:
-        while True:
+        while not control.draining:
             try:
-                if consecutive_errors >= 3:
-                    print("Too many consecutive errors, recreating browser agent")
-                    if browserAgent:
-                        try:
-                            await browserAgent.close()
-                        except:
-                            pass
-                    browserAgent = None
-                    consecutive_errors = 0
-                    await asyncio.sleep(10)  # Wait before retrying
-                # Get pending contacts
-                contacts = get_pending_contacts(args.list)
-                if not contacts:
+                await control.wait_resumed()
+                if control.draining:
+                    break
+                # Pick the list whose turn it is; lists with an empty queue are skipped, not waited on
+                picked = await prefetcher.take() if prefetcher else None
+                if not picked:
+                    picked = await scheduler.next(prepare_source)
+                if not picked:
                     print("No pending contacts found")
-                    if os.getenv('ENVIRONMENT') != 'development':
-                        print("Waiting for 5 minutes...")
-                        countdown(300)  # Wait for 5 minutes before checking again
+                    await pacer.wait(scheduler.seconds_until_ready(), "before checking for new contacts")
                     continue
+                source, contacts, rendered = picked
 
                 # Find next contact to process
-                contact, browserAgent = await process_contact_queue(contacts, list_config, loop, browserAgent)
-                
+                contact, browserAgent = await process_contact_queue(contacts, source.config, loop, browserAgent, args,
+                                                                    source.feed)
                 if not contact:
-                    print("No contacts to process at this time")
-                    if os.getenv('ENVIRONMENT') != 'development':
-                        print("Waiting 5 minutes...")
-                        countdown(300)  # Wait for 5 minutes before checking again
                     continue
 
                 # Process the contact
-                process_result = await process_contact(contact, browserAgent, list_config)
+                process_result = await process_contact(contact, browserAgent, source.config,
+                                                       rendered.get(contact.get('id')), receipts)
+                source.feed.mark_done(contact)
                 if process_result:
-                    consecutive_errors = 0  # Reset error counter on success
+                    faults.clear()  # A success ends every run of consecutive faults
                 
                 # Clean up after the contact is processed
                 try:
-                    # Wait a bit for status updates to complete
-                    await asyncio.sleep(2)
-                    
-                    # Close browser agent
-                    if browserAgent:
-                        await browserAgent.close()
+                    if browserAgent and args.persistent_session:
+                        # Keep the warm session; recycle only after N contacts or a failed health check
+                        browserAgent.mark_contact_done()
+                        if browserAgent.needs_recycle() or not await browserAgent.health_check():
+                            await browserAgent.recycle()
+                    elif browserAgent:
+                        # The watcher closes this browser once its delivery receipts are read; the next contact gets a new one
+                        await receipts.retire(browserAgent)
                         browserAgent = None
                         
                     # Wait before next contact if we processed this one
                     if process_result:
-                        wait_time = random.randint(60, 240)  # Random seconds between 1-4 minutes
-                        print(f"\nWaiting {wait_time} seconds ({wait_time/60:.1f} minutes) before next contact...")
-                        countdown(wait_time)
+                        pacer.record_send()  # Random gap between --min-interval and --max-interval
+                        if prefetcher and not control.draining:
+                            prefetcher.start(browserAgent if args.persistent_session else None)
+                        with get_metrics().span('pacing'):
+                            await pacer.wait_turn()
                 except Exception as e:
                     print(f"Error during cleanup: {str(e)}")
-                    if browserAgent:
-                        try:
-                            await browserAgent.close()
-                        except:
-                            pass
-                        browserAgent = None
+                    if prefetcher:
+                        prefetcher.cancel()
+                    browserAgent = await recover_from_fault(e, faults, browserAgent, pacer.wait, backoff)
                     
             except Exception as e:
-                print(f"Error processing contact: {str(e)}")
-                consecutive_errors += 1
-                if browserAgent:
-                    try:
-                        await browserAgent.close()
-                    except:
-                        pass
-                    browserAgent = None
-                wait_time = min(60 * consecutive_errors, 300)  # Exponential backoff, max 5 minutes
-                print(f"Waiting {wait_time} seconds before retrying...")
-                countdown(wait_time)
-
-    except KeyboardInterrupt:
+                if prefetcher:
+                    prefetcher.cancel()
+                browserAgent = await recover_from_fault(e, faults, browserAgent, pacer.wait, backoff)
+
+        print("Drain complete, shutting down...")
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\nGracefully shutting down...")
-        # Clean up if needed
+    finally:
+        if prefetcher:
+            prefetcher.cancel()
+        # Read the last receipts while the browser is still open, then close it
+        await receipts.close()
+        if browserAgent:
+            await browserAgent.close()
+        await scheduler.close()
+        await get_memory_monitor().close()
+        print("Shutdown complete.")
+
+async def contact_producer(scheduler, queue, in_flight):
+    # EN: Keeps the shared queue filled with valid contacts for the workers, one pick per contact
+    # ES: Mantiene la cola compartida llena de contactos válidos para los workers, un turno por contacto
+    """Feed the worker queue from the lists, in weighted order"""
+    while True:
+        picked = await scheduler.next(lambda contacts, source: prepare_source(contacts, source, in_flight))
+        if not picked:
+            print("No contacts to process at this time")
+            await asyncio.sleep(scheduler.seconds_until_ready())
+            continue
+        source, contacts, rendered = picked
+        contact = contacts[0]
+        in_flight.add(contact.get('id'))
+        # Blocks while every worker is busy, so contacts are not hoarded
+        await queue.put((source, contact, rendered.get(contact.get('id'))))
+
+async def worker_loop(account, args, queue, in_flight, receipts=None):
+    # EN: One worker: a browser bound to one WhatsApp account, paced by that account's limits
+    # ES: Un worker: un navegador asociado a una cuenta de WhatsApp, con el ritmo de esa cuenta
+    """Process contacts from the shared queue with a single account"""
+    browserAgent = None
+    faults = FaultTracker()
+    backoff = BackoffPolicy()
+    control = get_control()
+    try:
+        # A drain, or a resize that retires this account, stops the worker between contacts
+        while not control.draining and not account.retired:
+            # Pace first, so a waiting worker does not hold a contact another worker could send
+            await account.wait_turn()
+            await control.wait_resumed()
+            if control.draining or account.retired:
+                break
+            source, contact, steps = await queue.get()
+            account.busy = True
+            try:
+                if browserAgent is None:
+                    with get_metrics().span('agent_init', account=account.name):
+                        browserAgent = BrowserAgent(
+                            name=source.config['agent']['name'],
+                            persistent=True,
+                            profile_dir=account.profile_dir,
+                            recycle_after=args.recycle_after,
+                            dom_diet=args.dom_diet,
+                        )
+                browserAgent.on_complete = create_completion_handler(contact)
+                print(f"[{account.name}] Processing contact {contact.get('id')}")
+                process_result = await process_contact(contact, browserAgent, source.config, steps, receipts)
+                source.feed.mark_done(contact)
+                if process_result:
+                    # Only an actual send spends the account's pacing and hourly budget, and ends a fault run
+                    account.record_send()
+                    faults.clear()
+
+                browserAgent.mark_contact_done()
+                if browserAgent.needs_recycle() or not await browserAgent.health_check():
+                    await browserAgent.recycle()
+            except Exception as e:
+                # A failure here only affects this worker; the contact goes back to the feed
+                print(f"[{account.name}] Error processing contact {contact.get('id')}")
+                browserAgent = await recover_from_fault(e, faults, browserAgent, account.pacer.wait, backoff)
+            finally:
+                account.busy = False
+                in_flight.discard(contact.get('id'))
+                queue.task_done()
+    finally:
         if browserAgent:
+            if (control.draining or account.retired) and receipts is not None:
+                await receipts.drain(browserAgent)  # Read this account's last receipts before its browser closes
             await browserAgent.close()
+
+def stop_idle_workers(workers, accounts):
+    """Cancel the workers of these accounts that are not processing a contact; busy ones stop after it"""
+    for task, account in workers.items():
+        if account in accounts and not account.busy:
+            task.cancel()
+
+def resize_workers(args, workers, control, start_worker):
+    # EN: Grow the pool with the next accounts (or un-retire ones still running), shrink it idle workers first
+    # ES: Amplía el pool con las siguientes cuentas (o reactiva las que siguen corriendo); lo reduce empezando por las libres
+    """Apply control.target_workers to the running worker pool"""
+    target = control.target_workers
+    active = [account for account in workers.values() if not account.retired]
+    for account in workers.values():
+        if account.retired and len(active) < target:
+            account.retired = False
+            active.append(account)
+    if len(active) < target:
+        names = {account.name for account in workers.values()}
+        fresh = [account for account in load_accounts(args.accounts, target, args.profile_dir, args.min_interval,
+                                                      args.max_interval, args.max_per_hour)
+                 if account.name not in names][:target - len(active)]
+        for account in fresh:
+            workers[start_worker(account)] = account
+            control.workers[account.name] = account
+            control.register_pacer(account.name, account.pacer)
+            active.append(account)
+        if len(active) < target:
+            print(f"⚠️ Only {len(active)} accounts are available in {args.accounts}")
+    elif len(active) > target:
+        retiring = sorted(active, key=lambda account: account.busy)[:len(active) - target]
+        for account in retiring:
+            account.retired = True
+        stop_idle_workers(workers, retiring)
+    running = [account.name for account in workers.values() if not account.retired]
+    print(f"Worker pool resized to {len(running)}: {', '.join(running)}")
+
+async def run_workers(args, scheduler, loop):
+    # EN: Runs one worker per WhatsApp account over a shared contact queue
+    # ES: Ejecuta un worker por cuenta de WhatsApp sobre una cola de contactos compartida
+    """Worker-pool processing loop (--workers N / --accounts FILE)"""
+    accounts = load_accounts(args.accounts, args.workers, args.profile_dir,
+                             args.min_interval, args.max_interval, args.max_per_hour)
+    print(f"Starting {len(accounts)} workers: {', '.join(account.name for account in accounts)}")
+
+    await start_services(args)
+    queue = asyncio.Queue(maxsize=len(accounts))
+    in_flight = set()
+    receipts = ReceiptWatcher().start()
+
+    def start_worker(account):
+        return asyncio.create_task(worker_loop(account, args, queue, in_flight, receipts))
+
+    workers = {start_worker(account): account for account in accounts}
+    producer = asyncio.create_task(contact_producer(scheduler, queue, in_flight))
+    # The admin interface can pause, drain, re-pace and resize the pool while it runs
+    control = get_control().attach(scheduler, {account.name: account.pacer for account in accounts},
+                                   workers={account.name: account for account in accounts}, queue=queue)
+    changed = asyncio.create_task(control.changed())
+    try:
+        while workers:
+            done, _ = await asyncio.wait(list(workers) + [producer, changed], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is changed:
+                    changed = asyncio.create_task(control.changed())
+                    if control.draining:
+                        print("Draining: the workers finish their current contact, then the runner exits")
+                        producer.cancel()
+                        stop_idle_workers(workers, list(workers.values()))
+                    else:
+                        resize_workers(args, workers, control, start_worker)
+                    continue
+                error = task.exception() if not task.cancelled() else None
+                if task is producer:
+                    if not control.draining:
+                        print(f"Contact producer stopped ({error}), restarting")
+                        producer = asyncio.create_task(contact_producer(scheduler, queue, in_flight))
+                    continue
+                account = workers.pop(task)
+                if control.draining or account.retired:
+                    control.workers.pop(account.name, None)
+                    control.pacers.pop(account.name, None)
+                    print(f"[{account.name}] Worker stopped")
+                else:
+                    # Restart only the crashed worker; the others keep sending
+                    print(f"[{account.name}] Worker crashed ({error}), restarting")
+                    workers[start_worker(account)] = account
+        print("Drain complete, shutting down...")
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\nGracefully shutting down...")
+    finally:
+        # Read the receipts still pending while the workers' browsers are open
+        await receipts.close()
+        for task in list(workers) + [producer, changed]:
+            task.cancel()
+        await asyncio.gather(*workers, producer, changed, return_exceptions=True)
+        await scheduler.close()
+        await get_memory_monitor().close()
         print("Shutdown complete.")
 
 def main():
     # EN: Parses arguments and starts the main loop
     # ES: Analiza argumentos y comienza el bucle principal
     parser = argparse.ArgumentParser(description='Process follow-up contacts')
-    parser.add_argument('--list', required=True, help='List name to process (e.g., 4ga-lost)')
+    parser.add_argument('--list', required=True, action='append',
+                        help='List name to process (e.g., 4ga-lost). Repeat or comma-separate to serve several lists, '
+                             'with an optional weight: --list=4ga-lost:3 --list=other-list:1')
+    parser.add_argument('--page-size', type=int, default=None,
+                        help='Fetch pending contacts in pages of this size (default: FEED_PAGE_SIZE, or the whole list)')
+    parser.add_argument('--claim', action='store_true',
+                        help='Claim contacts with a renewable lease instead of reading the list, so several runners '
+                             'can share a list (batch: --page-size or CLAIM_BATCH_SIZE, lease: CLAIM_LEASE_SECONDS)')
+    parser.add_argument('--persistent-session', action='store_true',
+                        help='Keep one logged-in WhatsApp tab open across contacts instead of relaunching Chrome')
+    parser.add_argument('--profile-dir', default=None,
+                        help='Chrome user-data-dir for the persistent session (default: CHROME_PROFILE_DIR or ~/.chrome-automator/profile)')
+    parser.add_argument('--recycle-after', type=int, default=None,
+                        help='Recycle the persistent browser after this many contacts (default: SESSION_RECYCLE_AFTER or 50)')
+    parser.add_argument('--min-interval', type=float, default=60,
+                        help='Minimum seconds between sends (default: 60)')
+    parser.add_argument('--max-interval', type=float, default=240,
+                        help='Maximum seconds between sends; the gap is random between min and max (default: 240)')
+    parser.add_argument('--max-per-hour', type=int, default=None,
+                        help='Cap on sends per hour (token bucket), on top of the random gap')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--admin-port', type=int, default=int(os.getenv('ADMIN_PORT', 0)) or None,
+                        help='Serve the admin interface on http://127.0.0.1:PORT (status, pause, resume, drain, '
+                             'pacing, workers, reload), with the bearer token ADMIN_TOKEN or a generated one '
+                             '(default: ADMIN_PORT)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of concurrent workers, each with its own browser profile and WhatsApp account')
+    parser.add_argument('--accounts', default=None,
+                        help='YAML file with the WhatsApp accounts (profile dir and send rate) used by the workers')
+    parser.add_argument('--dom-diet', choices=DIET_MODES, default=None,
+                        help='Prune the WhatsApp DOM sent to the LLM agent: off, measure (count only), on, '
+                             'or report (prune and print tokens per step) (default: DOM_DIET or off)')
+    parser.add_argument('--prioritize', action='store_true',
+                        help='Send to the pending contact with the best expected value first (local time window from '
+                             'the phone country code or academy, lead age, language) for lists without a priority block')
+    parser.add_argument('--prefetch', action='store_true',
+                        help='Prepare the next contact while the current one is paced: pick, validate, render '
+                             'and (with --persistent-session) open its chat in the warm tab')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Trace Python allocations so memory dumps (SIGUSR1) list the top allocation sites '
+                             '(default: MEMORY_TRACE)')
+    parser.add_argument('--max-memory-growth', type=float, default=None,
+                        help='Stop with exit status 3 once RSS grows this many MB past the first sample '
+                             '(default: MEMORY_MAX_GROWTH_MB, or no limit)')
+    parser.add_argument('--check', action='store_true',
+                        help='Only validate the lists, the Chrome binary, the LLM API keys and the followups API, '
+                             'then exit with status 0 (all passed) or 1')
     args = parser.parse_args()
+    list_names = [name for name, _ in parse_list_specs(args.list)]
+    if args.check:
+        sys.exit(run_preflight(list_names))
+    configure_memory_monitor(trace=args.trace_memory or None, max_growth_mb=args.max_memory_growth)
 
-    # Load list configuration
-    list_config = load_list_config(args.list)
+    # Load (and validate) every list configuration before anything starts
+    try:
+        list_configs = {name: load_list_config(name) for name in list_names}
+    except (FileNotFoundError, TemplateError, yaml.YAMLError) as e:
+        print(f"❌ {e}")
+        sys.exit(EXIT_FAILED)
     
     # Create a single asyncio event loop for the whole script
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+
+    # Status updates are journaled and sent in the background so they never block a send
+    args.outbox = StatusOutbox()
+    set_status_outbox(args.outbox)
     
     try:
-        loop.run_until_complete(main_loop(args, list_config, loop))
+        scheduler = build_scheduler(args, list_configs)
+        if (args.workers or 1) > 1 or args.accounts:
+            loop.run_until_complete(run_workers(args, scheduler, loop))
+        else:
+            loop.run_until_complete(main_loop(args, scheduler, loop))
     finally:
+        # Flush pending status updates; anything undelivered stays in the journal for the next run
+        loop.run_until_complete(args.outbox.close())
+        set_status_outbox(None)
+        loop.run_until_complete(get_conversation_log().close())
+        reset_checkpoints()
+        reset_plan_cache()
+        get_metrics().close()
+        if getattr(args, 'admin_server', None):
+            args.admin_server.close()
         loop.close()
+    if get_memory_monitor().exceeded:
+        sys.exit(MEMORY_EXIT_CODE)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,315 @@
+import asyncio
+import os
+import time
+import requests
+from metrics import get_metrics
+from routing import DEFAULT_TIER
+
+## LLM providers, in order of preference
+# EN: DeepSeek first (cheaper), OpenAI as the fallback
+# ES: Primero DeepSeek (más barato), OpenAI como respaldo
+PROVIDERS = {
+    'deepseek': {
+        'models': {'fast': 'deepseek-chat', 'strong': 'deepseek-chat'},
+        'base_url': 'https://api.deepseek.com/v1',
+        'base_url_env': 'DEEPSEEK_BASE_URL',
+        'api_key_env': 'DEEPSEEK_API_KEY',
+        'label': 'DeepSeek',
+    },
+    'openai': {
+        'models': {'fast': 'gpt-4o-mini', 'strong': 'gpt-4o'},
+        'base_url': 'https://api.openai.com/v1',
+        'base_url_env': 'OPENAI_BASE_URL',
+        'api_key_env': 'OPENAI_API_KEY',
+        'label': 'OpenAI',
+    },
+}
+PROVIDER_ORDER = ['deepseek', 'openai']
+
+## Prices in USD per million tokens (input, output), used for the cost reported per tier
+# EN: Models missing here are reported with zero cost; override a tier's model with <PROVIDER>_MODEL_<TIER>
+# ES: Los modelos que no están aquí se reportan con costo cero; cambia el modelo de un nivel con <PROVEEDOR>_MODEL_<NIVEL>
+MODEL_PRICES = {
+    'deepseek-chat': (0.27, 1.10),
+    'deepseek-reasoner': (0.55, 2.19),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1': (2.00, 8.00),
+}
+
+PROBE_TTL = 600           # Seconds a startup probe result stays valid
+PROBE_TIMEOUT = 5         # Seconds for the probe request
+FAILURE_THRESHOLD = 3     # Consecutive call failures that open the circuit
+RESET_TIMEOUT = 300       # Seconds an open circuit waits before letting one call through
+PROBE_CALL_TIMEOUT = 120  # Seconds before an unanswered half-open probe call lets another one through
+
+
+class ProviderUnavailableError(RuntimeError):
+    """No provider may take a call now (a recovering provider is already being probed)"""
+    fault_kind = 'llm'
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one call"""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def classify_llm_error(error):
+    # EN: Decide whether an LLM error says something about the provider's health
+    # ES: Decide si un error del LLM indica algo sobre la salud del proveedor
+    """Return 'fatal' (402 balance), 'transient' (429/5xx/timeouts) or None (not a provider fault)"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 402:
+        return 'fatal'
+    if status == 429 or (status is not None and status >= 500):
+        return 'transient'
+    name = type(error).__name__.lower()
+    if 'timeout' in name or 'connection' in name or isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return 'transient'
+    return None
+
+
+## Circuit breaker per provider
+# EN: Opens after repeated real call failures (or at once on 402) and retries after a cool-down
+# ES: Se abre tras fallas reales repetidas (o de inmediato con 402) y reintenta después de una pausa
+class CircuitBreaker:
+    """
+    closed -> open after failures -> half-open after reset_timeout -> closed on success.
+    While half-open a single probe call goes through; the others are refused until it reports.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 probe_timeout=PROBE_CALL_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None    # When the call testing a half-open circuit was let through
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    @property
+    def probing(self):
+        """A probe call is in flight (one that never reported stops counting after probe_timeout)"""
+        return self.probe_started is not None and time.time() - self.probe_started < self.probe_timeout
+
+    def allows_calls(self):
+        state = self.state
+        return state == 'closed' or (state == 'half-open' and not self.probing)
+
+    def acquire(self):
+        """Take the right to make one call now; in half-open this call becomes the probe"""
+        if not self.allows_calls():
+            return False
+        if self.state == 'half-open':
+            self.probe_started = time.time()
+        return True
+
+    def release(self):
+        """The probe call ended without telling anything about the provider's health"""
+        self.probe_started = None
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self, fatal=False):
+        self.failures += 1
+        if fatal or self.failures >= self.failure_threshold or self.state == 'half-open':
+            self.opened_at = time.time()
+        self.probe_started = None
+
+
+def _breaker_callback(registry, provider, tier=DEFAULT_TIER, model=None):
+    """LangChain callback handler that feeds real call results into the provider's breaker"""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class BreakerCallback(BaseCallbackHandler):
+        def __init__(self):
+            self.started = {}
+
+        def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, run_id=None, **kwargs):
+            registry.record_success(provider)
+            usage = (getattr(response, 'llm_output', None) or {}).get('token_usage') or {}
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            completion_tokens = usage.get('completion_tokens', 0)
+            get_metrics().record_llm_call(
+                provider,
+                time.perf_counter() - self.started.pop(run_id, time.perf_counter()),
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                tier=tier,
+                cost=call_cost(model, prompt_tokens, completion_tokens),
+            )
+
+        def on_llm_error(self, error, run_id=None, **kwargs):
+            registry.record_error(provider, error)
+            get_metrics().record_llm_call(
+                provider, time.perf_counter() - self.started.pop(run_id, time.perf_counter()), error=True, tier=tier
+            )
+
+    return BreakerCallback()
+
+
+## Process-wide registry of LLM clients
+# EN: One client per provider, a cached health probe and failover driven by real call errors
+# ES: Un cliente por proveedor, una verificación de salud en caché y respaldo según errores reales
+class ProviderRegistry:
+    """Select a healthy LLM provider without network calls on the hot path"""
+
+    def __init__(self, order=None):
+        self.order = order or PROVIDER_ORDER
+        self.breakers = {name: CircuitBreaker() for name in self.order}
+        self.probes = {}         # provider -> (healthy, checked_at)
+        self.clients = {}
+        self.current = None
+        self._probe_task = None
+
+    def api_key(self, provider):
+        key = os.getenv(PROVIDERS[provider]['api_key_env'])
+        return key.strip() if key and key.strip() else None
+
+    def base_url(self, provider):
+        """Provider endpoint, overridable (e.g. with a local stand-in) through its base_url_env"""
+        config = PROVIDERS[provider]
+        return (os.getenv(config['base_url_env']) or config['base_url']).rstrip('/')
+
+    def _probe_one(self, provider):
+        """Cheap, free health check: list the provider's models (no completion is billed)"""
+        config = PROVIDERS[provider]
+        try:
+            response = requests.get(
+                f"{self.base_url(provider)}/models",
+                headers={"Authorization": f"Bearer {self.api_key(provider)}"},
+                timeout=PROBE_TIMEOUT,
+            )
+            healthy = response.status_code not in (401, 402, 403)
+            if not healthy:
+                print(f"⚠️ {config['label']} API probe failed with HTTP {response.status_code}")
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ {config['label']} API probe failed: {e}")
+            healthy = False
+        self.probes[provider] = (healthy, time.time())
+        return healthy
+
+    async def probe(self):
+        # EN: Probe every configured provider once, concurrently, without blocking the loop
+        # ES: Verifica cada proveedor configurado una vez, en paralelo, sin bloquear el bucle
+        """Refresh the cached health of all providers that have an API key"""
+        providers = [name for name in self.order if self.api_key(name)]
+        await asyncio.gather(*(asyncio.to_thread(self._probe_one, name) for name in providers))
+        return {name: self.probes[name][0] for name in providers}
+
+    def probe_in_background(self):
+        """Start a probe on the running loop unless one is already in flight"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = loop.create_task(self.probe())
+        return self._probe_task
+
+    def _probe_ok(self, provider):
+        result = self.probes.get(provider)
+        if result is None:
+            return True  # Not probed yet: assume healthy, real calls will tell
+        healthy, checked_at = result
+        if time.time() - checked_at > PROBE_TTL:
+            self.probe_in_background()
+        return healthy
+
+    def model(self, provider, tier=DEFAULT_TIER):
+        """Model name of a provider's tier (<PROVIDER>_MODEL_<TIER> overrides the default)"""
+        models = PROVIDERS[provider]['models']
+        return os.getenv(f"{provider.upper()}_MODEL_{tier.upper()}") or models.get(tier) or models[DEFAULT_TIER]
+
+    def client(self, provider, tier=DEFAULT_TIER):
+        """The (single) chat client for a provider and model tier"""
+        if (provider, tier) not in self.clients:
+            from langchain_openai import ChatOpenAI
+            from pydantic import SecretStr
+            model = self.model(provider, tier)
+            self.clients[(provider, tier)] = ChatOpenAI(
+                base_url=self.base_url(provider),
+                model=model,
+                api_key=SecretStr(self.api_key(provider)),
+                callbacks=[_breaker_callback(self, provider, tier, model)],
+            )
+        return self.clients[(provider, tier)]
+
+    def select(self, tier=DEFAULT_TIER, acquire=False):
+        # EN: Pick the first provider with a key, a passing probe and a closed circuit
+        # ES: Elige el primer proveedor con clave, verificación correcta y circuito cerrado
+        """
+        Return the chat client of a model tier to use now, or None if no provider is available.
+        With acquire=True the client is about to make a call: a half-open provider lets only one
+        such call through, and ProviderUnavailableError is raised while that probe is in flight
+        and no other provider can take the call.
+        """
+        candidates = [name for name in self.order if self.api_key(name)]
+        chosen = next((name for name in candidates
+                       if self._probe_ok(name) and (self.breakers[name].acquire() if acquire
+                                                    else self.breakers[name].allows_calls())), None)
+        if chosen is None and candidates:
+            if acquire and any(self.breakers[name].probing for name in candidates):
+                get_metrics().incr('llm_calls_refused')
+                raise ProviderUnavailableError("every LLM provider is unavailable; a recovery probe is in flight")
+            # Every provider looks unhealthy: try the one whose circuit opened first rather than stop
+            chosen = min(candidates, key=lambda name: self.breakers[name].opened_at or 0)
+            if acquire:
+                self.breakers[chosen].probe_started = time.time()  # Only this call tests it
+        if chosen is None:
+            print("❌ No valid API key found. Please check your .env file.")
+            return None
+        if chosen != self.current:
+            print(f"✅ Using {PROVIDERS[chosen]['label']} API")
+            self.current = chosen
+        return self.client(chosen, tier)
+
+    def healthy(self):
+        """Providers that could take the next call: a key, a passing probe and a closed circuit"""
+        return [name for name in self.order
+                if self.api_key(name) and self.breakers[name].allows_calls() and self._probe_ok(name)]
+
+    def record_success(self, provider):
+        self.breakers[provider].record_success()
+
+    def record_error(self, provider, error):
+        kind = classify_llm_error(error)
+        breaker = self.breakers[provider]
+        if kind is None:
+            breaker.release()
+            return
+        breaker.record_failure(fatal=kind == 'fatal')
+        if not breaker.allows_calls():
+            print(f"⚠️ {PROVIDERS[provider]['label']} circuit opened after: {error}")
+
+
+_registry = None
+
+def get_registry():
+    """
+    The process-wide provider registry
+    El registro de proveedores compartido por todo el proceso
+    """
+    global _registry
+    if _registry is None:
+        _registry = ProviderRegistry()
+    return _registry
@@ -0,0 +1,177 @@
+import asyncio
+import gc
+import os
+import signal
+import time
+import tracemalloc
+from collections import Counter, deque
+from metrics import get_metrics, rss_bytes
+
+## Defaults for memory instrumentation
+# EN: How often memory is sampled, where dumps go and how much history is kept in memory
+# ES: Cada cuánto se mide la memoria, dónde van los volcados y cuánto historial se guarda en memoria
+DEFAULT_SAMPLE_SECONDS = 60
+DEFAULT_DUMP_PATH = os.path.join('logs', 'memory.txt')
+DEFAULT_TOP_SITES = 15
+DEFAULT_TRACE_FRAMES = 1        # One frame per allocation: enough for per-line top sites, cheapest to trace
+MAX_SAMPLES = 120               # Samples kept for dumps; every sample is also in the metrics log
+MEMORY_EXIT_CODE = 3            # Exit status after the growth limit stops the run (lets a supervisor restart it)
+MB = 1024 * 1024
+
+
+def _env_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+## Periodic memory snapshots for long runs
+# EN: RSS (and optionally the traced Python heap) sampled in the background, dumped on SIGUSR1
+# ES: RSS (y opcionalmente el heap de Python) medido en segundo plano, volcado con SIGUSR1
+class MemoryMonitor:
+    """
+    Samples the process memory every `interval` seconds while the runner is alive.
+
+    Growth is measured against the first sample, taken once the browser and libraries have
+    loaded. With `max_growth_mb`, crossing the limit writes a dump and cancels the run task,
+    so the process exits with MEMORY_EXIT_CODE instead of swapping for days. With `trace`,
+    tracemalloc is on and dumps list the allocation sites that grew the most.
+    """
+
+    def __init__(self, interval=None, max_growth_mb=None, trace=None, dump_path=None, top=DEFAULT_TOP_SITES):
+        self.interval = interval if interval is not None else float(os.getenv('MEMORY_SAMPLE_SECONDS', DEFAULT_SAMPLE_SECONDS))
+        self.max_growth_mb = max_growth_mb if max_growth_mb is not None else _env_float('MEMORY_MAX_GROWTH_MB')
+        self.trace = trace if trace is not None else os.getenv('MEMORY_TRACE', '').lower() in ('1', 'true', 'yes')
+        self.dump_path = dump_path or os.getenv('MEMORY_DUMP_PATH', DEFAULT_DUMP_PATH)
+        self.top = top
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.baseline = None            # First sample
+        self.exceeded = False
+        self._snapshot = None           # tracemalloc snapshot taken with the baseline
+        self._target = None             # Task cancelled when the growth limit is crossed
+        self._task = None
+
+    def start(self, target=None):
+        """Start sampling in the background; `target` is the task to stop when the limit is crossed"""
+        if self._task is not None:
+            return self
+        self._target = target
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(DEFAULT_TRACE_FRAMES)
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, lambda: self.dump('signal'))
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass  # No SIGUSR1 on Windows; dumps still happen when the limit is crossed
+        if self.interval > 0:
+            self._task = loop.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"⚠️ Memory sample failed: {e}")
+
+    def sample(self):
+        # EN: One reading: RSS, traced heap and contacts done; also checks the growth limit
+        # ES: Una lectura: RSS, heap rastreado y contactos hechos; también revisa el límite de crecimiento
+        """Record one memory sample and return it"""
+        metrics = get_metrics()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        sample = {
+            'ts': round(time.time(), 1),
+            'rss': rss_bytes(),
+            'traced': traced,
+            'contacts': metrics.total('contacts'),
+        }
+        if self.baseline is None:
+            self.baseline = sample
+            if tracemalloc.is_tracing():
+                self._snapshot = tracemalloc.take_snapshot()
+        sample['growth'] = (sample['rss'] or 0) - (self.baseline['rss'] or 0)
+        self.samples.append(sample)
+
+        metrics.set_gauge('memory_rss_bytes', sample['rss'] or 0)
+        metrics.set_gauge('memory_growth_bytes', sample['growth'])
+        if traced is not None:
+            metrics.set_gauge('memory_traced_bytes', traced)
+        metrics.emit({'type': 'memory', **sample})
+
+        if self.max_growth_mb and sample['growth'] > self.max_growth_mb * MB and not self.exceeded:
+            self.exceeded = True
+            print(f"🛑 Memory grew {sample['growth'] / MB:.0f} MB since start "
+                  f"(limit {self.max_growth_mb:.0f} MB), stopping the run")
+            metrics.incr('memory_limit_exceeded')
+            self.dump('growth limit')
+            if self._target is not None:
+                self._target.cancel()
+        return sample
+
+    def report(self, reason):
+        """Text report: readings, top allocation sites (when tracing) and the most common live objects"""
+        now = self.samples[-1] if self.samples else {'rss': rss_bytes()}
+        lines = [f"=== Memory dump ({reason}) at {time.strftime('%Y-%m-%d %H:%M:%S')} ==="]
+        lines.append(f"RSS: {(now['rss'] or 0) / MB:.1f} MB"
+                     + (f", baseline {(self.baseline['rss'] or 0) / MB:.1f} MB" if self.baseline else ''))
+        for sample in list(self.samples)[-10:]:
+            lines.append(f"  {time.strftime('%H:%M:%S', time.localtime(sample['ts']))} "
+                         f"rss={(sample['rss'] or 0) / MB:.1f}MB growth={sample['growth'] / MB:+.1f}MB "
+                         f"contacts={sample['contacts']}")
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            if self._snapshot is not None:
+                lines.append(f"Top {self.top} growing allocation sites since the baseline:")
+                lines.extend(f"  {stat}" for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top])
+            lines.append(f"Top {self.top} allocation sites:")
+            lines.extend(f"  {stat}" for stat in snapshot.statistics('lineno')[:self.top])
+        else:
+            lines.append("Allocation sites need tracing (--trace-memory or MEMORY_TRACE=1)")
+
+        lines.append("Most common live objects:")
+        counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+        lines.extend(f"  {count:>9} {name}" for name, count in counts.most_common(self.top))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, reason='signal'):
+        """Append a report to the dump file and say where it went"""
+        text = self.report(reason)
+        directory = os.path.dirname(self.dump_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.dump_path, 'a', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"🧠 Memory dump written to {self.dump_path}")
+        return text
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+
+
+_memory_monitor = None
+
+def get_memory_monitor():
+    """
+    The process-wide memory monitor
+    El monitor de memoria compartido por todo el proceso
+    """
+    global _memory_monitor
+    if _memory_monitor is None:
+        _memory_monitor = MemoryMonitor()
+    return _memory_monitor
+
+
+def configure_memory_monitor(**settings):
+    """Replace the process-wide monitor (used by the CLI flags)"""
+    global _memory_monitor
+    _memory_monitor = MemoryMonitor(**settings)
+    return _memory_monitor
@@ -0,0 +1,424 @@
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+## Where metrics are exported
+# EN: JSON-lines event log and Prometheus text file (both can be changed with env vars)
+# ES: Registro de eventos JSON-lines y archivo de texto Prometheus (ambos configurables con variables de entorno)
+DEFAULT_JSONL_PATH = os.path.join('logs', 'metrics.jsonl')
+DEFAULT_PROM_PATH = os.path.join('logs', 'metrics.prom')
+METRIC_PREFIX = 'followup'
+RECENT_CONTACTS = 20             # Finished contacts kept for the admin status
+DEFAULT_FLUSH_INTERVAL = 5       # Seconds between background writes of the event log and the Prometheus file
+DEFAULT_JSONL_MAX_MB = 50        # Size at which the event log is rotated to metrics.jsonl.1
+JSONL_BACKUPS = 3                # Rotated event logs kept (metrics.jsonl.1 .. .3)
+MAX_PENDING_EVENTS = 10000       # Events buffered in memory; the oldest are dropped beyond this
+
+
+def rss_bytes():
+    """Resident memory of this process in bytes (peak RSS where the current value is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# Stats of the contact being processed in the current task (None outside a contact)
+_current_contact = contextvars.ContextVar('metrics_contact', default=None)
+
+
+class ContactStats:
+    """Per-contact accumulators: stage durations, LLM usage and agent steps"""
+
+    def __init__(self, contact_id, list_name=None):
+        self.contact_id = contact_id
+        self.list_name = list_name
+        self.started_at = time.time()
+        self.stages = {}
+        self.llm_calls = 0
+        self.llm_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_cost = 0.0
+        self.tiers = {}               # model tier -> {'calls', 'latency', 'cost'}
+        self.agent_steps = 0
+        self.retries = 0
+        self.path = None
+        self.result = None
+
+    def to_dict(self):
+        return {
+            'contact_id': self.contact_id,
+            'list': self.list_name,
+            'duration': round(time.time() - self.started_at, 3),
+            'result': self.result,
+            'path': self.path,
+            'stages': {name: round(value, 3) for name, value in self.stages.items()},
+            'llm_calls': self.llm_calls,
+            'llm_latency': round(self.llm_latency, 3),
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'llm_cost': round(self.llm_cost, 6),
+            'tiers': {tier: {key: round(value, 6) for key, value in entry.items()} for tier, entry in self.tiers.items()},
+            'agent_steps': self.agent_steps,
+            'retries': self.retries,
+        }
+
+
+class _Span:
+    """Times a stage; usable with both `with` and `async with`"""
+
+    def __init__(self, metrics, stage, labels):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.started, error=exc_type is not None,
+                                   **self.labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _ContactScope:
+    """Binds a ContactStats to the current task and emits its summary at the end"""
+
+    def __init__(self, metrics, stats):
+        self.metrics = metrics
+        self.stats = stats
+
+    def __enter__(self):
+        self.token = _current_contact.set(self.stats)
+        self.metrics.begin_contact(self.stats)
+        return self.stats
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_contact.reset(self.token)
+        if self.stats.result is None:
+            self.stats.result = 'error' if exc_type else 'unknown'
+        self.metrics.finish_contact(self.stats)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+## Process-wide metrics registry
+# EN: Spans per stage, counters, LLM usage and contacts/hour, exported as JSON-lines and Prometheus text
+# ES: Tramos por etapa, contadores, uso del LLM y contactos por hora, exportados como JSON-lines y Prometheus
+class Metrics:
+    """Collects timings and counters for the follow-up runner"""
+
+    def __init__(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = jsonl_path or os.getenv('METRICS_JSONL_PATH', DEFAULT_JSONL_PATH)
+        self.prom_path = prom_path or os.getenv('METRICS_PROM_PATH', DEFAULT_PROM_PATH)
+        self._lock = threading.Lock()
+        self._counters = {}              # (name, labels) -> value
+        self._stages = {}                # (stage, labels) -> [count, sum, max]
+        self._gauges = {}                # name -> last value (e.g. memory readings)
+        self._finished = deque()         # Finish times of contacts in the last hour
+        self._active = {}                # id(stats) -> ContactStats of contacts being processed
+        self._recent = deque(maxlen=RECENT_CONTACTS)   # Summaries of the last finished contacts
+        self.flush_interval = float(os.getenv('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+        self.max_bytes = float(os.getenv('METRICS_JSONL_MAX_MB', DEFAULT_JSONL_MAX_MB)) * 1024 * 1024
+        self._pending = deque(maxlen=MAX_PENDING_EVENTS)   # Events not yet written to the JSON-lines log
+        self._write_lock = threading.Lock()
+        self._jsonl = None
+        self._worker = None
+        self.started_at = time.time()
+
+    # ---- recording -------------------------------------------------------
+
+    def span(self, stage, **labels):
+        """Time a stage: `with metrics.span('fetch_contacts'):`"""
+        return _Span(self, stage, labels)
+
+    def contact(self, contact_id, list_name=None):
+        """Scope per-contact stats: `with metrics.contact(contact['id']) as stats:`"""
+        return _ContactScope(self, ContactStats(contact_id, list_name))
+
+    def current_contact(self):
+        return _current_contact.get()
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def total(self, name):
+        """Sum of a counter over all its labels"""
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe_stage(self, stage, duration, error=False, **labels):
+        key = (stage, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self._stages.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+        stats = _current_contact.get()
+        if stats is not None:
+            stats.stages[stage] = stats.stages.get(stage, 0.0) + duration
+        if error:
+            self.incr('errors', stage=stage)
+        self.emit({'type': 'span', 'stage': stage, 'duration': round(duration, 4), 'error': error,
+                   'contact_id': stats.contact_id if stats else None, **labels})
+
+    def record_llm_call(self, provider, latency, prompt_tokens=0, completion_tokens=0, error=False,
+                        tier='fast', cost=0.0):
+        # EN: Called by the LLM callback for every real model call
+        # ES: Llamado por el callback del LLM en cada llamada real al modelo
+        self.incr('llm_calls', provider=provider, tier=tier)
+        self.incr('llm_prompt_tokens', prompt_tokens, provider=provider, tier=tier)
+        self.incr('llm_completion_tokens', completion_tokens, provider=provider, tier=tier)
+        self.incr('llm_cost_usd', cost, provider=provider, tier=tier)
+        if error:
+            self.incr('llm_errors', provider=provider, tier=tier)
+        self.observe_stage('llm_call', latency, error=error, provider=provider, tier=tier)
+        stats = _current_contact.get()
+        if stats is not None:
+            stats.llm_calls += 1
+            stats.llm_latency += latency
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.llm_cost += cost
+            entry = stats.tiers.setdefault(tier, {'calls': 0, 'latency': 0.0, 'cost': 0.0})
+            entry['calls'] += 1
+            entry['latency'] += latency
+            entry['cost'] += cost
+
+    def begin_contact(self, stats):
+        with self._lock:
+            self._active[id(stats)] = stats
+
+    def finish_contact(self, stats):
+        self.incr('contacts', result=stats.result)
+        now = time.time()
+        summary = stats.to_dict()
+        with self._lock:
+            self._active.pop(id(stats), None)
+            self._recent.append(summary)
+            self._finished.append(now)
+            while self._finished and now - self._finished[0] > 3600:
+                self._finished.popleft()
+        self.emit({'type': 'contact', **summary})
+
+    def active_contacts(self):
+        """Stats so far of the contacts being processed (for the admin status)"""
+        with self._lock:
+            active = list(self._active.values())
+        return [stats.to_dict() for stats in active]
+
+    def recent_contacts(self):
+        """Summaries of the last RECENT_CONTACTS finished contacts, oldest first"""
+        with self._lock:
+            return list(self._recent)
+
+    def stage_summary(self):
+        """{stage: {count, mean, max}} over the whole run, labels merged"""
+        summary = {}
+        with self._lock:
+            for (stage, _), (count, total, longest) in self._stages.items():
+                entry = summary.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+        return {stage: {'count': count, 'mean': round(total / count, 3) if count else None, 'max': round(longest, 3)}
+                for stage, (count, total, longest) in sorted(summary.items())}
+
+    def contacts_per_hour(self):
+        now = time.time()
+        with self._lock:
+            recent = [t for t in self._finished if now - t <= 3600]
+        elapsed = min(3600, max(now - self.started_at, 1))
+        return len(recent) * 3600 / elapsed
+
+    # ---- export ----------------------------------------------------------
+
+    def emit(self, event):
+        # EN: Never touches the disk: events are buffered and written by the background writer
+        # ES: Nunca toca el disco: los eventos se acumulan y los escribe el proceso en segundo plano
+        """Queue one event for the JSON-lines log"""
+        event = {'ts': round(time.time(), 3), **event}
+        with self._lock:
+            dropped = len(self._pending) == self._pending.maxlen
+            self._pending.append(event)
+            backlog = len(self._pending)
+        if dropped:
+            self.incr('metrics_events_dropped')
+        if self._worker is None and backlog >= MAX_PENDING_EVENTS // 10:
+            self.flush()  # No writer running (e.g. a script without an event loop): write in batches
+
+    def start(self):
+        """Start the background writer on the running event loop (every flush_interval seconds)"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """Write the buffered events and the Prometheus file (runs in a worker thread)"""
+        with self._write_lock:
+            with self._lock:
+                events = list(self._pending)
+                self._pending.clear()
+            if events:
+                try:
+                    self._write_events(events)
+                except OSError as e:
+                    self.incr('metrics_write_errors')
+                    print(f"⚠️ Could not write metrics log {self.jsonl_path}: {e}")
+            try:
+                self.write_prometheus()
+            except OSError as e:
+                self.incr('metrics_write_errors')
+                print(f"⚠️ Could not write metrics file {self.prom_path}: {e}")
+
+    def _write_events(self, events):
+        if self._jsonl is None:
+            directory = os.path.dirname(self.jsonl_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._jsonl = open(self.jsonl_path, 'a', encoding='utf-8')
+        self._jsonl.write(''.join(json.dumps(event, default=str) + '\n' for event in events))
+        self._jsonl.flush()
+        if self._jsonl.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        # EN: Size-based rotation: metrics.jsonl -> .1 -> .2 ...; the oldest beyond JSONL_BACKUPS is deleted
+        # ES: Rotación por tamaño: metrics.jsonl -> .1 -> .2 ...; se borra el más antiguo pasado JSONL_BACKUPS
+        self._jsonl.close()
+        self._jsonl = None
+        for index in range(JSONL_BACKUPS, 0, -1):
+            source = f"{self.jsonl_path}.{index - 1}" if index > 1 else self.jsonl_path
+            if os.path.exists(source):
+                os.replace(source, f"{self.jsonl_path}.{index}")
+
+    @staticmethod
+    def _escape(value):
+        """Escape a Prometheus label value (backslash, double quote and newline)"""
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @classmethod
+    def _labels(cls, labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{key}="{cls._escape(value)}"' for key, value in labels) + '}'
+
+    def render_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            stages = {key: list(value) for key, value in self._stages.items()}
+            gauges = dict(self._gauges)
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{self._labels(labels)} {value}")
+        metric = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for (stage, labels), (count, total, _) in sorted(stages.items()):
+            label_text = self._labels((('stage', stage),) + labels)
+            lines.append(f"{metric}_count{label_text} {count}")
+            lines.append(f"{metric}_sum{label_text} {total:.6f}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_duration_max_seconds gauge")
+        for (stage, labels), (_, _, maximum) in sorted(stages.items()):
+            lines.append(f"{METRIC_PREFIX}_stage_duration_max_seconds{self._labels((('stage', stage),) + labels)} {maximum:.6f}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_contacts_per_hour gauge")
+        lines.append(f"{METRIC_PREFIX}_contacts_per_hour {self.contacts_per_hour():.3f}")
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            lines.append(f"{METRIC_PREFIX}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self):
+        """Write the Prometheus text file atomically (for node_exporter's textfile collector)"""
+        directory = os.path.dirname(self.prom_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.prom_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, self.prom_path)
+
+    async def serve(self, port, host='127.0.0.1'):
+        # EN: Minimal HTTP endpoint for Prometheus scraping (GET /metrics)
+        # ES: Endpoint HTTP mínimo para que Prometheus lea las métricas (GET /metrics)
+        """Start a localhost HTTP server exposing the metrics"""
+        async def handle(reader, writer):
+            try:
+                await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                pass
+            body = self.render_prometheus().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        print(f"📈 Metrics available at http://{host}:{port}/metrics")
+        return server
+
+    def close(self):
+        """Stop the writer and write whatever is still buffered"""
+        if self._worker is not None and not self._worker.done():
+            try:
+                self._worker.cancel()
+            except RuntimeError:
+                pass  # Its loop is already closed
+        self._worker = None
+        self.flush()
+        with self._write_lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+_metrics = None
+
+def get_metrics():
+    """
+    The process-wide metrics registry
+    El registro de métricas compartido por todo el proceso
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils import api_base_url
+from metrics import get_metrics
+
+## Defaults for the status outbox
+# EN: Where the journal lives and how retries/batches behave
+# ES: Dónde vive el journal y cómo se comportan los reintentos y lotes
+DEFAULT_OUTBOX_PATH = os.path.join('data', 'outbox.sqlite3')
+DEFAULT_TIMEOUT = 10            # Seconds per HTTP request
+DEFAULT_BATCH_SIZE = 20         # Updates drained per flush cycle
+DEFAULT_MAX_ATTEMPTS = 8        # After this many failures the update is parked as dead
+BACKOFF_BASE = 2                # Seconds, doubled on every failed attempt
+BACKOFF_MAX = 300               # Never wait more than 5 minutes between attempts
+
+## Write-behind outbox for contact status updates
+# EN: Journals every status write to SQLite first, then sends it from a background task
+# ES: Registra cada actualización de estado en SQLite y luego la envía desde una tarea en segundo plano
+class StatusOutbox:
+    """
+    Durable, non-blocking queue of contact status updates.
+
+    enqueue() only writes to the local journal, so it is safe to call from the send path.
+    Repeated updates for the same contact collapse into the latest one. A background task
+    sends pending rows with a pooled HTTP session, retrying with exponential backoff.
+    """
+
+    def __init__(self, path=None, base_url=None, batch_url=None, batch_size=None,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, timeout=DEFAULT_TIMEOUT):
+        self.path = path or os.getenv('OUTBOX_PATH', DEFAULT_OUTBOX_PATH)
+        self.base_url = base_url or api_base_url()
+        # Optional endpoint that accepts a list of updates in one request
+        self.batch_url = batch_url or os.getenv('OUTBOX_BATCH_URL')
+        self.batch_size = int(batch_size or os.getenv('OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                contact_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                status_text TEXT,
+                version INTEGER NOT NULL DEFAULT 1,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                dead INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+        # EN: One pooled session (keep-alive connections) shared by every request
+        # ES: Una sola sesión con conexiones reutilizables para todas las solicitudes
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.batch_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        self._loop = None
+        self._drain_lock = asyncio.Lock()
+        self._wakeup = None
+        self._worker = None
+        self._closing = False
+
+    def enqueue(self, contact_id, status, message):
+        # EN: Record the update locally; the newest status for a contact replaces older ones
+        # ES: Registra la actualización localmente; el estado más reciente reemplaza a los anteriores
+        """Journal a status update and wake the sender. Never performs network I/O."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO outbox (contact_id, status, status_text, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(contact_id) DO UPDATE SET
+                    status = excluded.status,
+                    status_text = excluded.status_text,
+                    version = outbox.version + 1,
+                    attempts = 0,
+                    next_attempt_at = 0,
+                    dead = 0,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at
+            """, (str(contact_id), status, message, now))
+        self._notify()
+        return True
+
+    def pending_count(self):
+        """Number of updates still waiting to be delivered"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE dead = 0").fetchone()[0]
+
+    def _notify(self):
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Loop already closed; the row stays in the journal for the next run
+            pass
+
+    def start(self):
+        # EN: Start the background sender on the running event loop
+        # ES: Inicia el envío en segundo plano en el bucle de eventos actual
+        """Start the background delivery task"""
+        if self._worker is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._wakeup.set()  # Deliver anything left over from a previous run
+            self._worker = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while not self._closing:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            delay = await self._drain()
+            if delay is not None and not self._closing:
+                # Sleep until the next retry is due, unless a new update arrives first
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    self._wakeup.set()
+
+    def _due_rows(self, force=False, after=None):
+        # When forcing (shutdown flush) retries are sent now, walking the journal once by (updated_at, contact_id):
+        # the contact id breaks ties, so rows sharing an updated_at across a page boundary are not skipped
+        due_before = float('inf') if force else time.time()
+        after_time, after_id = after if after is not None else (-1, '')
+        with self._lock:
+            return self._db.execute("""
+                SELECT contact_id, status, status_text, version, attempts, updated_at FROM outbox
+                WHERE dead = 0 AND next_attempt_at <= ? AND (updated_at, contact_id) > (?, ?)
+                ORDER BY updated_at, contact_id LIMIT ?
+            """, (due_before, after_time, after_id, self.batch_size)).fetchall()
+
+    def _next_due_in(self):
+        with self._lock:
+            row = self._db.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE dead = 0").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    async def _drain(self, force=False):
+        """Send every due row; return seconds until the next retry or None if the journal is empty"""
+        async with self._drain_lock:
+            after = None
+            while True:
+                rows = self._due_rows(force=force, after=after)
+                if not rows:
+                    return self._next_due_in()
+                if force:
+                    after = (rows[-1][5], rows[-1][0])
+                if self.batch_url:
+                    results = await asyncio.to_thread(self._send_batch, rows)
+                else:
+                    results = await asyncio.gather(*(asyncio.to_thread(self._send_one, row) for row in rows))
+                for row, (ok, permanent, error) in zip(rows, results):
+                    self._settle(row, ok, permanent, error)
+
+    def _send_one(self, row):
+        contact_id, status, status_text = row[:3]
+        try:
+            with get_metrics().span('status_put'):
+                response = self._session.put(
+                    f"{self.base_url}/{contact_id}",
+                    json={"status": status, "statusText": status_text},
+                    timeout=self.timeout,
+                )
+        except requests.exceptions.RequestException as e:
+            return False, False, f"Network error: {e}"
+        return self._classify(response)
+
+    def _send_batch(self, rows):
+        payload = [{"id": row[0], "status": row[1], "statusText": row[2]} for row in rows]
+        try:
+            with get_metrics().span('status_put', batch=len(rows)):
+                response = self._session.put(self.batch_url, json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            return [(False, False, f"Network error: {e}")] * len(rows)
+        return [self._classify(response)] * len(rows)
+
+    @staticmethod
+    def _classify(response):
+        """Return (ok, permanent_failure, error) for an API response"""
+        if response.status_code == 200:
+            return True, False, None
+        error = f"HTTP {response.status_code}"
+        if response.status_code == 400:
+            error += f": {response.text}"
+        # 429 and 5xx are worth retrying; other client errors will never succeed
+        permanent = 400 <= response.status_code < 500 and response.status_code != 429
+        return False, permanent, error
+
+    def _settle(self, row, ok, permanent, error):
+        contact_id, status, _, version, attempts = row[:5]
+        with self._lock:
+            if ok:
+                # Only delete if no newer update arrived while this one was in flight
+                self._db.execute("DELETE FROM outbox WHERE contact_id = ? AND version = ?", (contact_id, version))
+                get_metrics().incr('status_updates', status=status)
+                print(f"Successfully updated contact {contact_id} to status {status}")
+                print(f"Contacto {contact_id} actualizado exitosamente al estado {status}")
+                return
+            attempts += 1
+            dead = permanent or attempts >= self.max_attempts
+            delay = min(BACKOFF_BASE * (2 ** attempts), BACKOFF_MAX) * random.uniform(0.8, 1.2)
+            self._db.execute("""
+                UPDATE outbox SET attempts = ?, next_attempt_at = ?, dead = ?, last_error = ?
+                WHERE contact_id = ? AND version = ?
+            """, (attempts, time.time() + delay, int(dead), error, contact_id, version))
+        get_metrics().incr('status_update_failures', final=dead)
+        if dead:
+            print(f"❌ Giving up on status update for contact {contact_id} ({status}): {error}")
+            print(f"❌ Se abandona la actualización del contacto {contact_id} ({status}): {error}")
+        else:
+            print(f"⚠️ Status update for contact {contact_id} failed ({error}), retrying in {delay:.0f}s")
+
+    async def flush(self, timeout=30):
+        # EN: Wait until every due update has been delivered (or the timeout passes)
+        # ES: Espera hasta que todas las actualizaciones pendientes se entreguen (o pase el tiempo límite)
+        """Deliver all pending updates now"""
+        try:
+            await asyncio.wait_for(self._drain(force=True), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Outbox flush timed out with {self.pending_count()} updates pending")
+        return self.pending_count() == 0
+
+    async def close(self, timeout=30):
+        # EN: Flush what we can, stop the worker and keep the rest in the journal for the next run
+        # ES: Envía lo que se pueda, detiene el proceso y deja el resto en el journal para la próxima ejecución
+        """Flush pending updates and release resources"""
+        self._closing = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.flush(timeout=timeout)
+        remaining = self.pending_count()
+        if remaining:
+            print(f"⚠️ {remaining} status updates kept in {self.path} for the next run")
+        self._session.close()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import random
+import sys
+import time
+if os.name == 'nt':
+    import msvcrt
+
+## Clock used by the pacing components
+# EN: Real time by default; a simulation can swap in its own clock with the same two methods
+# ES: Tiempo real por defecto; una simulación puede usar su propio reloj con los mismos dos métodos
+class SystemClock:
+    """Wall-clock time and asyncio sleeps"""
+
+    def now(self):
+        return time.time()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+## Token bucket for send rates
+# EN: Allows at most `rate_per_hour` sends per hour, with bursts of up to `capacity`
+# ES: Permite como máximo `rate_per_hour` envíos por hora, con ráfagas de hasta `capacity`
+class TokenBucket:
+    """Hourly send-rate limiter"""
+
+    def __init__(self, rate_per_hour, capacity=1, clock=None):
+        self.rate = rate_per_hour / 3600.0
+        self.capacity = capacity
+        self.clock = clock or SystemClock()
+        self.tokens = capacity
+        self.updated_at = self.clock.now()
+
+    def _refill(self):
+        now = self.clock.now()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def seconds_until_available(self):
+        """Seconds until one token is available (0 if one is available now)"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Consume one token (may go negative if taken early)"""
+        self._refill()
+        self.tokens -= 1
+
+
+## Backoff policy for retries after errors
+# EN: Linear (the original 60s, 120s, ... up to 5 minutes) or exponential, with optional jitter
+# ES: Lineal (los 60s, 120s, ... hasta 5 minutos originales) o exponencial, con variación opcional
+class BackoffPolicy:
+    """Delay to wait after the Nth consecutive error"""
+
+    def __init__(self, base=60, maximum=300, kind='linear', jitter=0.0):
+        if kind not in ('linear', 'exponential'):
+            raise ValueError(f"Unknown backoff kind: {kind}")
+        self.base = base
+        self.maximum = maximum
+        self.kind = kind
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        attempt = max(1, attempt)
+        if self.kind == 'linear':
+            delay = self.base * attempt
+        else:
+            delay = self.base * (2 ** (attempt - 1))
+        delay = min(delay, self.maximum)
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+
+## Non-blocking pacing between sends
+# EN: Replaces countdown(): waits with asyncio so background work keeps running, Enter still skips
+# ES: Reemplaza countdown(): espera con asyncio para que el trabajo en segundo plano siga, Enter sigue saltando
+class Pacer:
+    """
+    Jittered gap between sends, an optional hourly cap and interruptible waits.
+
+    record_send() schedules the next allowed send at a random point in
+    [min_interval, max_interval]; wait_turn() sleeps until then without blocking the loop.
+    """
+
+    def __init__(self, min_interval=60, max_interval=240, max_per_hour=None, burst=1,
+                 interactive=None, clock=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.clock = clock or SystemClock()
+        self.bucket = TokenBucket(max_per_hour, burst, self.clock) if max_per_hour else None
+        # Only offer "Press Enter to skip" when a person is watching the terminal
+        self.interactive = sys.stdin.isatty() if interactive is None else interactive
+        self._next_send_at = 0
+        self._skip = None
+
+    def set_intervals(self, min_interval, max_interval):
+        """Change the jitter window (applies from the next send)"""
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+
+    def set_max_per_hour(self, max_per_hour, burst=1):
+        """Change (or remove, with None/0) the hourly cap; the new bucket starts full"""
+        self.bucket = TokenBucket(max_per_hour, burst, self.clock) if max_per_hour else None
+
+    def next_interval(self):
+        return random.uniform(self.min_interval, self.max_interval)
+
+    def record_send(self):
+        # EN: Register a send and schedule the next one with random jitter
+        # ES: Registra un envío y programa el siguiente con variación aleatoria
+        """Register a send and schedule the next allowed one"""
+        self._next_send_at = self.clock.now() + self.next_interval()
+        if self.bucket:
+            self.bucket.take()
+
+    def seconds_until_ready(self):
+        """How long until the next send is allowed"""
+        wait = max(0, self._next_send_at - self.clock.now())
+        if self.bucket:
+            wait = max(wait, self.bucket.seconds_until_available())
+        return wait
+
+    async def wait_turn(self, label="before next contact"):
+        """Wait until the next send is allowed"""
+        wait = self.seconds_until_ready()
+        if wait > 0:
+            await self.wait(wait, label)
+        return wait
+
+    def skip(self):
+        """Cut the current wait short (Enter key or an admin command)"""
+        if self._skip is not None:
+            self._skip.set()
+
+    async def wait(self, seconds, label="before next contact", skippable=True):
+        # EN: Sleep without blocking the event loop; Enter skips the wait in a terminal
+        # ES: Espera sin bloquear el bucle de eventos; Enter salta la espera en una terminal
+        """Wait `seconds`, returning early if skipped. Returns True if the wait was skipped."""
+        seconds = max(0, seconds)
+        self._skip = asyncio.Event()
+        if not self.interactive:
+            print(f"Waiting {seconds:.0f} seconds {label}...")
+            try:
+                return await self._sleep_or_skip(seconds)
+            finally:
+                self._skip = None
+
+        stop_watching = self._watch_enter() if skippable else None
+        deadline = self.clock.now() + seconds
+        try:
+            while True:
+                remaining = deadline - self.clock.now()
+                if remaining <= 0:
+                    return False
+                hint = " (Press Enter to skip)" if skippable else ""
+                sys.stdout.write(f"\rWaiting {int(remaining) + 1} seconds {label}...{hint} ")
+                sys.stdout.flush()
+                if await self._sleep_or_skip(min(1, remaining)):
+                    return True
+        finally:
+            if stop_watching:
+                stop_watching()
+            self._skip = None
+            sys.stdout.write("\r" + " " * 80 + "\r")  # Clear the line
+            sys.stdout.flush()
+
+    async def _sleep_or_skip(self, seconds):
+        """Sleep on the pacer's clock unless skip() is called first; True if skipped"""
+        sleeper = asyncio.ensure_future(self.clock.sleep(seconds))
+        skipper = asyncio.ensure_future(self._skip.wait())
+        try:
+            done, _ = await asyncio.wait({sleeper, skipper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Also when the waiting task itself is cancelled (e.g. a worker stopped by a resize)
+            for task in (sleeper, skipper):
+                if not task.done():
+                    task.cancel()
+        return skipper in done
+
+    def _watch_enter(self):
+        """Watch stdin for Enter without blocking; returns a function that stops watching"""
+        loop = asyncio.get_running_loop()
+        skip = self._skip
+
+        if os.name == 'nt':
+            # No add_reader for the Windows console: poll the keyboard from a small task
+            async def poll_keyboard():
+                while True:
+                    if msvcrt.kbhit() and msvcrt.getch() == b'\r':
+                        skip.set()
+                        return
+                    await asyncio.sleep(0.1)
+            task = loop.create_task(poll_keyboard())
+            return task.cancel
+
+        def on_input():
+            if sys.stdin.readline() is not None:
+                skip.set()
+
+        try:
+            loop.add_reader(sys.stdin, on_input)
+        except (NotImplementedError, ValueError, OSError):
+            return None
+        return lambda: loop.remove_reader(sys.stdin)
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from metrics import get_metrics
+
+## Defaults for the action-plan cache
+# EN: Where recorded agent plans are kept, and how a contact's values are turned into plan variables
+# ES: Dónde se guardan los planes grabados del agente y cómo los valores de un contacto se vuelven variables
+DEFAULT_PLAN_PATH = os.path.join('data', 'plans.sqlite3')
+MIN_VALUE_LENGTH = 4            # Shorter contact values (e.g. "en") are too ambiguous to substitute
+REPLAY_DELAY = 0.5              # Seconds between replayed actions, like browser_use's own rerun
+TOKEN = '[[plan:%s]]'          # Message keys contain {course}, so tokens avoid braces
+TOKEN_PATTERN = re.compile(r"\[\[plan:([^\]]+)\]\]")
+TYPING_ACTIONS = ('input_text', 'send_keys')
+NAVIGATION_ACTIONS = ('go_to_url', 'open_tab')
+
+
+def plan_key(steps):
+    """Cache key of the tasks handed to the LLM agent: the hashes of their templates, or None"""
+    templates = [step.get('template') for step in steps]
+    if not templates or not all(templates):
+        return None
+    return hashlib.sha1('|'.join(templates).encode('utf-8')).hexdigest()[:20]
+
+
+def _map_strings(value, fn):
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, list):
+        return [_map_strings(item, fn) for item in value]
+    if isinstance(value, dict):
+        return {key: _map_strings(item, fn) for key, item in value.items()}
+    return value
+
+
+def _actions(plan):
+    for item in plan['history']:
+        for action in (item.get('model_output') or {}).get('action') or []:
+            for name, params in action.items():
+                if params is not None:
+                    yield name, params
+
+
+def templatize(history, variables):
+    # EN: Replace the recording contact's values with variable tokens; refuse plans that would leak them
+    # ES: Reemplaza los valores del contacto grabado por variables; rechaza planes que los filtrarían
+    """
+    Turn a successful browser_use history (AgentHistoryList.model_dump()) into a reusable plan,
+    or return None when a typed text or URL does not come entirely from the contact's variables
+    (replaying it would send one contact's data to another).
+    """
+    pairs = sorted(((name, value.strip()) for name, value in variables.items()
+                    if value and len(value.strip()) >= MIN_VALUE_LENGTH), key=lambda pair: -len(pair[1]))
+
+    def substitute(text):
+        for name, value in pairs:
+            text = text.replace(value, TOKEN % name)
+        return text
+
+    items = []
+    for item in history.get('history') or []:
+        if not item.get('model_output'):
+            continue  # Failed steps are not part of the plan
+        state = dict(item.get('state') or {}, screenshot=None)
+        items.append(_map_strings({**item, 'state': state, 'result': []}, substitute))
+    plan = {'history': items}
+    if not items:
+        return None
+
+    for name, params in _actions(plan):
+        if name in TYPING_ACTIONS:
+            typed = params.get('text') or params.get('keys') or ''
+            if typed.strip() and not TOKEN_PATTERN.fullmatch(typed.strip()):
+                return None
+        if name in NAVIGATION_ACTIONS and re.search(r"\d{7,}", TOKEN_PATTERN.sub('', params.get('url') or '')):
+            return None
+    return plan
+
+
+def fill(plan, variables):
+    """A copy of a plan with the variables of another contact, or None if one is missing"""
+    missing = []
+
+    def substitute(text):
+        def value(match):
+            if match.group(1) not in variables:
+                missing.append(match.group(1))
+                return match.group(0)
+            return variables[match.group(1)].strip()
+        return TOKEN_PATTERN.sub(value, text)
+
+    filled = _map_strings(plan, substitute)
+    return None if missing else filled
+
+
+## Durable cache of recorded agent plans
+# EN: One plan per (task templates, coarse page state); a mismatch during replay deletes it
+# ES: Un plan por (plantillas de tareas, estado aproximado de la página); un desajuste al repetirlo lo borra
+class PlanCache:
+    """
+    SQLite store of successful LLM agent runs, replayed for later contacts.
+
+    record() keeps a templatized plan after a clean run; lookup() returns it filled with
+    another contact's variables. An empty PLAN_CACHE_PATH disables the cache.
+    """
+
+    def __init__(self, path=None):
+        self.path = os.getenv('PLAN_CACHE_PATH', DEFAULT_PLAN_PATH) if path is None else path
+        self.enabled = bool(self.path)
+        self._plans = {}            # (key, fingerprint) -> plan, parsed once per process
+        self._lock = threading.Lock()
+        self._db = None
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS plans (
+                plan_key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (plan_key, fingerprint)
+            )
+        """)
+
+    def lookup(self, key, fingerprint, variables):
+        """The cached plan for these tasks and page state, filled for a contact, or None"""
+        if not self.enabled or key is None:
+            return None
+        with self._lock:
+            plan = self._plans.get((key, fingerprint))
+            if plan is None:
+                row = self._db.execute("SELECT plan FROM plans WHERE plan_key = ? AND fingerprint = ?",
+                                       (key, fingerprint)).fetchone()
+                plan = json.loads(row[0]) if row else None
+                if plan is not None:
+                    self._plans[(key, fingerprint)] = plan
+        filled = fill(plan, variables) if plan is not None else None
+        get_metrics().incr('plan_cache', result='hit' if filled else 'miss')
+        return filled
+
+    def record(self, key, fingerprint, history, variables):
+        """Keep the plan of a clean LLM run; returns False if it cannot be reused safely"""
+        if not self.enabled or key is None:
+            return False
+        plan = templatize(history, variables)
+        if plan is None:
+            get_metrics().incr('plan_cache', result='uncacheable')
+            return False
+        with self._lock:
+            self._plans[(key, fingerprint)] = plan
+            self._db.execute("""
+                INSERT INTO plans (plan_key, fingerprint, plan, created_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(plan_key, fingerprint) DO UPDATE SET
+                    plan = excluded.plan, hits = 0, created_at = excluded.created_at
+            """, (key, fingerprint, json.dumps(plan, ensure_ascii=False), time.time()))
+        get_metrics().incr('plan_cache', result='recorded')
+        return True
+
+    def hit(self, key, fingerprint):
+        if self.enabled:
+            with self._lock:
+                self._db.execute("UPDATE plans SET hits = hits + 1 WHERE plan_key = ? AND fingerprint = ?",
+                                 (key, fingerprint))
+
+    def invalidate(self, key, fingerprint):
+        """Forget a plan whose replay no longer matched the page"""
+        get_metrics().incr('plan_cache', result='invalidated')
+        if self.enabled:
+            with self._lock:
+                self._plans.pop((key, fingerprint), None)
+                self._db.execute("DELETE FROM plans WHERE plan_key = ? AND fingerprint = ?", (key, fingerprint))
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+
+_plan_cache = None
+
+def get_plan_cache():
+    """
+    The process-wide plan cache
+    La caché de planes compartida por todo el proceso
+    """
+    global _plan_cache
+    if _plan_cache is None:
+        _plan_cache = PlanCache()
+    return _plan_cache
+
+
+def reset_plan_cache():
+    """Close the process-wide cache (the next get_plan_cache() opens it again)"""
+    global _plan_cache
+    if _plan_cache is not None:
+        _plan_cache.close()
+    _plan_cache = None
@@ -0,0 +1,87 @@
+import asyncio
+from metrics import get_metrics
+
+
+## Pipelined preparation of the next contact
+# EN: While the current contact is paced, the next one is picked, rendered and its chat opened in the warm tab
+# ES: Mientras se espera el ritmo del contacto actual, el siguiente se elige, se procesa y se abre su chat
+class Prefetcher:
+    """
+    Prepares the next contact during the pacing window of the current one.
+
+    start() picks the next contact with the scheduler (validating and rendering it) and, with
+    a warm browser agent, opens its chat in the same tab. WhatsApp Web only allows one active
+    tab per session, so the chat is pre-opened in place rather than in a second tab. take()
+    re-validates the prepared contact against a fresh read of its feed; a contact that is no
+    longer pending or no longer valid is dropped and the pre-opened chat is discarded.
+    """
+
+    def __init__(self, scheduler, prepare):
+        self.scheduler = scheduler
+        self.prepare = prepare      # prepare(contacts, source) -> (contacts, rendered), as for scheduler.next
+        self._task = None
+        self._agent = None
+
+    def start(self, agent=None):
+        """Begin preparing the next contact in the background (agent: warm BrowserAgent to pre-open in)"""
+        self.cancel()
+        self._agent = agent
+        self._task = asyncio.create_task(self._prepare(agent))
+
+    async def _prepare(self, agent):
+        picked = await self.scheduler.next(self.prepare)
+        if not picked:
+            return None
+        source, contacts, rendered = picked
+        contact = contacts[0]
+        steps = rendered.get(contact.get('id')) or []
+        first = (steps[0].get('fast_path') or {}) if steps else {}
+        if agent is not None and first.get('action') == 'open_chat':
+            try:
+                await agent.preopen_chat(first.get('phone'))
+            except Exception as e:
+                # The contact itself is still valid; its open_chat step simply runs as usual
+                print(f"⚠️ Could not pre-open the chat of contact {contact.get('id')}: {e}")
+        get_metrics().incr('prefetch', result='prepared')
+        return source, contact
+
+    async def take(self):
+        # EN: Hand over the prepared contact if it is still pending and valid, else None
+        # ES: Entrega el contacto preparado si sigue pendiente y válido; si no, None
+        """Return (source, contacts, rendered) for the prepared contact, or None"""
+        task, self._task = self._task, None
+        if task is None:
+            return None
+        try:
+            prepared = await task
+        except asyncio.CancelledError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Preparing the next contact failed: {e}")
+            get_metrics().incr('prefetch', result='error')
+            self._discard()
+            return None
+        if prepared is None:
+            return None
+
+        source, contact = prepared
+        fresh = next((c for c in await source.feed.pending() if c.get('id') == contact.get('id')), None)
+        contacts, rendered = self.prepare([fresh], source) if fresh is not None else ([], {})
+        if not contacts:
+            print(f"Prepared contact {contact.get('id')} is no longer pending, dropping it")
+            get_metrics().incr('prefetch', result='invalidated')
+            self._discard()
+            return None
+        get_metrics().incr('prefetch', result='used')
+        return source, contacts, rendered
+
+    def _discard(self):
+        if self._agent is not None:
+            self._agent.prepared_chat = None
+
+    def cancel(self):
+        """Drop any preparation in progress (e.g. before the browser is reloaded or closed)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._discard()
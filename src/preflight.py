@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+import requests
+from agent import chrome_executable
+from llm import get_registry, PROVIDERS
+from utils import api_base_url, load_list_config
+
+## Exit statuses and limits of the preflight check
+# EN: --check runs every check at once and exits 0 when all pass, 1 when any fails
+# ES: --check ejecuta todas las verificaciones a la vez y termina con 0 si todas pasan, 1 si alguna falla
+EXIT_OK = 0
+EXIT_FAILED = 1
+CHECK_TIMEOUT = 3               # Seconds for each network check (PREFLIGHT_TIMEOUT)
+
+
+def _check_list(name):
+    list_config = load_list_config(name)
+    compiled = list_config.compiled
+    return f"{len(compiled.tasks)} tasks, {len(compiled.messages)} messages"
+
+
+def _check_chrome():
+    path = chrome_executable()
+    if not path:
+        raise RuntimeError("no Chrome path for this system (set CHROME_EXECUTABLE)")
+    if not os.path.isfile(path) or not os.access(path, os.X_OK):
+        raise RuntimeError(f"{path} is not an executable file (set CHROME_EXECUTABLE)")
+    return path
+
+
+async def _check_llm(timeout):
+    registry = get_registry()
+    configured = [name for name in registry.order if registry.api_key(name)]
+    if not configured:
+        raise RuntimeError("no API key found (set DEEPSEEK_API_KEY or OPENAI_API_KEY)")
+    # The same free probe the runner uses: listing models checks the key without billing a completion
+    results = await asyncio.wait_for(registry.probe(), timeout)
+    healthy = [name for name, ok in results.items() if ok]
+    summary = ', '.join(f"{PROVIDERS[name]['label']} {'ok' if ok else 'rejected'}" for name, ok in results.items())
+    if not healthy:
+        raise RuntimeError(summary)
+    return summary
+
+
+def _check_api(name, timeout):
+    url = f"{api_base_url()}/{name}"
+    response = requests.get(url, params={'status': 'PENDING', 'page': 1, 'limit': 1}, timeout=timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned HTTP {response.status_code}")
+    return f"{url} reachable"
+
+
+async def _run_check(label, check, *args):
+    started = time.monotonic()
+    try:
+        if asyncio.iscoroutinefunction(check):
+            detail = await check(*args)
+        else:
+            detail = await asyncio.to_thread(check, *args)
+        return label, True, detail, time.monotonic() - started
+    except Exception as e:
+        return label, False, str(e) or type(e).__name__, time.monotonic() - started
+
+
+async def preflight(list_names, timeout=None):
+    # EN: Validate the lists, Chrome, the LLM keys and the followups API concurrently, without a browser
+    # ES: Valida las listas, Chrome, las claves del LLM y la API de seguimientos en paralelo, sin navegador
+    """Run every check concurrently and return a list of (label, ok, detail, seconds)"""
+    timeout = timeout or float(os.getenv('PREFLIGHT_TIMEOUT', CHECK_TIMEOUT))
+    checks = [_run_check(f"list {name}", _check_list, name) for name in list_names]
+    checks.append(_run_check("chrome", _check_chrome))
+    checks.append(_run_check("llm keys", _check_llm, timeout))
+    checks.extend(_run_check(f"api {name}", _check_api, name, timeout) for name in list_names)
+    return await asyncio.gather(*checks)
+
+
+def run_preflight(list_names):
+    """Print the result of every check and return the process exit status"""
+    started = time.monotonic()
+    results = asyncio.run(preflight(list_names))
+    for label, ok, detail, seconds in results:
+        print(f"{'✅' if ok else '❌'} {label:<20} {detail} ({seconds * 1000:.0f} ms)")
+    failed = [label for label, ok, _, _ in results if not ok]
+    elapsed = time.monotonic() - started
+    if failed:
+        print(f"Preflight failed ({len(failed)} of {len(results)} checks) in {elapsed:.2f}s")
+        return EXIT_FAILED
+    print(f"Preflight passed ({len(results)} checks) in {elapsed:.2f}s")
+    return EXIT_OK
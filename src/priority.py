@@ -0,0 +1,204 @@
+import math
+import time
+from datetime import datetime, timezone
+from metrics import get_metrics
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+## Where a contact probably is
+# EN: Phone country codes (longest prefix wins) and academy slugs mapped to time zones
+# ES: Códigos de país del teléfono (gana el prefijo más largo) y academias asociadas a zonas horarias
+COUNTRY_TIMEZONES = {
+    '1': 'America/New_York', '1787': 'America/Puerto_Rico', '1809': 'America/Santo_Domingo',
+    '1829': 'America/Santo_Domingo', '1849': 'America/Santo_Domingo',
+    '34': 'Europe/Madrid', '351': 'Europe/Lisbon', '44': 'Europe/London', '33': 'Europe/Paris',
+    '39': 'Europe/Rome', '49': 'Europe/Berlin',
+    '52': 'America/Mexico_City', '57': 'America/Bogota', '58': 'America/Caracas', '51': 'America/Lima',
+    '56': 'America/Santiago', '54': 'America/Argentina/Buenos_Aires', '598': 'America/Montevideo',
+    '593': 'America/Guayaquil', '506': 'America/Costa_Rica', '507': 'America/Panama', '502': 'America/Guatemala',
+    '503': 'America/El_Salvador', '504': 'America/Tegucigalpa', '505': 'America/Managua', '591': 'America/La_Paz',
+    '595': 'America/Asuncion', '55': 'America/Sao_Paulo',
+}
+ACADEMY_TIMEZONES = {
+    'miami': 'America/New_York', 'usa': 'America/New_York', 'madrid': 'Europe/Madrid', 'spain': 'Europe/Madrid',
+    'barcelona': 'Europe/Madrid', 'malaga': 'Europe/Madrid', 'valencia': 'Europe/Madrid',
+    'lisbon': 'Europe/Lisbon', 'portugal': 'Europe/Lisbon', 'santiago': 'America/Santiago', 'chile': 'America/Santiago',
+    'bogota': 'America/Bogota', 'colombia': 'America/Bogota', 'caracas': 'America/Caracas',
+    'venezuela': 'America/Caracas', 'mexico': 'America/Mexico_City', 'buenos-aires': 'America/Argentina/Buenos_Aires',
+    'argentina': 'America/Argentina/Buenos_Aires', 'montevideo': 'America/Montevideo', 'uruguay': 'America/Montevideo',
+    'costa-rica': 'America/Costa_Rica', 'quito': 'America/Guayaquil', 'ecuador': 'America/Guayaquil',
+    'panama': 'America/Panama', 'lima': 'America/Lima', 'peru': 'America/Lima',
+}
+CREATED_FIELDS = ('created_at', 'createdAt', 'created')
+
+## Defaults for the priority score
+# EN: Local hours when people answer, how fast a lead cools down and the value of unknowns
+# ES: Horas locales en que la gente responde, qué tan rápido se enfría un lead y el valor de lo desconocido
+DEFAULT_WINDOW = (9, 20)        # Local hours [start, end) with the best replies
+OUT_OF_WINDOW_DECAY = 0.25      # Value lost per hour away from the window
+NIGHT_FLOOR = 0.05              # Value of a contact in the middle of their night
+DEFAULT_HALF_LIFE_DAYS = 14     # A lead's value halves every two weeks
+UNKNOWN_VALUE = 0.5             # Unknown time zone or lead age
+FALLBACK_LANGUAGE_VALUE = 0.8   # The contact's language has no message, so they get the default one
+
+
+def parse_priority(config):
+    # EN: Validate the optional `priority` block of a list YAML (True or {} uses the defaults)
+    # ES: Valida el bloque opcional `priority` del YAML de una lista (True o {} usa los valores por defecto)
+    """Return the priority settings of a list ({window, timezone, half_life_days, min_score}), or None"""
+    if config is None or config is False:
+        return None
+    if config is True:
+        config = {}
+    if not isinstance(config, dict):
+        raise ValueError("priority must be a mapping")
+    window = tuple(config.get('window', DEFAULT_WINDOW))
+    if len(window) != 2 or not all(isinstance(hour, int) and 0 <= hour <= 24 for hour in window) or window[0] >= window[1]:
+        raise ValueError("priority.window must be [start hour, end hour] with 0 <= start < end <= 24")
+    settings = {
+        'window': window,
+        'timezone': config.get('timezone'),
+        'half_life_days': float(config.get('half_life_days', DEFAULT_HALF_LIFE_DAYS)),
+        'min_score': float(config.get('min_score', 0)),
+    }
+    if settings['half_life_days'] <= 0:
+        raise ValueError("priority.half_life_days must be positive")
+    if settings['timezone'] and _zone(settings['timezone']) is None:
+        raise ValueError(f"priority.timezone {settings['timezone']!r} is not a known time zone")
+    return settings
+
+
+_zones = {}
+
+def _zone(name):
+    """ZoneInfo for a name, or None when zoneinfo/tzdata is unavailable (e.g. Windows without tzdata)"""
+    if name not in _zones:
+        try:
+            _zones[name] = ZoneInfo(name) if ZoneInfo and name else None
+        except (ZoneInfoNotFoundError, ValueError):
+            _zones[name] = None
+    return _zones[name]
+
+
+def contact_timezone(contact, default=None):
+    """Time zone name from the phone's country code, else the academy slug, else the list default"""
+    digits = ''.join(ch for ch in str(contact.get('phone') or '') if ch.isdigit())
+    for length in (4, 3, 2, 1):
+        zone = COUNTRY_TIMEZONES.get(digits[:length]) if len(digits) > length else None
+        if zone:
+            return zone
+    academy = str(contact.get('academy') or '').lower()
+    for keyword, zone in ACADEMY_TIMEZONES.items():
+        if keyword in academy:
+            return zone
+    return default
+
+
+def contact_created(contact):
+    """When the lead was created (epoch seconds), or None"""
+    for field in CREATED_FIELDS:
+        value = contact.get(field)
+        if value in (None, ''):
+            continue
+        if isinstance(value, (int, float)):
+            return value / 1000 if value > 1e12 else float(value)  # Milliseconds or seconds
+        try:
+            return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def window_value(hour, window):
+    """Value of contacting someone at a local hour: 1 inside the window, decaying outside it"""
+    start, end = window
+    if start <= hour < end:
+        return 1.0
+    distance = min((start - hour) % 24, (hour - end + 1) % 24)
+    return max(NIGHT_FLOOR, 1.0 - OUT_OF_WINDOW_DECAY * distance)
+
+
+## Expected-value ranking of a list's pending contacts
+# EN: Contact features are computed once; only the hour-dependent part is recomputed, once per hour
+# ES: Las características del contacto se calculan una vez; solo la parte horaria se recalcula, una vez por hora
+class PriorityIndex:
+    """
+    Orders pending contacts by the expected value of sending to them now.
+
+    score = local-time value × lead freshness × language fit. The time zone comes from the
+    phone's country code (or the academy), freshness halves every `half_life_days`, and a
+    contact whose language has no message scores a little lower. Scores are cached per contact
+    and hour, so re-ranking a page of contacts each pick is a sort of cached numbers; features of
+    contacts that were not scored for an hour are dropped, so a days-long run does not accumulate them.
+    """
+
+    def __init__(self, settings=None, languages=()):
+        settings = settings or parse_priority(True)
+        self.window = settings['window']
+        self.default_timezone = settings['timezone']
+        self.half_life = settings['half_life_days'] * 86400
+        self.min_score = settings['min_score']
+        self.languages = set(languages)
+        self._features = {}         # contact id -> (zone name, created, language value)
+        self._scores = {}           # contact id -> score, for the current hour
+        self._hour = None
+
+    def _contact_features(self, contact):
+        contact_id = contact.get('id')
+        features = self._features.get(contact_id)
+        if features is None:
+            language = contact.get('utmLanguage')
+            language_value = 1.0 if not self.languages or language in self.languages else FALLBACK_LANGUAGE_VALUE
+            features = (contact_timezone(contact, self.default_timezone), contact_created(contact), language_value)
+            self._features[contact_id] = features
+        return features
+
+    def score(self, contact, now=None):
+        """Expected value (0-1) of sending to this contact at `now`"""
+        now = now or time.time()
+        hour_bucket = int(now // 3600)
+        if hour_bucket != self._hour:
+            # Hourly pass: contacts not scored during the last hour have left the list, so their features go too
+            self._features = {key: value for key, value in self._features.items() if key in self._scores}
+            self._hour = hour_bucket
+            self._scores = {}
+        contact_id = contact.get('id')
+        if contact_id in self._scores:
+            return self._scores[contact_id]
+
+        zone_name, created, language_value = self._contact_features(contact)
+        zone = _zone(zone_name) if zone_name else None
+        if zone is None:
+            time_value = UNKNOWN_VALUE
+        else:
+            time_value = window_value(datetime.fromtimestamp(now, timezone.utc).astimezone(zone).hour, self.window)
+        if created is None:
+            age_value = UNKNOWN_VALUE
+        else:
+            age_value = math.pow(0.5, max(0.0, now - created) / self.half_life)
+        value = time_value * (0.5 + 0.5 * age_value) * language_value
+        self._scores[contact_id] = value
+        return value
+
+    def rank(self, contacts, now=None):
+        # EN: Best contacts first; ties keep the API order. Contacts under min_score wait for a better hour
+        # ES: Los mejores contactos primero; los empates mantienen el orden de la API. Los de bajo puntaje esperan
+        """Return the contacts sorted by score (highest first), without those below min_score"""
+        now = now or time.time()
+        scored = [(self.score(contact, now), index, contact) for index, contact in enumerate(contacts)]
+        scored = [entry for entry in scored if entry[0] >= self.min_score]
+        scored.sort(key=lambda entry: (-entry[0], entry[1]))
+        if scored:
+            get_metrics().incr('priority_picks', window=self._window_label(scored[0][2], now))
+        return [contact for _, _, contact in scored]
+
+    def _window_label(self, contact, now):
+        zone = _zone(self._contact_features(contact)[0] or '')
+        if zone is None:
+            return 'unknown'
+        hour = datetime.fromtimestamp(now, timezone.utc).astimezone(zone).hour
+        return 'in' if window_value(hour, self.window) == 1.0 else 'out'
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from utils import update_contact
+from whatsapp import CONFIRMED, chat_status
+from metrics import get_metrics
+
+## Defaults for the delivery-receipt watcher
+# EN: How long to wait for ✓✓ and how often the chat list is checked
+# ES: Cuánto esperar el ✓✓ y cada cuánto se revisa la lista de chats
+DEFAULT_RECEIPT_TIMEOUT = 900   # Seconds after the send before the contact is reported INCOMPLETE
+DEFAULT_POLL_INTERVAL = 5       # Seconds between checks
+CLOSE_GRACE = 60                # Seconds drain() waits before a browser that still has receipts is closed
+DEFAULT_MAX_RETIRED = 3         # Finished browsers kept open at once only to read their receipts
+
+
+class _Receipt:
+    """A sent contact whose delivery has not been confirmed yet"""
+
+    def __init__(self, contact, agent, timeout):
+        self.contact = contact
+        self.agent = agent
+        self.sent_at = time.time()
+        self.deadline = self.sent_at + timeout
+        self.last_status = None
+        self.reachable = True       # False while the sending agent has no open page
+
+
+## Background watcher for WhatsApp delivery receipts
+# EN: The runner moves on right after the send; this task reports COMPLETE when ✓✓ shows up in the chat list
+# ES: El runner sigue justo después de enviar; esta tarea reporta COMPLETE cuando aparece ✓✓ en la lista de chats
+class ReceiptWatcher:
+    """
+    Confirms deliveries from the message status icons, off the send path.
+
+    watch() registers a sent contact together with the BrowserAgent that sent it. A background
+    task reads the contact's chat row in that agent's WhatsApp tab and sends COMPLETE through
+    update_contact once the last message shows ✓✓, or INCOMPLETE when the timeout passes.
+    retire() hands over a browser the runner is done with; it is closed once its receipts settle.
+    """
+
+    def __init__(self, timeout=None, poll_interval=None, max_retired=None):
+        self.timeout = float(timeout or os.getenv('RECEIPT_TIMEOUT', DEFAULT_RECEIPT_TIMEOUT))
+        self.poll_interval = float(poll_interval or os.getenv('RECEIPT_POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+        self.max_retired = int(max_retired or os.getenv('RECEIPT_MAX_BROWSERS', DEFAULT_MAX_RETIRED))
+        self._pending = {}          # contact id -> _Receipt
+        self._retired = []          # Browser agents to close once their receipts are settled, oldest first
+        self._wakeup = None
+        self._worker = None
+        self._closing = False
+
+    def pending_count(self, agent=None):
+        return sum(1 for receipt in self._pending.values() if agent is None or receipt.agent is agent)
+
+    def watch(self, contact, agent):
+        """Start waiting for the delivery receipt of the messages just sent to a contact"""
+        self._pending[contact.get('id')] = _Receipt(contact, agent, self.timeout)
+        if self._worker is None and not self._closing:
+            self.start()
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the background task on the running event loop"""
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while not self._closing:
+            await self.check()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def check(self):
+        # EN: One pass over every pending receipt; page errors (e.g. during navigation) are retried next pass
+        # ES: Una pasada por cada recibo pendiente; los errores de página (p. ej. al navegar) se reintentan después
+        """Check every pending receipt once"""
+        for contact_id, receipt in list(self._pending.items()):
+            try:
+                page = await receipt.agent.current_page()
+                receipt.reachable = page is not None
+                if page is not None:
+                    receipt.last_status = await chat_status(page, receipt.contact.get('phone'), receipt.contact.get('name'))
+            except Exception:
+                pass
+            if contact_id not in self._pending:
+                continue  # Settled by a concurrent check while the page was being read
+            if receipt.last_status in CONFIRMED:
+                self._settle(contact_id, receipt, delivered=True)
+            elif time.time() >= receipt.deadline:
+                self._settle(contact_id, receipt, delivered=False)
+        await self._close_settled()
+
+    async def retire(self, agent):
+        # EN: The send loop moves on with a new browser; this one stays open until its receipts are read
+        # ES: El bucle de envío sigue con otro navegador; este queda abierto hasta leer sus recibos
+        """Take over a browser agent the runner is done with and close it once its receipts settle"""
+        self._retired.append(agent)
+        if len(self._retired) > self.max_retired:
+            # Too many browsers kept open: give the oldest one the usual close grace now
+            await self.drain(self._retired[0])
+        await self._close_settled()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _close_settled(self):
+        for agent in [agent for agent in self._retired if not self.pending_count(agent)]:
+            if agent not in self._retired:
+                continue  # Closed by a concurrent pass
+            self._retired.remove(agent)
+            try:
+                await agent.close()
+            except Exception as e:
+                print(f"⚠️ Could not close a browser after reading its receipts: {e}")
+
+    def _settle(self, contact_id, receipt, delivered, reason=None):
+        self._pending.pop(contact_id, None)
+        waited = time.time() - receipt.sent_at
+        metrics = get_metrics()
+        metrics.incr('receipts', result='delivered' if delivered else 'timeout')
+        if delivered:
+            metrics.observe_stage('delivery_receipt', waited)
+            update_contact(contact_id, "COMPLETE", f"Message delivered (✓✓ after {waited:.0f}s)")
+        else:
+            reason = reason or f"no delivery receipt after {waited:.0f}s"
+            update_contact(contact_id, "INCOMPLETE",
+                           f"Message sent but delivery not confirmed: {reason} (last status: {receipt.last_status or 'unknown'})")
+
+    async def drain(self, agent=None, timeout=None, reason="browser closed before the receipt arrived"):
+        # EN: Wait for the receipts of one agent (e.g. before its browser is closed)
+        # ES: Espera los recibos de un agente (p. ej. antes de cerrar su navegador)
+        """Wait until the agent's pending receipts are settled or the timeout passes"""
+        deadline = time.time() + (CLOSE_GRACE if timeout is None else timeout)
+        while self.pending_count(agent) and time.time() < deadline:
+            await self.check()
+            waiting = [r for r in self._pending.values() if agent is None or r.agent is agent]
+            if not any(receipt.reachable for receipt in waiting):
+                break  # No page left to read the receipts from
+            await asyncio.sleep(min(self.poll_interval, max(0.0, deadline - time.time())))
+        for contact_id, receipt in list(self._pending.items()):
+            if agent is None or receipt.agent is agent:
+                self._settle(contact_id, receipt, delivered=False, reason=reason)
+        await self._close_settled()
+
+    async def close(self, timeout=30):
+        """Give pending receipts a last chance, report the rest as INCOMPLETE, close retired browsers and stop"""
+        self._closing = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.drain(timeout=timeout, reason="runner stopped before the receipt arrived")
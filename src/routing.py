@@ -0,0 +1,116 @@
+from metrics import get_metrics
+
+## Model tiers
+# EN: "fast" is the cheap model every step used so far; "strong" is kept for steps that need reasoning
+# ES: "fast" es el modelo económico que usaban todos los pasos; "strong" se reserva para los pasos difíciles
+TIERS = ('fast', 'strong')
+DEFAULT_TIER = 'fast'
+DEFAULT_ESCALATE_AFTER = 1      # Failed agent steps before the run switches to the escalation tier
+
+
+def tier_rank(tier):
+    return TIERS.index(tier) if tier in TIERS else 0
+
+
+def parse_routing(config):
+    # EN: Validate the optional `agent.routing` block of a list YAML
+    # ES: Valida el bloque opcional `agent.routing` del YAML de una lista
+    """
+    Return the routing settings of a list ({default, escalate_to, escalate_after}), or None
+    when the list has no routing block (every step then uses the default tier, as before).
+    """
+    if not config:
+        return None
+    if not isinstance(config, dict):
+        raise ValueError("agent.routing must be a mapping")
+    routing = {
+        'default': config.get('default', DEFAULT_TIER),
+        'escalate_to': config.get('escalate_to', 'strong'),
+        'escalate_after': int(config.get('escalate_after', DEFAULT_ESCALATE_AFTER)),
+    }
+    for key in ('default', 'escalate_to'):
+        if routing[key] not in TIERS:
+            raise ValueError(f"agent.routing.{key} must be one of: {', '.join(TIERS)}")
+    if routing['escalate_after'] < 1:
+        raise ValueError("agent.routing.escalate_after must be at least 1")
+    return routing
+
+
+## Per-step model routing for one browser_use Agent run
+# EN: Each LLM call of the agent goes to the tier its task needs; a failed step escalates the rest of the run
+# ES: Cada llamada al LLM del agente va al nivel que necesita su tarea; un paso fallido escala el resto de la ejecución
+class ModelRouter:
+    """
+    Chooses the model tier for every step of a contact's agent run.
+
+    The tasks are split into segments of consecutive tasks that need the same tier (the
+    task's `tier:`, or the list's default), and each segment runs as its own agent whose
+    steps use that tier; a single `strong` task does not put the other tasks on the strong
+    model. After `escalate_after` failed steps the remaining steps of the run go to
+    `escalate_to`. The provider within a tier still comes from the registry, so failover
+    and circuit breakers keep working.
+    """
+
+    def __init__(self, registry, routing=None):
+        self.registry = registry
+        self.routing = routing
+        self.default_tier = routing['default'] if routing else DEFAULT_TIER
+        self.base_tier = self.default_tier
+        self.failed_steps = 0
+        self.escalated = False
+        self.tier = self.base_tier
+
+    def segments(self, tasks, task_tiers=()):
+        """Group consecutive tasks by the tier they need: [(tier, [tasks])]"""
+        groups = []
+        for index, task in enumerate(tasks):
+            tier = task_tiers[index] if index < len(task_tiers) and task_tiers[index] else None
+            tier = max(self.default_tier, tier or self.default_tier, key=tier_rank)
+            if groups and groups[-1][0] == tier:
+                groups[-1][1].append(task)
+            else:
+                groups.append((tier, [task]))
+        return groups
+
+    def begin(self, tier):
+        """Route the steps of the next segment to its tier (an escalation carries over)"""
+        self.base_tier = tier
+        self.tier = self.next_tier(None)
+
+    def initial_llm(self):
+        return self.registry.select(self.tier)
+
+    def _last_step_failed(self, agent):
+        # browser_use keeps the results of the previous step's actions on the agent state
+        state = getattr(agent, 'state', None) or agent
+        results = getattr(state, 'last_result', None) or getattr(agent, '_last_result', None) or []
+        return any(getattr(result, 'error', None) for result in results)
+
+    def next_tier(self, agent):
+        """Tier for the agent's next LLM call"""
+        if self.routing and not self.escalated and agent is not None and self._last_step_failed(agent):
+            self.failed_steps += 1
+            if self.failed_steps >= self.routing['escalate_after']:
+                self.escalated = True
+                print(f"⬆️ Escalating the rest of this run to the {self.routing['escalate_to']} model tier")
+                get_metrics().incr('llm_escalations')
+        if self.escalated:
+            return max(self.base_tier, self.routing['escalate_to'], key=tier_rank)
+        return self.base_tier
+
+    def install(self, agent):
+        # EN: Wraps Agent.get_next_action, the one place browser_use calls the LLM for a step
+        # ES: Envuelve Agent.get_next_action, el único lugar donde browser_use llama al LLM en cada paso
+        """Route every step of a browser_use Agent through this router"""
+        original = agent.get_next_action
+
+        async def get_next_action(*args, **kwargs):
+            self.tier = self.next_tier(agent)
+            client = self.registry.select(self.tier, acquire=True)
+            if client is not None:
+                agent.llm = client
+            get_metrics().incr('llm_routes', tier=self.tier)
+            return await original(*args, **kwargs)
+
+        agent.get_next_action = get_next_action
+        return agent
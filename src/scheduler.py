@@ -0,0 +1,137 @@
+import os
+import time
+from feed import ContactFeed, ClaimFeed
+from priority import PriorityIndex
+from metrics import get_metrics
+
+## Defaults for the multi-list scheduler
+# EN: How long an empty list is skipped before its feed is checked again
+# ES: Cuánto tiempo se omite una lista vacía antes de volver a revisar su fuente
+IDLE_WAIT = 300                 # Seconds in production
+IDLE_WAIT_DEVELOPMENT = 5       # Seconds in development mode
+
+
+def parse_list_specs(values):
+    """
+    Parse --list values ("4ga-lost", "4ga-lost:3", "a:2,b") into [(name, weight)]
+    Convierte los valores de --list ("4ga-lost", "4ga-lost:3", "a:2,b") en [(nombre, peso)]
+    """
+    specs = []
+    for value in values if isinstance(values, (list, tuple)) else [values]:
+        for item in str(value).split(','):
+            item = item.strip()
+            if not item:
+                continue
+            name, _, weight = item.partition(':')
+            try:
+                weight = int(weight) if weight else 1
+            except ValueError:
+                raise ValueError(f"Invalid weight in --list {item!r}, expected name:integer")
+            if weight < 1:
+                raise ValueError(f"Weight for list {name!r} must be at least 1")
+            specs.append((name, weight))
+    if not specs:
+        raise ValueError("At least one list is required")
+    return specs
+
+
+## One follow-up list served by the daemon
+# EN: Its configuration, its own contact feed and its scheduling state
+# ES: Su configuración, su propia fuente de contactos y su estado de planificación
+class ListSource:
+    """A list configuration with its contact feed (read, or claimed with leases), weight and priority order"""
+
+    def __init__(self, name, list_config, weight=1, page_size=None, claim=False, prioritize=False):
+        self.name = name
+        self.config = list_config
+        self.weight = weight
+        self.feed = (ClaimFeed if claim else ContactFeed)(name, page_size=page_size)
+        self.prioritize = prioritize
+        self.priority = self._priority_index()
+        self.prepared = {}          # contact id -> (contact, rendered steps), for contacts that passed validation
+        self.current = 0            # Smooth weighted round-robin credit
+        self.idle_until = 0         # Skipped until then because its queue was empty
+        self.served = 0
+
+    def _priority_index(self):
+        # Pending contacts are ranked by expected value when the list has a `priority` block (or --prioritize)
+        compiled = getattr(self.config, 'compiled', None)
+        settings = getattr(compiled, 'priority', None)
+        if not settings and not self.prioritize:
+            return None
+        return PriorityIndex(settings, compiled.languages if compiled else ())
+
+    def reload(self, list_config):
+        """Serve the next contacts with a new configuration (contacts already picked keep the old one)"""
+        self.config = list_config
+        self.priority = self._priority_index()
+        self.prepared = {}
+
+    def prune_prepared(self):
+        """Forget the prepared contacts that have left the feed cache (sent, rejected or no longer pending)"""
+        present = {contact.get('id') for contact in self.feed.cached()}
+        self.prepared = {key: value for key, value in self.prepared.items() if key in present}
+
+    def __repr__(self):
+        return f"ListSource({self.name!r}, weight={self.weight})"
+
+
+## Weighted fair scheduling across lists
+# EN: Smooth weighted round-robin: with weights 3 and 1 the order is A A B A, never A A A B in a burst
+# ES: Round-robin ponderado suave: con pesos 3 y 1 el orden es A A B A, nunca A A A B de golpe
+class FairScheduler:
+    """
+    Picks which list the next contact comes from.
+
+    Lists share one browser session and one LLM client; each list gets a share of the sends
+    proportional to its weight. A list whose queue is empty is skipped for the idle wait
+    instead of making the other lists sleep.
+    """
+
+    def __init__(self, sources, idle_wait=None):
+        self.sources = list(sources)
+        if idle_wait is None:
+            idle_wait = IDLE_WAIT_DEVELOPMENT if os.getenv('ENVIRONMENT') == 'development' else IDLE_WAIT
+        self.idle_wait = idle_wait
+
+    def _pick(self, candidates):
+        total = sum(source.weight for source in candidates)
+        for source in candidates:
+            source.current += source.weight
+        chosen = max(candidates, key=lambda source: source.current)
+        chosen.current -= total
+        return chosen
+
+    async def next(self, prepare):
+        # EN: Walk the lists in weighted order until one has a contact ready
+        # ES: Recorre las listas en orden ponderado hasta que una tenga un contacto listo
+        """
+        Return (source, contacts, rendered) for the next list with work, or None if all are idle.
+        `prepare(contacts, source)` filters and renders the contacts of a list, returning (contacts, rendered).
+        """
+        now = time.time()
+        candidates = [source for source in self.sources if source.idle_until <= now]
+        while candidates:
+            source = self._pick(candidates)
+            contacts, rendered = prepare(await source.feed.pending(), source)
+            if contacts:
+                source.served += 1
+                get_metrics().incr('list_picks', list=source.name)
+                return source, contacts, rendered
+            source.idle_until = time.time() + self.idle_wait
+            candidates.remove(source)
+        return None
+
+    def seconds_until_ready(self):
+        """Seconds until the first idle list is due to be checked again"""
+        return max(0.0, min(source.idle_until for source in self.sources) - time.time())
+
+    def wake(self, name=None):
+        """Make an idle list (or every list) eligible again right away"""
+        for source in self.sources:
+            if name is None or source.name == name:
+                source.idle_until = 0
+
+    async def close(self):
+        for source in self.sources:
+            await source.feed.close()
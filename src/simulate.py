@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from benchmark import load_runner, percentile
+from faults import LLM, BROWSER, API
+from llm import PROVIDERS
+from standins import make_contacts, VirtualClock, VirtualTimeLoop, FaultModel, SimAgent, SimFeed, SimRecorder
+
+## Virtual-clock simulation of the follow-up runner
+# EN: Runs the real main_loop (pacing, scheduling, retries, receipts) on simulated time with injected faults
+# ES: Ejecuta el main_loop real (ritmo, planificación, reintentos, recibos) en tiempo simulado con fallas inyectadas
+CHECK_INTERVAL = 60             # Simulated seconds between checks for the end of the run
+BACKLOG_AGE_DAYS = 30           # Leads already pending at the start were created up to this long ago
+RECOVERY_KINDS = (LLM, BROWSER, API)
+
+
+def synthetic_arrivals(args, list_name, start, rng):
+    # EN: The pending backlog at the start plus new leads arriving as a Poisson process
+    # ES: El backlog pendiente al inicio más leads nuevos que llegan como un proceso de Poisson
+    """Return [(arrival time, contact)]"""
+    arrivals = []
+    for contact in make_contacts(args.contacts, list_name):
+        contact['created_at'] = start - rng.uniform(0, BACKLOG_AGE_DAYS * 86400)
+        arrivals.append((start, contact))
+    at, next_id = start, args.contacts + 1
+    while args.arrivals_per_day > 0:
+        at += rng.expovariate(args.arrivals_per_day / 86400)
+        if at >= start + args.days * 86400:
+            break
+        contact = make_contacts(1, list_name, start_id=next_id)[0]
+        contact['created_at'] = at
+        arrivals.append((at, contact))
+        next_id += 1
+    return arrivals
+
+
+async def run_simulation(runner, args, list_config, clock, model, recorder, arrivals):
+    """Run main_loop until every contact is settled or the simulated duration is over"""
+    run_args = argparse.Namespace(
+        list=[args.list],
+        page_size=None,
+        claim=False,
+        persistent_session=not args.fresh_browser,
+        profile_dir=None,
+        recycle_after=args.recycle_after,
+        dom_diet=None,
+        prefetch=args.prefetch,
+        prioritize=args.prioritize,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        max_per_hour=args.max_per_hour,
+        metrics_port=None,
+        workers=1,
+        accounts=None,
+        outbox=None,
+        interactive=False,
+        clock=clock,
+    )
+    runner.set_status_outbox(recorder)
+    scheduler = runner.build_scheduler(run_args, {args.list: list_config})
+    for source in scheduler.sources:
+        await source.feed.close()
+        source.feed = SimFeed(source.name, arrivals, recorder, model, page_size=args.page_size)
+    feeds = [source.feed for source in scheduler.sources]
+
+    task = asyncio.create_task(runner.main_loop(run_args, scheduler, asyncio.get_running_loop()))
+    try:
+        while clock.elapsed < args.days * 86400:
+            await asyncio.sleep(CHECK_INTERVAL)
+            if task.done():
+                task.result()  # Surface a crash of the runner
+                break
+            if all(feed.exhausted() for feed in feeds) and not recorder.unsettled():
+                break
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        runner.set_status_outbox(None)
+        await runner.get_conversation_log().close()
+        runner.reset_checkpoints()
+        runner.reset_plan_cache()
+
+
+def recovery_times(recorder, fault_times):
+    # EN: One episode per run of faults: from its first fault until the next successful send
+    # ES: Un episodio por racha de fallas: desde la primera falla hasta el siguiente envío exitoso
+    """Return (recovery seconds per episode, episodes never recovered)"""
+    times, unrecovered, recovered_at = [], 0, None
+    for at in sorted(fault_times):
+        if recovered_at is not None and at < recovered_at:
+            continue  # Same episode: the runner had not sent anything since the first fault
+        recovered_at = recorder.next_send(at)
+        if recovered_at is None:
+            unrecovered += 1
+            recovered_at = float('inf')
+        else:
+            times.append(recovered_at - at)
+    return times, unrecovered
+
+
+def distribution(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+def summarize(args, clock, model, recorder, real_seconds):
+    # EN: Throughput, latency distributions and recovery times from the recorder's timeline
+    # ES: Rendimiento, distribución de latencias y tiempos de recuperación a partir de la línea de tiempo
+    """Build the report dictionary"""
+    records = list(recorder.contacts.values())
+    settled = [record for record in records if 'final' in record]
+    hours = clock.elapsed / 3600
+    # Outages drawn for the rest of the period do not count when every contact settled early
+    outages = {kind: [window for window in windows if window[0] < clock.now()] for kind, windows in model.outages.items()}
+    faults = Counter(kind for kind, _ in recorder.faults)
+    faults[API] += len(outages[API])
+    recovery = {}
+    for kind in RECOVERY_KINDS:
+        fault_times = [begin for begin, _ in outages[API]] if kind == API else \
+            [at for fault_kind, at in recorder.faults if fault_kind == kind]
+        times, unrecovered = recovery_times(recorder, fault_times)
+        recovery[kind] = {**distribution(times), 'unrecovered': unrecovered}
+    return {
+        'simulated_days': round(clock.elapsed / 86400, 2),
+        'real_seconds': round(real_seconds, 2),
+        'contacts': len(records),
+        'statuses': dict(Counter(record['status'] for record in records)),
+        'sends': len(recorder.sends),
+        'sends_per_hour': round(len(recorder.sends) / hours, 1) if hours else None,
+        'sends_per_day': [count for _, count in sorted(Counter(
+            int((at - clock.start) // 86400) for at in recorder.sends).items())],
+        'paths': dict(Counter(record['path'] for record in records if 'path' in record)),
+        'latency': distribution([record['final'] - record['arrived'] for record in settled]),
+        'service_time': distribution([record['final'] - record['started'] for record in settled if 'started' in record]),
+        'faults': dict(faults),
+        'outages': {kind: len(windows) for kind, windows in outages.items()},
+        'recovery': recovery,
+        'settings': {
+            'min_interval': args.min_interval,
+            'max_interval': args.max_interval,
+            'max_per_hour': args.max_per_hour,
+            'persistent_session': not args.fresh_browser,
+            'prefetch': args.prefetch,
+            'prioritize': args.prioritize,
+            'seed': args.seed,
+            'latencies': model.latencies,
+            'rates': model.rates,
+        },
+    }
+
+
+def duration(seconds):
+    if seconds is None:
+        return "n/a"
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def print_report(report):
+    spread = lambda entry: " / ".join(duration(entry[key]) for key in ('p50', 'p90', 'p99', 'max'))
+    print("\n📊 Simulation results / Resultados de la simulación")
+    print(f"  Simulated:               {report['simulated_days']} days in {report['real_seconds']}s")
+    print(f"  Contacts:                {report['contacts']} {report['statuses']}")
+    print(f"  Sends:                   {report['sends']} ({report['sends_per_hour']} per hour)")
+    print(f"  Sends per day:           {report['sends_per_day']}")
+    print(f"  Paths:                   {report['paths']}")
+    print(f"  Latency p50/p90/p99/max: {spread(report['latency'])} (arrival to final status)")
+    print(f"  Service p50/p90/p99/max: {spread(report['service_time'])} (STARTED to final status)")
+    print(f"  Faults injected:         {report['faults']} (outages: {report['outages']})")
+    for kind, entry in report['recovery'].items():
+        print(f"    recovery {kind:<8} {entry['count']} episodes, p50/p90/p99/max {spread(entry)}"
+              f", {entry['unrecovered']} unrecovered")
+
+
+def main():
+    # EN: Parses the simulation options, runs one simulated period and prints the report
+    # ES: Analiza las opciones de la simulación, ejecuta un periodo simulado e imprime el informe
+    parser = argparse.ArgumentParser(description='Simulate the follow-up runner on a virtual clock with injected faults')
+    parser.add_argument('--list', default='4ga-lost', help='List configuration to render (default: 4ga-lost)')
+    parser.add_argument('--days', type=float, default=7, help='Simulated days (default: 7)')
+    parser.add_argument('--contacts', type=int, default=2000, help='PENDING contacts at the start (default: 2000)')
+    parser.add_argument('--arrivals-per-day', type=float, default=0, help='New leads per simulated day (default: 0)')
+    parser.add_argument('--start', default=None, help='Simulated start, ISO date and time (default: now)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed; the same seed gives the same run (default: 1)')
+    parser.add_argument('--min-interval', type=float, default=60, help='Minimum seconds between sends (default: 60)')
+    parser.add_argument('--max-interval', type=float, default=240, help='Maximum seconds between sends (default: 240)')
+    parser.add_argument('--max-per-hour', type=int, default=None, help='Hourly send cap')
+    parser.add_argument('--page-size', type=int, default=20, help='Contacts served per feed read (default: 20)')
+    parser.add_argument('--recycle-after', type=int, default=None, help='Recycle the browser after this many contacts')
+    parser.add_argument('--fresh-browser', action='store_true', help='Launch a new browser per contact instead of a persistent session')
+    parser.add_argument('--prefetch', action='store_true', help='Prepare the next contact during pacing')
+    parser.add_argument('--prioritize', action='store_true', help='Rank pending contacts by expected value')
+    parser.add_argument('--fast-path-failure', type=float, default=0.05, help='Share of contacts that need the LLM agent (default: 0.05)')
+    parser.add_argument('--invalid-number', type=float, default=0.02, help='Share of contacts not on WhatsApp (default: 0.02)')
+    parser.add_argument('--browser-fault', type=float, default=0.01, help='Browser crashes per contact (default: 0.01)')
+    parser.add_argument('--undelivered', type=float, default=0.03, help='Share of sends never showing ✓✓ (default: 0.03)')
+    parser.add_argument('--llm-outages-per-day', type=float, default=1, help='LLM outages per simulated day (default: 1)')
+    parser.add_argument('--llm-outage-minutes', type=float, default=30, help='Mean LLM outage length (default: 30)')
+    parser.add_argument('--api-outages-per-day', type=float, default=0.5, help='Followups API outages per simulated day (default: 0.5)')
+    parser.add_argument('--api-outage-minutes', type=float, default=15, help='Mean API outage length (default: 15)')
+    parser.add_argument('--verbose', action='store_true', help="Show the runner's own output")
+    parser.add_argument('--output', default=None, help='Also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else time.time()
+    random.seed(args.seed)  # The pacer's jitter
+    model = FaultModel(seed=args.seed, fast_path_failure=args.fast_path_failure, invalid_number=args.invalid_number,
+                       browser_fault=args.browser_fault, undelivered=args.undelivered,
+                       llm_outages_per_day=args.llm_outages_per_day, llm_outage_minutes=args.llm_outage_minutes,
+                       api_outages_per_day=args.api_outages_per_day, api_outage_minutes=args.api_outage_minutes)
+    model.plan_outages(start, args.days * 86400)
+    recorder = SimRecorder()
+    arrivals = synthetic_arrivals(args, args.list, start, random.Random(args.seed))
+
+    # Importing the runner loads .env, so the simulation settings are applied afterwards
+    runner = load_runner()
+    clock = VirtualClock(start)
+    loop = VirtualTimeLoop(clock)
+    started = time.perf_counter()
+    # The work directory is removed however the run ends, even if the list fails to load
+    with tempfile.TemporaryDirectory(prefix='followup-simulation-') as workdir:
+        os.environ.update({
+            'ENVIRONMENT': 'production',
+            'METRICS_JSONL_PATH': os.path.join(workdir, 'metrics.jsonl'),
+            'METRICS_PROM_PATH': os.path.join(workdir, 'metrics.prom'),
+            'METRICS_FLUSH_INTERVAL': '3600',   # Virtual seconds; the report does not read the log
+            'CONVERSATION_LOG_DIR': os.path.join(workdir, 'conversation'),
+            'MEMORY_DUMP_PATH': os.path.join(workdir, 'memory.txt'),
+            'MEMORY_SAMPLE_SECONDS': '0',
+            'CHECKPOINT_PATH': '',
+            'PLAN_CACHE_PATH': '',
+        })
+        for provider in PROVIDERS.values():
+            os.environ.pop(provider['api_key_env'], None)  # The simulated agent never calls a provider, nor does the probe
+        runner.BrowserAgent = functools.partial(SimAgent, model, recorder)
+        try:
+            list_config = runner.load_list_config(args.list)
+            clock.install()
+            with contextlib.ExitStack() as stack:
+                if not args.verbose:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+                loop.run_until_complete(run_simulation(runner, args, list_config, clock, model, recorder, arrivals))
+                # Background tasks of the runner (receipts, feeds, probes) end with the simulation
+                leftovers = asyncio.all_tasks(loop)
+                for task in leftovers:
+                    task.cancel()
+                if leftovers:
+                    loop.run_until_complete(asyncio.gather(*leftovers, return_exceptions=True))
+        finally:
+            clock.uninstall()
+            loop.close()
+            runner.get_metrics().close()
+
+    report = summarize(args, clock, model, recorder, time.perf_counter() - started)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
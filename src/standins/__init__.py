@@ -0,0 +1,2 @@
+from .server import StandInServer, make_contacts, DEFAULT_LLM_SCRIPT
+from .simulated import VirtualClock, VirtualTimeLoop, FaultModel, SimAgent, SimFeed, SimRecorder
@@ -0,0 +1,289 @@
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+## Synthetic contact data
+# EN: Values cycled through to build the fake PENDING contacts (they match the 4ga-lost templates)
+# ES: Valores que se recorren para generar los contactos PENDING falsos (coinciden con las plantillas de 4ga-lost)
+COURSES = ['full-stack', 'datascience-ml', 'cybersecurity', None]
+ACADEMIES = ['madrid-spain', 'miami-usa', None]
+LANGUAGES = ['en', 'es']
+
+## Default scripted LLM reply
+# EN: A browser_use step that declares the task done; replies are cycled per call
+# ES: Un paso de browser_use que da la tarea por terminada; las respuestas se repiten en ciclo
+DEFAULT_LLM_SCRIPT = [{
+    'current_state': {
+        'evaluation_previous_goal': 'Success - message sent and checkmark appears',
+        'memory': 'Message delivered',
+        'next_goal': 'Finish',
+    },
+    'action': [{'done': {'text': 'Message sent and checkmark appears'}}],
+}]
+
+WHATSAPP_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'whatsapp.html')
+
+
+def make_contacts(count, list_name, start_id=1):
+    """Build `count` PENDING contacts with 4Geeks Academy emails (so development mode accepts them)"""
+    combos = itertools.cycle(itertools.product(COURSES, ACADEMIES, LANGUAGES))
+    contacts = []
+    for contact_id in range(start_id, start_id + count):
+        course, academy, language = next(combos)
+        contacts.append({
+            'id': contact_id,
+            'name': f"Test {contact_id}",
+            'email': f"test{contact_id}@4geeksacademy.com",
+            'phone': f"+1555{contact_id:07d}",
+            'course': course,
+            'academy': academy,
+            'utmLanguage': language,
+            'list': list_name,
+            'status': 'PENDING',
+        })
+    return contacts
+
+
+## Local stand-in for the followups API, WhatsApp Web and the LLM
+# EN: One threaded HTTP server so a full run needs no network, no phone and no API credits
+# ES: Un servidor HTTP con hilos para que una ejecución completa no necesite red, teléfono ni créditos de API
+class StandInServer:
+    """
+    Serves, on one localhost port:
+      GET  /api/followups/<list>?status=PENDING   pending contacts (ETag and page/limit aware)
+      PUT  /api/followups/<id>                    status updates
+      POST /api/followups/<list>/claim[/renew|/release]  contact leases for several runners
+      GET  /  and  /send/?phone=...               a minimal WhatsApp Web page (whatsapp.html)
+      GET  /v1/models, POST /v1/chat/completions  an OpenAI-compatible scripted LLM
+    """
+
+    def __init__(self, list_name, contacts=100, api_latency=0.0, llm_latency=0.0, delivery_delay=0.5,
+                 llm_script=None, host='127.0.0.1', port=0):
+        self.list_name = list_name
+        self.api_latency = api_latency
+        self.llm_latency = llm_latency
+        self.delivery_delay = delivery_delay
+        self.llm_script = llm_script or DEFAULT_LLM_SCRIPT
+        self.contacts = {contact['id']: contact for contact in make_contacts(contacts, list_name)}
+        self.status_log = []           # (time, contact id, status)
+        self.counters = {'gets': 0, 'not_modified': 0, 'puts': 0, 'llm_calls': 0, 'messages_sent': 0,
+                         'claims': 0, 'double_starts': 0}
+        self.leases = {}               # contact id -> (worker, expiry)
+        self._version = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the runner at this server"""
+        return {
+            'FOLLOWUPS_API_URL': f"{self.base_url}/api/followups",
+            'WHATSAPP_WEB_URL': f"{self.base_url}/",
+            'DEEPSEEK_BASE_URL': f"{self.base_url}/v1",
+            'DEEPSEEK_API_KEY': 'stand-in',
+            'OPENAI_API_KEY': '',
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='standin-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for contact in self.contacts.values() if contact['status'] == 'PENDING')
+
+    def finished_count(self):
+        """Contacts that reached a final status (anything but PENDING and STARTED)"""
+        with self._lock:
+            return sum(1 for contact in self.contacts.values() if contact['status'] not in ('PENDING', 'STARTED'))
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for contact in self.contacts.values():
+                statuses[contact['status']] = statuses.get(contact['status'], 0) + 1
+            return {**self.counters, 'statuses': statuses}
+
+    # ---- request handling ------------------------------------------------
+
+    def _pending(self, query):
+        with self._lock:
+            self.counters['gets'] += 1
+            contacts = [dict(c) for c in self.contacts.values() if c['status'] == query.get('status', ['PENDING'])[0]]
+            etag = f'"{self._version}"'
+        if 'page' in query:
+            limit = int(query.get('limit', ['50'])[0])
+            start = (int(query['page'][0]) - 1) * limit
+            contacts = contacts[start:start + limit]
+        return contacts, etag
+
+    def _update(self, contact_id, body):
+        with self._lock:
+            contact = self.contacts.get(contact_id)
+            if contact is None:
+                return False
+            self.counters['puts'] += 1
+            if body.get('status') == 'STARTED' and contact['status'] != 'PENDING':
+                self.counters['double_starts'] += 1  # Two runners got the same contact
+            contact['status'] = body.get('status', contact['status'])
+            contact['statusText'] = body.get('statusText')
+            self.status_log.append((time.time(), contact_id, contact['status']))
+            self._version += 1
+            return True
+
+    def _claim(self, action, body):
+        # EN: Lease protocol: a contact is handed to one worker at a time until its lease expires or is released
+        # ES: Protocolo de reservas: un contacto se entrega a un solo worker hasta que su reserva vence o se libera
+        worker = body.get('worker')
+        if not worker:
+            return 400, {'error': 'worker is required'}
+        now = time.time()
+        expires = now + float(body.get('lease_seconds') or 600)
+        with self._lock:
+            if action is None:
+                self.counters['claims'] += 1
+                claimed = []
+                for contact in self.contacts.values():
+                    if len(claimed) >= int(body.get('limit') or 10):
+                        break
+                    holder = self.leases.get(contact['id'])
+                    if contact['status'] != body.get('status', 'PENDING'):
+                        continue
+                    if holder and holder[1] > now and holder[0] != worker:
+                        continue
+                    self.leases[contact['id']] = (worker, expires)
+                    claimed.append(dict(contact))
+                return 200, {'data': claimed, 'lease_expires': expires, 'now': now}
+            ids = body.get('ids') or []
+            owned = [cid for cid in ids if self.leases.get(cid, (None, 0))[0] == worker]
+            if action == 'renew':
+                # A lease that expired is still renewed as long as nobody else claimed the contact
+                for contact_id in owned:
+                    self.leases[contact_id] = (worker, expires)
+                return 200, {'renewed': owned, 'lease_expires': expires, 'now': now}
+            if action == 'release':
+                for contact_id in owned:
+                    del self.leases[contact_id]
+                return 200, {'released': owned}
+        return 404, {'error': 'not found'}
+
+    def _completion(self, request):
+        # EN: Reply like the OpenAI chat API, as a tool call when the client asked for structured output
+        # ES: Responde como la API de chat de OpenAI, con una llamada a herramienta si se pidió salida estructurada
+        with self._lock:
+            call = self.counters['llm_calls']
+            self.counters['llm_calls'] += 1
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        reply = json.dumps(self.llm_script[call % len(self.llm_script)])
+        message = {'role': 'assistant', 'content': reply}
+        tools = request.get('tools') or []
+        if tools:
+            message = {'role': 'assistant', 'content': None, 'tool_calls': [{
+                'id': f"call_{call}",
+                'type': 'function',
+                'function': {'name': tools[0]['function']['name'], 'arguments': reply},
+            }]}
+        prompt_tokens = len(json.dumps(request.get('messages', []))) // 4
+        return {
+            'id': f"chatcmpl-standin-{call}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stand-in'),
+            'choices': [{'index': 0, 'message': message,
+                         'finish_reason': 'tool_calls' if tools else 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(reply) // 4,
+                      'total_tokens': prompt_tokens + len(reply) // 4},
+        }
+
+    def _handler(self):
+        server = self
+        with open(WHATSAPP_PAGE, 'r', encoding='utf-8') as f:
+            page = f.read().replace('__DELIVERY_DELAY_MS__', str(int(self.delivery_delay * 1000))).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass  # Keep the benchmark output readable
+
+            def _send(self, status, body=b'', content_type='application/json', headers=None):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                return json.loads(raw or b'{}')
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = [part for part in url.path.split('/') if part]
+                if parts[:2] == ['api', 'followups'] and len(parts) == 3:
+                    if server.api_latency:
+                        time.sleep(server.api_latency)
+                    contacts, etag = server._pending(parse_qs(url.query))
+                    if self.headers.get('If-None-Match') == etag and 'page' not in url.query:
+                        with server._lock:
+                            server.counters['not_modified'] += 1
+                        return self._send(304)
+                    return self._send(200, {'data': contacts}, headers={'ETag': etag})
+                if parts[:2] == ['v1', 'models']:
+                    return self._send(200, {'object': 'list', 'data': [{'id': 'stand-in', 'object': 'model'}]})
+                if not parts or parts == ['send']:
+                    return self._send(200, page, content_type='text/html; charset=utf-8')
+                return self._send(404, {'error': 'not found'})
+
+            def do_PUT(self):
+                parts = [part for part in urlparse(self.path).path.split('/') if part]
+                if parts[:2] == ['api', 'followups'] and len(parts) == 3:
+                    if server.api_latency:
+                        time.sleep(server.api_latency)
+                    try:
+                        contact_id = int(parts[2])
+                    except ValueError:
+                        return self._send(400, {'error': 'invalid id'})
+                    if not server._update(contact_id, self._body()):
+                        return self._send(404, {'error': 'contact not found'})
+                    return self._send(200, {'ok': True})
+                return self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                parts = [part for part in urlparse(self.path).path.split('/') if part]
+                if parts[:2] == ['api', 'followups'] and len(parts) in (4, 5) and parts[3] == 'claim':
+                    if server.api_latency:
+                        time.sleep(server.api_latency)
+                    status, result = server._claim(parts[4] if len(parts) == 5 else None, self._body())
+                    return self._send(status, result)
+                if parts == ['v1', 'chat', 'completions']:
+                    return self._send(200, server._completion(self._body()))
+                if parts == ['whatsapp', 'sent']:
+                    self._body()
+                    with server._lock:
+                        server.counters['messages_sent'] += 1
+                    return self._send(204)
+                return self._send(404, {'error': 'not found'})
+
+        return Handler
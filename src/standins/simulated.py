@@ -0,0 +1,398 @@
+import asyncio
+import bisect
+import itertools
+import math
+import random
+import time
+from types import SimpleNamespace
+from agent import detect_system, DEFAULT_RECYCLE_AFTER
+from checkpoints import step_kind
+from faults import LLM, BROWSER, API, CONTACT
+from metrics import get_metrics
+from whatsapp import InvalidNumberError, phone_digits
+
+REAL_WAIT = 0.05                # Real seconds the loop blocks when only a thread or socket can wake it
+FINAL_STATUSES = ('COMPLETE', 'INCOMPLETE', 'ERROR')
+
+
+## Virtual time for simulations
+# EN: Simulated time only moves when the event loop has nothing to run, so a week of waits takes no real time
+# ES: El tiempo simulado solo avanza cuando el bucle no tiene nada que ejecutar: una semana de esperas no tarda nada
+class VirtualClock:
+    """
+    A clock for VirtualTimeLoop, with the now()/sleep() interface of pacing.SystemClock.
+
+    install() points time.time at the clock, so every deadline, TTL and timestamp in the
+    runner (scheduler idle waits, receipt timeouts, feed TTLs, metrics) reads simulated time.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.time() if start is None else start
+        self.elapsed = 0.0
+        self._real_time = None
+
+    def now(self):
+        return self.start + self.elapsed
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    def advance(self, seconds):
+        self.elapsed += max(0.0, seconds)
+
+    def install(self):
+        if self._real_time is None:
+            self._real_time = time.time
+            time.time = self.now
+        return self
+
+    def uninstall(self):
+        if self._real_time is not None:
+            time.time, self._real_time = self._real_time, None
+
+
+class _VirtualSelector:
+    """Wraps the loop's selector: instead of blocking until the next timer, jump the clock to it"""
+
+    def __init__(self, selector, clock):
+        self._selector = selector
+        self._clock = clock
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # No timer is scheduled: only a thread or a socket can wake the loop, so wait for it for real
+            return self._selector.select(REAL_WAIT)
+        self._clock.advance(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """An event loop whose time() is the virtual clock's elapsed seconds"""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self._selector = _VirtualSelector(self._selector, clock)
+
+    def time(self):
+        return self.clock.elapsed
+
+
+## Stochastic model of a WhatsApp session
+# EN: Log-normal step latencies, per-contact failure rates and outage windows that arrive as a Poisson process
+# ES: Latencias log-normales por paso, tasas de falla por contacto y caídas que llegan como un proceso de Poisson
+class FaultModel:
+    """Latencies (mean seconds), failure probabilities per contact and outages per simulated day"""
+
+    SIGMA = 0.5                 # Spread of the log-normal latencies
+
+    def __init__(self, seed=None, launch=20, open_chat=4, send=3, llm=45, reload=8, delivery=20,
+                 fast_path_failure=0.05, invalid_number=0.02, browser_fault=0.01, agent_miss=0.05,
+                 undelivered=0.03, llm_outages_per_day=1.0, llm_outage_minutes=30,
+                 api_outages_per_day=0.5, api_outage_minutes=15):
+        self.random = random.Random(seed)
+        self.latencies = {'launch': launch, 'open_chat': open_chat, 'send': send, 'llm': llm,
+                          'reload': reload, 'delivery': delivery}
+        self.rates = {'fast_path_failure': fast_path_failure, 'invalid_number': invalid_number,
+                      'browser_fault': browser_fault, 'agent_miss': agent_miss, 'undelivered': undelivered}
+        self.outage_rates = {LLM: (llm_outages_per_day, llm_outage_minutes * 60),
+                             API: (api_outages_per_day, api_outage_minutes * 60)}
+        self.outages = {LLM: [], API: []}   # kind -> [(start, end)] in epoch seconds
+
+    def latency(self, name):
+        mean = self.latencies[name]
+        if mean <= 0:
+            return 0.0
+        mu = math.log(mean) - self.SIGMA ** 2 / 2
+        return self.random.lognormvariate(mu, self.SIGMA)
+
+    def chance(self, name):
+        return self.random.random() < self.rates[name]
+
+    def plan_outages(self, start, seconds):
+        """Draw the outage windows of [start, start + seconds) up front"""
+        for kind, (per_day, duration) in self.outage_rates.items():
+            windows, at = [], start
+            while per_day > 0:
+                at += self.random.expovariate(per_day / 86400)
+                if at >= start + seconds:
+                    break
+                windows.append((at, at + self.random.expovariate(1 / duration) if duration > 0 else at))
+            self.outages[kind] = windows
+        return self.outages
+
+    def in_outage(self, kind, now=None):
+        now = time.time() if now is None else now
+        return any(begin <= now < end for begin, end in self.outages[kind])
+
+
+class SimFault(Exception):
+    """An injected failure; classify_fault reads its fault_kind like the class of a real error"""
+
+    def __init__(self, fault_kind, message):
+        super().__init__(message)
+        self.fault_kind = fault_kind
+
+
+## Event log and status sink of a simulation
+# EN: Stands in for the status outbox: every update_contact lands here with its simulated timestamp
+# ES: Reemplaza al outbox de estados: cada update_contact llega aquí con su hora simulada
+class SimRecorder:
+    """Per-contact timeline (arrived, started, sent, final), sends and injected faults"""
+
+    def __init__(self):
+        self.contacts = {}          # contact id -> {'arrived', 'status', 'started', 'sent', 'final', 'path'}
+        self._by_phone = {}
+        self.sends = []             # Simulated times of successful sends, in order
+        self.faults = []            # (kind, time) of every injected fault
+
+    def arrive(self, contact, at):
+        self.contacts[contact.get('id')] = {'arrived': at, 'status': 'PENDING'}
+        self._by_phone[phone_digits(contact.get('phone'))] = contact.get('id')
+
+    def status(self, contact_id):
+        return self.contacts.get(contact_id, {}).get('status')
+
+    def enqueue(self, contact_id, status, message):
+        """update_contact() entry point (the StatusOutbox interface)"""
+        record = self.contacts.setdefault(contact_id, {'arrived': time.time()})
+        record['status'] = status
+        if status == 'STARTED':
+            record.setdefault('started', time.time())
+        elif status in FINAL_STATUSES:
+            record['final'] = time.time()
+        return True
+
+    def sent(self, phone, path):
+        record = self.contacts.get(self._by_phone.get(phone_digits(phone)))
+        if record is not None:
+            record.update(sent=time.time(), path=path)
+        self.sends.append(time.time())
+
+    def fault(self, kind):
+        self.faults.append((kind, time.time()))
+
+    def unsettled(self):
+        """Contacts still waiting to be sent, or sent and waiting for their receipt"""
+        return sum(1 for record in self.contacts.values()
+                   if record['status'] == 'PENDING' or (record['status'] == 'STARTED' and 'sent' in record))
+
+    def next_send(self, after):
+        """Time of the first successful send after `after`, or None"""
+        index = bisect.bisect_right(self.sends, after)
+        return self.sends[index] if index < len(self.sends) else None
+
+
+## Simulated contact feed
+# EN: Contacts arrive over simulated time; during an API outage only the already fetched page is served
+# ES: Los contactos llegan en el tiempo simulado; durante una caída de la API solo se sirve la página ya obtenida
+class SimFeed:
+    """The ContactFeed interface over synthetic contacts whose statuses live in the recorder"""
+
+    def __init__(self, list_name, arrivals, recorder, model, page_size=20):
+        self.list_name = list_name
+        self.recorder = recorder
+        self.model = model
+        self.page_size = page_size
+        self._incoming = sorted(arrivals, key=lambda entry: entry[0])   # [(arrival time, contact)]
+        self._contacts = {}
+        self._page = []
+        self._rejected = set()
+        self._done = set()
+
+    def _arrive(self, now):
+        while self._incoming and self._incoming[0][0] <= now:
+            at, contact = self._incoming.pop(0)
+            self._contacts[contact.get('id')] = contact
+            self.recorder.arrive(contact, at)
+
+    def _available(self, contact_id):
+        return (contact_id not in self._rejected and contact_id not in self._done
+                and self.recorder.status(contact_id) == 'PENDING')
+
+    async def pending(self):
+        now = time.time()
+        self._arrive(now)
+        if not self.model.in_outage(API, now):
+            available = (contact for contact_id, contact in self._contacts.items() if self._available(contact_id))
+            self._page = list(itertools.islice(available, self.page_size or None))
+        return self.cached()
+
+    def cached(self):
+        return [contact for contact in self._page if self._available(contact.get('id'))]
+
+    def reject(self, contact):
+        self._rejected.add(contact.get('id'))
+
+    def mark_done(self, contact):
+        self._done.add(contact.get('id'))
+
+    def exhausted(self):
+        """No contact is left to arrive"""
+        return not self._incoming
+
+    async def close(self):
+        pass
+
+
+class SimHistory:
+    """Just enough of AgentHistoryList for agent_succeeded()"""
+
+    def __init__(self, success):
+        evaluation = "Success - the message was sent" if success else "Failed - the send button was not found"
+        self.history = []
+        self.errors = []
+        self._thoughts = [SimpleNamespace(evaluation_previous_goal=evaluation)]
+
+    def is_done(self):
+        return True
+
+    def has_errors(self):
+        return False
+
+    def model_thoughts(self):
+        return self._thoughts
+
+
+class SimPage:
+    """The WhatsApp tab of a SimAgent, answering the chat-list query of whatsapp.chat_status"""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def is_closed(self):
+        return False
+
+    async def evaluate(self, script, args=None):
+        delivered_at = self.agent.delivered.get(args[0]) if args else None
+        return 'msg-dblcheck' if delivered_at is not None and delivered_at <= time.time() else 'msg-check'
+
+
+## Simulated browser agent
+# EN: Same interface as BrowserAgent; every step sleeps for a sampled latency and may fail like the real one
+# ES: Misma interfaz que BrowserAgent; cada paso espera una latencia muestreada y puede fallar como el real
+class SimAgent:
+    """BrowserAgent stand-in driven by a FaultModel (build it with functools.partial(SimAgent, model, recorder))"""
+
+    def __init__(self, model, recorder, name="Flor", on_complete=None, persistent=False, profile_dir=None,
+                 recycle_after=None, dom_diet=None):
+        self.model = model
+        self.recorder = recorder
+        self.name = name
+        self.system = detect_system()
+        self.on_complete = on_complete
+        self.persistent = persistent
+        self.recycle_after = int(recycle_after or DEFAULT_RECYCLE_AFTER)
+        self.contacts_served = 0
+        self.fault_detected = False
+        self.tasks = []
+        self.history = None
+        self.last_path = None
+        self.prepared_chat = None
+        self.launched = False
+        self.delivered = {}         # phone digits -> simulated time the ✓✓ shows up
+        self.page = SimPage(self)
+
+    async def _launch(self):
+        if not self.launched:
+            with get_metrics().span('browser_launch'):
+                await asyncio.sleep(self.model.latency('launch'))
+            self.launched = True
+
+    def reset_tasks(self):
+        self.tasks = []
+        return self
+
+    def release_history(self, contact_id=None):
+        self.history = None
+        self.on_complete = None
+
+    async def current_page(self):
+        return self.page if self.launched else None
+
+    async def preopen_chat(self, phone, timeout=60):
+        self.prepared_chat = None
+        await self._launch()
+        await asyncio.sleep(self.model.latency('open_chat'))
+        self.prepared_chat = phone_digits(phone)
+
+    async def reload_tab(self, timeout=60):
+        self.prepared_chat = None
+        if not self.launched:
+            return False
+        await asyncio.sleep(self.model.latency('reload'))
+        return True
+
+    async def run_steps(self, steps, checkpoint=None, routing=None, variables=None):
+        # EN: One contact: open the chat, then send scripted or through the (simulated) LLM agent
+        # ES: Un contacto: abre el chat y envía con pasos fijos o mediante el agente LLM (simulado)
+        """Simulate a contact's steps; sets last_path to 'scripted' or 'llm' and raises injected faults"""
+        model = self.model
+        await self._launch()
+        phone = next(((step.get('fast_path') or {}).get('phone') for step in steps
+                      if (step.get('fast_path') or {}).get('phone')), None) or (variables or {}).get('contact.phone')
+        prepared, self.prepared_chat = self.prepared_chat, None
+        if prepared and prepared == phone_digits(phone):
+            get_metrics().incr('prefetch_hits')
+        else:
+            await asyncio.sleep(model.latency('open_chat'))
+
+        if model.chance('invalid_number'):
+            self.recorder.fault(CONTACT)
+            raise InvalidNumberError(f"Phone number {phone} is not on WhatsApp")
+        if model.chance('browser_fault'):
+            self.recorder.fault(BROWSER)
+            raise SimFault(BROWSER, "Target page, context or browser has been closed")
+
+        sends = [step for step in steps if step_kind(step) == 'send'] or steps
+        if all(step.get('fast_path') for step in steps) and not model.chance('fast_path_failure'):
+            for _ in sends:
+                await asyncio.sleep(model.latency('send'))
+            if checkpoint is not None:
+                checkpoint.complete(*steps)
+            self.last_path = 'scripted'
+        else:
+            self.last_path = 'llm'
+            if model.in_outage(LLM):
+                await asyncio.sleep(model.latency('send'))
+                self.recorder.fault(LLM)
+                raise SimFault(LLM, "Service unavailable (simulated LLM outage)")
+            with get_metrics().span('llm_agent'):
+                await asyncio.sleep(model.latency('llm'))
+            self.history = SimHistory(success=not model.chance('agent_miss'))
+            if not self.history.model_thoughts()[-1].evaluation_previous_goal.startswith('Success'):
+                return self.history
+
+        self.recorder.sent(phone, self.last_path)
+        if not model.chance('undelivered'):
+            self.delivered[phone_digits(phone)] = time.time() + model.latency('delivery')
+        return self.history
+
+    async def health_check(self):
+        return self.launched
+
+    def mark_contact_done(self, fault=False):
+        self.contacts_served += 1
+        if fault:
+            self.fault_detected = True
+
+    def needs_recycle(self):
+        return self.fault_detected or self.contacts_served >= self.recycle_after
+
+    async def recycle(self):
+        get_metrics().incr('browser_recycles')
+        self.launched = False
+        self.prepared_chat = None
+        self.contacts_served = 0
+        self.fault_detected = False
+        await self._launch()
+
+    async def close(self):
+        self.prepared_chat = None
+        self.launched = False
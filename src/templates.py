@@ -0,0 +1,330 @@
+import hashlib
+import itertools
+import re
+from routing import TIERS, parse_routing
+from priority import parse_priority
+
+## Template syntax understood by the list YAML files
+# EN: {{get_message('key', contact)}}, {{contact.field}} and the {course}/{academy}/{agent_name} placeholders
+# ES: {{get_message('clave', contact)}}, {{contact.campo}} y los marcadores {course}/{academy}/{agent_name}
+TOKEN_PATTERN = re.compile(
+    r"\{\{\s*get_message\(\s*'(?P<message>[^']+)'\s*(?:,\s*contact\s*)?\)\s*\}\}"
+    r"|\{\{\s*contact\.(?P<field>\w+)\s*\}\}"
+    r"|\{(?P<var>course|academy|agent_name)\}"
+)
+# Any other {word} placeholder is a typo that str.format used to swallow at runtime
+UNKNOWN_PLACEHOLDER = re.compile(r"\{\{?\s*[A-Za-z_][\w.]*(\(.*?\))?\s*\}?\}")
+
+DEFAULT_LANGUAGE = 'en'
+DEFAULT_COURSE = 'generic'
+FALLBACK_NAMES = {'en': 'friend'}   # Any other language uses "amigo"
+ACADEMY_SUFFIX = '_and_academy_'
+
+
+class TemplateError(ValueError):
+    """A list template is invalid or cannot be resolved for a contact"""
+
+
+class ListConfig(dict):
+    """
+    A loaded list YAML (a plain dict) plus its compiled templates in `.compiled`
+    Un YAML de lista cargado (un dict normal) más sus plantillas compiladas en `.compiled`
+    """
+    name = None
+    compiled = None
+
+
+def _contact_course(contact):
+    return contact.get('course') or DEFAULT_COURSE
+
+
+def _contact_language(contact, available):
+    lang = contact.get('utmLanguage') or DEFAULT_LANGUAGE
+    return lang if lang in available else DEFAULT_LANGUAGE
+
+
+def _fill_key(key_template, course, academy):
+    """Resolve {course}/{academy} in a message key; no academy falls back to the course-only key"""
+    key = key_template.replace('{course}', course)
+    if '{academy}' in key:
+        if academy:
+            key = key.replace('{academy}', academy)
+        else:
+            key = key.split(ACADEMY_SUFFIX)[0]
+    return key
+
+
+def _compile(text, allow_messages):
+    """
+    Split a template once into a tuple of literal strings and (kind, name) tokens
+    Divide una plantilla una sola vez en una tupla de textos literales y tokens (tipo, nombre)
+    """
+    parts = []
+    position = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        literal = text[position:match.start()]
+        if UNKNOWN_PLACEHOLDER.search(literal):
+            raise TemplateError(f"Unknown placeholder {UNKNOWN_PLACEHOLDER.search(literal).group(0)!r} in template")
+        if literal:
+            parts.append(literal)
+        if match.group('message'):
+            if not allow_messages:
+                raise TemplateError("get_message() cannot be used inside a message template")
+            parts.append(('message', match.group('message')))
+        elif match.group('field'):
+            parts.append(('contact', match.group('field')))
+        else:
+            parts.append(('var', match.group('var')))
+        position = match.end()
+    literal = text[position:]
+    if UNKNOWN_PLACEHOLDER.search(literal):
+        raise TemplateError(f"Unknown placeholder {UNKNOWN_PLACEHOLDER.search(literal).group(0)!r} in template")
+    if literal:
+        parts.append(literal)
+    return tuple(parts)
+
+
+## Compiled form of a list configuration
+# EN: Every task and message is parsed once; rendering a contact is just joining precompiled pieces
+# ES: Cada tarea y mensaje se analiza una vez; procesar un contacto solo une piezas ya compiladas
+class CompiledList:
+    """Render functions for the tasks and messages of one list YAML"""
+
+    def __init__(self, list_config):
+        self.agent_name = list_config.get('agent', {}).get('name', '')
+        self.messages = {}
+        for message_type, variants in (list_config.get('messages') or {}).items():
+            if not isinstance(variants, dict):
+                raise TemplateError(f"Message '{message_type}' must map languages to text")
+            try:
+                self.messages[message_type] = {
+                    lang: _compile(str(text), allow_messages=False) for lang, text in variants.items()
+                }
+            except TemplateError as e:
+                raise TemplateError(f"Message '{message_type}': {e}")
+
+        # EN: Fallback keys declared in status_tasks (e.g. course+academy -> course only)
+        # ES: Claves de respaldo declaradas en status_tasks (p. ej. curso+academia -> solo curso)
+        self.status_tasks = list_config.get('status_tasks') or {}
+        self.fallbacks = {}
+        for entries in self.status_tasks.values():
+            for entry in entries or []:
+                if entry.get('type') == 'message' and entry.get('fallback'):
+                    self.fallbacks[entry['key']] = entry['fallback']
+
+        # EN: Optional per-step model routing (agent.routing) and per-task tier
+        # ES: Enrutamiento opcional de modelos por paso (agent.routing) y nivel por tarea
+        try:
+            self.routing = parse_routing((list_config.get('agent') or {}).get('routing'))
+        except ValueError as e:
+            raise TemplateError(str(e))
+
+        # EN: Optional expected-value ordering of pending contacts (top-level `priority` block)
+        # ES: Orden opcional de los contactos pendientes por valor esperado (bloque `priority`)
+        try:
+            self.priority = parse_priority(list_config.get('priority'))
+        except ValueError as e:
+            raise TemplateError(str(e))
+        self.languages = sorted({lang for variants in self.messages.values() for lang in variants})
+
+        self.tasks = []
+        for index, task_item in enumerate((list_config.get('agent') or {}).get('tasks') or []):
+            try:
+                fast_path = task_item.get('fast_path')
+                if task_item.get('tier') is not None and task_item['tier'] not in TIERS:
+                    raise TemplateError(f"tier must be one of: {', '.join(TIERS)}")
+                task = {
+                    'system': task_item.get('system'),
+                    'tier': task_item.get('tier'),
+                    'task': _compile(task_item['task'], allow_messages=True),
+                    'fast_path': {
+                        key: _compile(value, allow_messages=True) if isinstance(value, str) else value
+                        for key, value in fast_path.items()
+                    } if fast_path else None,
+                }
+                # Stable identity of the task template, used to cache the agent's plan for it
+                task['key'] = hashlib.sha1(repr((task['system'], task['task'])).encode('utf-8')).hexdigest()[:12]
+                self.tasks.append(task)
+            except TemplateError as e:
+                raise TemplateError(f"Task {index + 1}: {e}")
+
+        self._keys = {}      # (key template, course, academy) -> resolved message key
+        self._strings = {}   # ad-hoc template string -> compiled parts
+
+    def resolve_key(self, key_template, course, academy):
+        # EN: Find the message for a key template, using the status_tasks fallback when needed
+        # ES: Busca el mensaje para una plantilla de clave, usando el respaldo de status_tasks si hace falta
+        """Return the message key a contact's course/academy resolves to"""
+        cache_key = (key_template, course, academy)
+        if cache_key in self._keys:
+            return self._keys[cache_key]
+        key = _fill_key(key_template, course, academy)
+        if key not in self.messages and key_template in self.fallbacks:
+            key = _fill_key(self.fallbacks[key_template], course, academy)
+        if key not in self.messages:
+            raise TemplateError(f"Message type '{key}' not found in list configuration")
+        self._keys[cache_key] = key
+        return key
+
+    def message(self, message_type, contact, agent_name):
+        """Render a message by its exact key (same rules as utils.get_message)"""
+        if message_type not in self.messages:
+            raise TemplateError(f"Message type '{message_type}' not found in list configuration")
+        variants = self.messages[message_type]
+        lang = _contact_language(contact, variants)
+        if lang not in variants:
+            raise TemplateError(f"Message '{message_type}' has no '{DEFAULT_LANGUAGE}' version")
+
+        contact_name = (contact.get('name') or '').strip() or FALLBACK_NAMES.get(lang, 'amigo')
+        values = {
+            'course': _contact_course(contact),
+            'academy': contact.get('academy') or '',
+            'agent_name': agent_name,
+        }
+        rendered = []
+        for part in variants[lang]:
+            if isinstance(part, str):
+                rendered.append(part)
+            elif part[0] == 'contact':
+                rendered.append(contact_name if part[1] == 'name' else str(contact.get(part[1], '')))
+            else:
+                rendered.append(values[part[1]])
+        return ''.join(rendered)
+
+    def _render(self, parts, contact, agent_name):
+        rendered = []
+        for part in parts:
+            if isinstance(part, str):
+                rendered.append(part)
+            elif part[0] == 'message':
+                key = self.resolve_key(part[1], _contact_course(contact), contact.get('academy') or '')
+                rendered.append(self.message(key, contact, agent_name))
+            elif part[0] == 'contact':
+                rendered.append(str(contact.get(part[1], '')))
+            elif part[1] == 'agent_name':
+                rendered.append(agent_name)
+            elif part[1] == 'course':
+                rendered.append(_contact_course(contact))
+            else:
+                rendered.append(contact.get('academy') or '')
+        return ''.join(rendered)
+
+    def render_string(self, template_str, contact, agent_name):
+        """Render an arbitrary template string, compiling it on first use"""
+        parts = self._strings.get(template_str)
+        if parts is None:
+            parts = self._strings[template_str] = _compile(template_str, allow_messages=True)
+        return self._render(parts, contact, agent_name)
+
+    def render_steps(self, contact, agent_name=None, system=None):
+        # EN: Build the list of {'task', 'fast_path'} steps for one contact
+        # ES: Construye la lista de pasos {'task', 'fast_path'} para un contacto
+        """Render every task of the list for a contact"""
+        agent_name = agent_name or self.agent_name
+        steps = []
+        for task in self.tasks:
+            # Skip tasks that are specific to a different system
+            if task['system'] and system and task['system'] != system:
+                continue
+            fast_path = None
+            if task['fast_path']:
+                fast_path = {
+                    key: self._render(value, contact, agent_name) if isinstance(value, tuple) else value
+                    for key, value in task['fast_path'].items()
+                }
+            step = {'task': self._render(task['task'], contact, agent_name), 'fast_path': fast_path,
+                    'template': task['key']}
+            if task['tier']:
+                step['tier'] = task['tier']
+            steps.append(step)
+        return steps
+
+    def variables(self, contact, agent_name=None):
+        # EN: The contact-specific values an agent plan may contain, so it can be replayed for another contact
+        # ES: Los valores propios del contacto que puede contener un plan del agente, para repetirlo con otro contacto
+        """Return {variable name: rendered value} for the contact fields and messages used by the tasks"""
+        agent_name = agent_name or self.agent_name
+        fields, messages = {'name', 'phone'}, set()
+        for task in self.tasks:
+            for parts in [task['task']] + [v for v in (task['fast_path'] or {}).values() if isinstance(v, tuple)]:
+                fields.update(part[1] for part in parts if isinstance(part, tuple) and part[0] == 'contact')
+                messages.update(part[1] for part in parts if isinstance(part, tuple) and part[0] == 'message')
+
+        values = {f'contact.{field}': str(contact.get(field) or '') for field in fields}
+        values['contact.phone:digits'] = re.sub(r"\D", '', values['contact.phone'])
+        for template in messages:
+            values[f'message:{template}'] = self._render((('message', template),), contact, agent_name)
+        return {name: value for name, value in values.items() if value.strip()}
+
+    def render_contacts(self, contacts, agent_name=None, system=None):
+        # EN: Render all contacts in one pass so bad data is found before a browser starts
+        # ES: Procesa todos los contactos de una vez para detectar datos inválidos antes de abrir el navegador
+        """Return ({contact id: steps}, {contact id: error message})"""
+        rendered, errors = {}, {}
+        for contact in contacts:
+            try:
+                rendered[contact.get('id')] = self.render_steps(contact, agent_name, system)
+            except TemplateError as e:
+                errors[contact.get('id')] = str(e)
+        return rendered, errors
+
+    def _key_templates(self):
+        """Every message key template referenced by status_tasks and agent tasks"""
+        templates = set()
+        for entries in self.status_tasks.values():
+            for entry in entries or []:
+                if entry.get('type') == 'message':
+                    templates.add(entry['key'])
+        for task in self.tasks:
+            for parts in [task['task']] + [v for v in (task['fast_path'] or {}).values() if isinstance(v, tuple)]:
+                templates.update(part[1] for part in parts if isinstance(part, tuple) and part[0] == 'message')
+        return templates
+
+    def _known_values(self, templates):
+        """Collect the courses and academies that appear in message keys matching the templates"""
+        courses, academies = {DEFAULT_COURSE}, {''}
+        for template in templates | set(self.fallbacks.values()):
+            if '{course}' not in template and '{academy}' not in template:
+                continue
+            pattern = re.escape(template).replace(r'\{course\}', '(?P<course>.+?)').replace(r'\{academy\}', '(?P<academy>.+)')
+            for message_type in self.messages:
+                match = re.fullmatch(pattern, message_type)
+                if match:
+                    groups = match.groupdict()
+                    if groups.get('course'):
+                        courses.add(groups['course'])
+                    if groups.get('academy'):
+                        academies.add(groups['academy'])
+        return courses, academies
+
+    def validate(self):
+        # EN: Check up front that every course/academy/language combination resolves to a message
+        # ES: Verifica de antemano que cada combinación de curso/academia/idioma tenga un mensaje
+        """Raise TemplateError listing every problem found in the list configuration"""
+        problems = []
+        for message_type, variants in self.messages.items():
+            if DEFAULT_LANGUAGE not in variants:
+                problems.append(f"Message '{message_type}' has no '{DEFAULT_LANGUAGE}' version to fall back to")
+
+        templates = self._key_templates()
+        courses, academies = self._known_values(templates)
+        for template in sorted(templates):
+            for course, academy in itertools.product(sorted(courses), sorted(academies)):
+                try:
+                    self.resolve_key(template, course, academy)
+                except TemplateError as e:
+                    problems.append(f"{template} (course={course}, academy={academy or '-'}): {e}")
+
+        if problems:
+            raise TemplateError("Invalid list configuration:\n  " + "\n  ".join(problems))
+        return self
+
+
+def compile_list_config(raw_config):
+    """
+    Compile and validate a list YAML dictionary, returning a ListConfig
+    Compila y valida un diccionario YAML de lista, devolviendo un ListConfig
+    """
+    list_config = ListConfig(raw_config or {})
+    list_config.compiled = CompiledList(list_config).validate()
+    return list_config
@@ -0,0 +1,271 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from metrics import get_metrics
+
+## Defaults for the conversation log
+# EN: Where agent transcripts are kept and how much disk they may use
+# ES: Dónde se guardan las conversaciones del agente y cuánto disco pueden ocupar
+DEFAULT_CONVERSATION_DIR = os.path.join('logs', 'conversation')
+DEFAULT_MAX_MB = 500            # Total size of all segments before the oldest are deleted
+DEFAULT_MAX_DAYS = 14           # Segments older than this are deleted
+MAX_PENDING = 1000              # Records buffered in memory; the oldest are dropped beyond this
+RETENTION_INTERVAL = 600        # Seconds between retention sweeps
+INDEX_FILE = 'index.jsonl'
+SEGMENT_SUFFIX = '.jsonl.gz'
+
+
+def _message_dict(message):
+    """A LangChain message as a plain {type, content} dictionary"""
+    return {'type': getattr(message, 'type', type(message).__name__), 'content': getattr(message, 'content', str(message))}
+
+
+def _jsonable(value):
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+
+## One agent run for one contact
+# EN: Each run is written to its own gzip segment, listed in the index when it finishes
+# ES: Cada ejecución se escribe en su propio segmento gzip, que se agrega al índice al terminar
+class ConversationRun:
+    """Collects the steps of one browser_use Agent run"""
+
+    def __init__(self, log, contact_id, run_id, path):
+        self.log = log
+        self.contact_id = contact_id
+        self.run_id = run_id
+        self.path = path
+        self.started_at = time.time()
+        self.steps = 0
+
+    def step(self, agent, state, model_output, step_number):
+        # EN: register_new_step_callback hook: only references are queued, serialization happens off the loop
+        # ES: Hook register_new_step_callback: solo se encolan referencias, la serialización ocurre fuera del bucle
+        """Record one agent step (prompt messages, page and model output)"""
+        manager = getattr(agent, '_message_manager', None) or getattr(agent, 'message_manager', None)
+        messages = list(manager.get_messages()) if manager is not None else None
+        self.steps += 1
+        self.log.submit(self, {
+            'type': 'step',
+            'ts': round(time.time(), 3),
+            'step': step_number,
+            'url': getattr(state, 'url', None),
+            'title': getattr(state, 'title', None),
+            'messages': messages,
+            'model_output': model_output,
+        })
+
+    def finish(self, history=None, error=None):
+        """Record the run result and add the segment to the index"""
+        record = {'type': 'finish', 'ts': round(time.time(), 3), 'steps': self.steps, 'error': error}
+        if history is not None:
+            record.update({
+                'done': history.is_done(),
+                'final_result': history.final_result(),
+                'errors': [e for e in history.errors() if e],
+            })
+        self.log.submit(self, record)
+
+
+## Bounded, compressed, write-behind store for agent transcripts
+# EN: Replaces browser_use's save_conversation_path, which wrote plain text synchronously on every step
+# ES: Reemplaza save_conversation_path de browser_use, que escribía texto plano de forma síncrona en cada paso
+class ConversationLog:
+    """
+    Agent transcripts grouped per contact and run, written in the background.
+
+    Records are buffered in memory and written by a background task in a worker thread,
+    one gzip segment per run (<dir>/<date>/<contact>-<run>.jsonl.gz) plus an index.jsonl.
+    Segments older than max_days, or beyond max_mb in total, are deleted oldest first.
+    An empty CONVERSATION_LOG_DIR disables the log.
+    """
+
+    def __init__(self, directory=None, max_mb=None, max_days=None, max_pending=MAX_PENDING):
+        self.directory = os.getenv('CONVERSATION_LOG_DIR', DEFAULT_CONVERSATION_DIR) if directory is None else directory
+        self.max_bytes = float(max_mb or os.getenv('CONVERSATION_LOG_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024
+        self.max_age = float(max_days or os.getenv('CONVERSATION_LOG_MAX_DAYS', DEFAULT_MAX_DAYS)) * 86400
+        self.enabled = bool(self.directory)
+
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._counter = 0
+        self._swept_at = 0
+        self._loop = None
+        self._wakeup = None
+        self._worker = None
+
+    def begin(self, contact_id):
+        """Start the transcript of a new agent run for a contact"""
+        self._counter += 1
+        run_id = f"{time.strftime('%H%M%S')}-{os.getpid()}-{self._counter}"
+        path = os.path.join(self.directory, time.strftime('%Y-%m-%d'), f"{'unknown' if contact_id is None else contact_id}-{run_id}{SEGMENT_SUFFIX}")
+        if self.enabled and self._worker is None:
+            self.start()
+        return ConversationRun(self, contact_id, run_id, path)
+
+    def submit(self, run, record):
+        # EN: Never blocks: a full buffer drops its oldest record instead of waiting for the disk
+        # ES: Nunca bloquea: con el búfer lleno se descarta el registro más antiguo en lugar de esperar al disco
+        if not self.enabled:
+            return
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                get_metrics().incr('conversation_records_dropped')
+            self._pending.append((run, record))
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+    def start(self):
+        """Start the background writer on the running event loop"""
+        if not self.enabled or self._worker is not None:
+            return self
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self  # No loop yet: records are written on close()
+        self._wakeup = asyncio.Event()
+        self._worker = self._loop.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.to_thread(self._write_pending)
+
+    def _take_pending(self):
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        return batch
+
+    def _write_pending(self):
+        """Append buffered records to their segments (runs in a worker thread)"""
+        with self._write_lock:
+            batch = self._take_pending()
+            by_run = {}
+            for run, record in batch:
+                by_run.setdefault(run, []).append(record)
+            for run, records in by_run.items():
+                try:
+                    self._append(run, records)
+                except Exception as e:
+                    get_metrics().incr('conversation_write_errors')
+                    print(f"⚠️ Could not write conversation log {run.path}: {e}")
+            if time.time() - self._swept_at >= RETENTION_INTERVAL:
+                self._swept_at = time.time()
+                self.enforce_retention()
+
+    def _append(self, run, records):
+        os.makedirs(os.path.dirname(run.path), exist_ok=True)
+        lines = []
+        for record in records:
+            if record.get('messages') is not None:
+                record = {**record, 'messages': [_message_dict(message) for message in record['messages']]}
+            lines.append(json.dumps(record, default=_jsonable, ensure_ascii=False))
+        # Every append is a new gzip member; concatenated members read back as one stream
+        with gzip.open(run.path, 'at', encoding='utf-8', compresslevel=6) as f:
+            f.write('\n'.join(lines) + '\n')
+        finished = [record for record in records if record['type'] == 'finish']
+        if finished:
+            entry = {
+                'contact_id': run.contact_id,
+                'run_id': run.run_id,
+                'path': os.path.relpath(run.path, self.directory),
+                'started': round(run.started_at, 3),
+                'finished': finished[-1]['ts'],
+                'steps': run.steps,
+                'bytes': os.path.getsize(run.path),
+            }
+            with open(os.path.join(self.directory, INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def _segments(self):
+        segments = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(SEGMENT_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    segments.append((stat.st_mtime, stat.st_size, path))
+        return sorted(segments)
+
+    def enforce_retention(self):
+        # EN: Delete segments past the age limit, then the oldest ones until the size cap is met
+        # ES: Borra los segmentos que superan la antigüedad y luego los más antiguos hasta cumplir el tamaño máximo
+        """Apply the size and age caps; return the number of segments deleted"""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return 0
+        segments = self._segments()
+        total = sum(size for _, size, _ in segments)
+        cutoff = time.time() - self.max_age
+        removed = set()
+        for mtime, size, path in segments:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed.add(os.path.relpath(path, self.directory))
+            total -= size
+        if removed:
+            self._rewrite_index(removed)
+            for root, dirs, files in os.walk(self.directory, topdown=False):
+                if root != self.directory and not dirs and not files:
+                    os.rmdir(root)
+            get_metrics().incr('conversation_segments_deleted', len(removed))
+        return len(removed)
+
+    def _rewrite_index(self, removed):
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        temp_path = f"{index_path}.tmp"
+        with open(index_path, 'r', encoding='utf-8') as source, open(temp_path, 'w', encoding='utf-8') as target:
+            for line in source:
+                try:
+                    if json.loads(line).get('path') in removed:
+                        continue
+                except ValueError:
+                    continue
+                target.write(line)
+        os.replace(temp_path, index_path)
+
+    async def close(self):
+        """Stop the writer and write whatever is still buffered"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self.enabled:
+            await asyncio.to_thread(self._write_pending)
+
+
+_conversation_log = None
+
+def get_conversation_log():
+    """
+    The process-wide conversation log
+    El registro de conversaciones compartido por todo el proceso
+    """
+    global _conversation_log
+    if _conversation_log is None:
+        _conversation_log = ConversationLog()
+    return _conversation_log
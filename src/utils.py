@@ -1,20 +1,42 @@
 import yaml
 import os
 import requests
-import sys
-import time
 from string import Template
 import threading
-if os.name == 'nt':
-    import msvcrt
-else:
-    import select
+from templates import compile_list_config
+from metrics import get_metrics
+
+## Followups API base URL
+# EN: Can be pointed at another server (e.g. a local stand-in) with FOLLOWUPS_API_URL
+# ES: Se puede apuntar a otro servidor (p. ej. uno local de pruebas) con FOLLOWUPS_API_URL
+DEFAULT_API_BASE_URL = "https://brevo-webhook.replit.app/api/followups"
+
+def api_base_url():
+    """Followups API base URL, read when used so a .env loaded later still applies"""
+    return os.getenv('FOLLOWUPS_API_URL', DEFAULT_API_BASE_URL).rstrip('/')
+
+## Optional write-behind outbox used by update_contact
+# EN: When set, status updates are journaled and sent in the background instead of blocking
+# ES: Si está definido, las actualizaciones se registran y se envían en segundo plano sin bloquear
+_status_outbox = None
+
+def set_status_outbox(outbox):
+    """
+    Route update_contact through a StatusOutbox (or back to direct requests with None)
+    Envía update_contact a través de un StatusOutbox (o de vuelta a solicitudes directas con None)
+    """
+    global _status_outbox
+    _status_outbox = outbox
 
 def get_message(message_type, contact, agent_name, list_config):
     """
     Get a message from the list configuration and personalize it for a contact
     Obtiene un mensaje de la configuración de la lista y lo personaliza para un contacto
     """
+    compiled = getattr(list_config, 'compiled', None)
+    if compiled is not None:
+        return compiled.message(message_type, contact, agent_name)
+
     if message_type not in list_config['messages']:
         raise ValueError(f"Message type '{message_type}' not found in list configuration")
     
@@ -57,132 +79,47 @@ def get_message(message_type, contact, agent_name, list_config):
         return message  # Return unformatted message as fallback
         # Devuelve el mensaje sin formato si ocurre un error
 
+## Compiled list configurations, keyed by YML path and modification time
+# EN: Each list YAML is parsed, compiled and validated once; editing the file invalidates the entry
+# ES: Cada YAML de lista se analiza, compila y valida una vez; editar el archivo invalida la entrada
+_list_config_cache = {}
+LIST_CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'followup-list')
+
 def load_list_config(list_name):
     """
     Load the configuration for a specific list from its YML file
     Carga la configuración para una lista específica desde su archivo YML
+
+    The result is a dict with compiled templates in `.compiled`. Raises TemplateError if any
+    course/academy/language combination referenced by the list cannot be resolved.
     """
-    yml_path = os.path.join('src', 'followup-list', f'{list_name}.yml')
+    yml_path = os.path.join(LIST_CONFIG_DIR, f'{list_name}.yml')
     if not os.path.exists(yml_path):
         raise FileNotFoundError(f"List configuration file not found: {yml_path}")
-    
-    with open(yml_path, 'r') as f:
-        return yaml.safe_load(f)
-
-def process_template_string(template_str, contact, agent_name, list_config):
-    """
-    Process a template string, replacing variables and function calls
-    Procesa una cadena de plantilla, reemplazando variables y llamadas de función
-    """
-    # Replace get_message calls
-    # Reemplaza llamadas a get_message
-    if '{{get_message(' in template_str:
-        # Extract the message type and format the get_message call
-        # Extrae el tipo de mensaje y formatea la llamada a get_message
-        parts = template_str.split('{{get_message(')[1].split(')}}')[0]
-        message_type = parts.split(',')[0].strip("'")
-        
-        # Format the message type with contact values if needed
-        # Formatea el tipo de mensaje con los valores del contacto si es necesario
-        if '{course}' in message_type:
-            course = contact.get('course', 'generic')
-            message_type = message_type.replace('{course}', course)
-        if '{academy}' in message_type:
-            academy = contact.get('academy', '')
-            if academy:
-                message_type = message_type.replace('{academy}', academy)
-            else:
-                # If no academy specified, fall back to the course-only template
-                # Si no se especifica academia, usa la plantilla solo de curso
-                message_type = message_type.split('_and_academy_')[0]
-                
-        return get_message(message_type, contact, agent_name, list_config)
-    
-    # Handle contact variables with {{contact.field}} syntax
-    # Maneja variables de contacto con la sintaxis {{contact.campo}}
-    if '{{contact.' in template_str:
-        # Find all contact variable references
-        # Encuentra todas las referencias de variables de contacto
-        parts = template_str.split('{{')
-        result = parts[0]
-        for part in parts[1:]:
-            if 'contact.' in part:
-                field = part.split('}}')[0].split('.')[1]
-                value = contact.get(field, '')
-                result += str(value) + part.split('}}')[1]
-            else:
-                result += '{{' + part
-        return result
-    
-    return template_str
 
-def countdown(seconds):
-    """
-    Show a countdown timer that can be skipped by pressing Enter
-    Muestra un temporizador regresivo que se puede omitir presionando Enter
-    """
-    def check_input():
-        if os.name == 'nt':  # Windows
-            # Check for Enter key on Windows
-            # Verifica la tecla Enter en Windows
-            return msvcrt.kbhit() and msvcrt.getch() == b'\r'
-        else:  # Unix-like
-            # Check for Enter key on Unix-like systems
-            # Verifica la tecla Enter en sistemas tipo Unix
-            return select.select([sys.stdin], [], [], 0)[0] and sys.stdin.read(1) == '\n'
-
-    for i in range(seconds, 0, -1):
-        sys.stdout.write(f"\rWaiting {i} seconds before next contact... (Press Enter to skip) ")
-        # EN: Esperando antes del siguiente contacto... (Presiona Enter para saltar)
-        # ES: Esperando antes del siguiente contacto... (Presiona Enter para saltar)
-        sys.stdout.flush()
-        
-        # Check for input every 0.1 seconds
-        # Verifica la entrada cada 0.1 segundos
-        for _ in range(10):
-            if check_input():
-                sys.stdout.write("\r" + " " * 70 + "\r")  # Clear the line
-                # Limpia la línea
-                sys.stdout.flush()
-                return
-            time.sleep(0.1)
-    
-    sys.stdout.write("\r" + " " * 70 + "\r")  # Clear the line
-    # Limpia la línea
-    sys.stdout.flush()
-
-def get_pending_contacts(list_name):
-    """
-    Fetch pending contacts from the API
-    Obtiene contactos pendientes desde la API
-    """
-    url = f"https://brevo-webhook.replit.app/api/followups/{list_name}?status=PENDING"
-    response = requests.get(url)
-    if response.status_code == 200:
-        json_response = response.json()
-        if 'data' in json_response and isinstance(json_response['data'], list):
-            return json_response['data']
-        else:
-            print("No contacts array found in the response") # EN: No contacts array found
-            print("No se encontró el arreglo de contactos en la respuesta") # ES: No se encontró el arreglo de contactos
-            return []
-    else:
-        print(f"Error fetching contacts for {url}:", response.status_code) # EN: Error fetching contacts
-        print(f"Error al obtener contactos para {url}:", response.status_code) # ES: Error al obtener contactos
-        return []
+    cache_key = (yml_path, os.path.getmtime(yml_path))
+    if cache_key not in _list_config_cache:
+        with open(yml_path, 'r') as f:
+            _list_config_cache[cache_key] = compile_list_config(yaml.safe_load(f))
+            _list_config_cache[cache_key].name = list_name
+    return _list_config_cache[cache_key]
 
 def update_contact(contact_id, status, message):
     """
     Update a contact's status and message in the API
     Actualiza el estado y mensaje de un contacto en la API
     """
+    if _status_outbox is not None:
+        return _status_outbox.enqueue(contact_id, status, message)
+
     try:
-        url = f"https://brevo-webhook.replit.app/api/followups/{contact_id}"
+        url = f"{api_base_url()}/{contact_id}"
         data = {
             "status": status,
             "statusText": message
         }
-        response = requests.put(url, json=data)
+        with get_metrics().span('update_contact'):
+            response = requests.put(url, json=data)
         if response.status_code == 200:
             print(f"Successfully updated contact {contact_id} to status {status}") # EN: Successfully updated contact
             print(f"Contacto {contact_id} actualizado exitosamente al estado {status}") # ES: Contacto actualizado exitosamente
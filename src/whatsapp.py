@@ -0,0 +1,216 @@
+import asyncio
+import os
+from urllib.parse import urlparse
+
+## WhatsApp Web entry points
+# EN: Base URL and the deep link that opens a chat with a phone number (WHATSAPP_WEB_URL points them elsewhere)
+# ES: URL base y el enlace directo que abre un chat con un número (WHATSAPP_WEB_URL los apunta a otro servidor)
+WHATSAPP_URL = "https://web.whatsapp.com/"
+CHAT_PATH = "send/?phone={phone}&text&type=phone_number&app_absent=0"
+
+
+def whatsapp_url():
+    """Base URL of WhatsApp Web, or of the local stand-in set in WHATSAPP_WEB_URL"""
+    return os.getenv('WHATSAPP_WEB_URL', WHATSAPP_URL).rstrip('/') + '/'
+
+
+def phone_digits(phone):
+    """Only the digits of a phone number, as WhatsApp deep links and chat titles compare them"""
+    return ''.join(ch for ch in str(phone or '') if ch.isdigit())
+
+
+def chat_url(phone):
+    """Deep link that opens the chat with a phone number"""
+    return whatsapp_url() + CHAT_PATH.format(phone=phone)
+
+## Selectors for the WhatsApp Web page
+# EN: Direct selectors used by the scripted fast path and the session health checks
+# ES: Selectores directos usados por la ruta rápida y las verificaciones de sesión
+WHATSAPP_SELECTORS = {
+    'app_ready': '#side',                                          # Chat sidebar, only present when logged in
+    'qr_code': 'canvas[aria-label*="Scan"]',                       # QR code shown when the session is not linked
+    'composer': 'footer div[contenteditable="true"]',              # "Type a message" input box
+    'send_button': 'button[aria-label="Send"], span[data-icon="send"]',  # Paper plane icon
+    'invalid_number': 'div[data-animate-modal-popup="true"]',      # "Phone number shared via url is invalid"
+    'dialog': 'div[role="dialog"]',                                # Permission prompts and other popups
+    'outgoing_message': 'div.message-out',                         # Messages we sent in the open chat
+    'status_icon': 'span[data-icon^="msg-"]',                      # ✓ / ✓✓ / clock icon inside a message
+    'chat_row': '#pane-side div[role="listitem"], #pane-side div[role="row"]',  # Chats in the sidebar
+    'chat_title': 'span[title]',                                   # Contact name or phone inside a chat row
+}
+
+## Message status icons
+# EN: data-icon values WhatsApp uses for the delivery state of an outgoing message
+# ES: Valores de data-icon que WhatsApp usa para el estado de entrega de un mensaje enviado
+STATUS_ICONS = {
+    'msg-time': 'PENDING',
+    'msg-check': 'SENT',
+    'msg-dblcheck': 'DELIVERED',
+    'msg-dblcheck-ack': 'READ',
+}
+CONFIRMED = ('DELIVERED', 'READ')   # ✓✓, grey or blue: the message reached the phone
+
+class ScriptedStepError(Exception):
+    """A scripted step could not find the page state it expected"""
+
+
+class InvalidNumberError(ScriptedStepError):
+    """The contact's phone number cannot be used on WhatsApp (no LLM agent can fix that)"""
+
+
+async def dismiss_prompts(page):
+    # EN: Close permission prompts (microphone, camera, notifications) with Escape
+    # ES: Cierra los avisos de permisos (micrófono, cámara, notificaciones) con Escape
+    """Dismiss any open dialog on the page"""
+    if await page.query_selector(WHATSAPP_SELECTORS['dialog']):
+        await page.keyboard.press("Escape")
+
+
+async def open_chat(page, phone, timeout=60):
+    # EN: Open the chat through the deep link and wait for the message box
+    # ES: Abre el chat con el enlace directo y espera la caja de mensajes
+    """Navigate to a contact's chat and wait until the composer is ready"""
+    phone = phone_digits(phone)
+    if not phone:
+        raise InvalidNumberError("Contact phone has no digits")
+
+    await page.goto(chat_url(phone))
+    try:
+        await page.wait_for_selector(
+            f"{WHATSAPP_SELECTORS['composer']}, {WHATSAPP_SELECTORS['invalid_number']}",
+            timeout=timeout * 1000
+        )
+    except Exception as e:
+        raise ScriptedStepError(f"Chat did not load: {e}")
+
+    if await page.query_selector(WHATSAPP_SELECTORS['invalid_number']):
+        raise InvalidNumberError(f"WhatsApp reports the phone number {phone} as invalid")
+
+    await dismiss_prompts(page)
+    return page
+
+
+async def last_message_status(page):
+    # EN: Read the delivery status icon of the most recent outgoing message
+    # ES: Lee el icono de estado del último mensaje enviado
+    """Return PENDING, SENT, DELIVERED or None for the last outgoing message"""
+    messages = await page.query_selector_all(WHATSAPP_SELECTORS['outgoing_message'])
+    if not messages:
+        return None
+    icon = await messages[-1].query_selector(WHATSAPP_SELECTORS['status_icon'])
+    if not icon:
+        return None
+    return STATUS_ICONS.get(await icon.get_attribute('data-icon'))
+
+
+async def chat_status(page, phone, name=None):
+    # EN: Read the status of our last message to a contact from the chat list, without opening the chat
+    # ES: Lee el estado de nuestro último mensaje a un contacto desde la lista de chats, sin abrir el chat
+    """Return PENDING, SENT, DELIVERED, READ or None for a contact's chat row in the sidebar"""
+    digits = phone_digits(phone)
+    icon = await page.evaluate("""([digits, name, rowSelector, titleSelector, iconSelector]) => {
+        for (const row of document.querySelectorAll(rowSelector)) {
+            const title = row.querySelector(titleSelector);
+            if (!title) continue;
+            const text = title.getAttribute('title') || '';
+            if ((digits && text.replace(/\\D/g, '') === digits) || (name && text === name)) {
+                const icon = row.querySelector(iconSelector);
+                return icon ? icon.getAttribute('data-icon') : null;
+            }
+        }
+        return null;
+    }""", [digits, name, WHATSAPP_SELECTORS['chat_row'], WHATSAPP_SELECTORS['chat_title'],
+           WHATSAPP_SELECTORS['status_icon']])
+    return STATUS_ICONS.get(icon)
+
+
+async def message_in_chat(page, text, recent=10, times=1):
+    # EN: Idempotency check: is this exact message already among our latest bubbles in the open chat?
+    # ES: Verificación de idempotencia: ¿este mensaje ya está entre nuestras últimas burbujas del chat abierto?
+    """
+    Return True if at least `times` of the last outgoing messages have the same text (ignoring
+    whitespace). A contact whose steps send the same text twice needs two bubbles for the second.
+    """
+    wanted = ' '.join((text or '').split())
+    if not wanted:
+        return False
+    texts = await page.evaluate("""([selector, recent]) =>
+        Array.from(document.querySelectorAll(selector)).slice(-recent).map(bubble => bubble.innerText || '')
+    """, [WHATSAPP_SELECTORS['outgoing_message'], recent])
+    return sum(wanted in ' '.join(bubble.split()) for bubble in texts) >= times
+
+
+async def page_fingerprint(page):
+    # EN: Coarse page state used to key cached agent plans (not the contact, only where we are)
+    # ES: Estado aproximado de la página para indexar los planes del agente (no el contacto, solo dónde estamos)
+    """Return 'host/section|flags' with which WhatsApp landmarks (app, composer, dialog, QR) are on screen"""
+    parsed = urlparse(page.url)
+    section = parsed.path.strip('/').split('/')[0]
+    landmarks = [WHATSAPP_SELECTORS[name] for name in ('app_ready', 'composer', 'dialog', 'qr_code')]
+    present = await page.evaluate(
+        "(selectors) => selectors.map(selector => !!document.querySelector(selector))", landmarks)
+    return f"{parsed.netloc}/{section}|" + ''.join('1' if flag else '0' for flag in present)
+
+
+async def wait_for_status(page, wanted=CONFIRMED, timeout=60):
+    # EN: Poll the last outgoing message until it reaches one of the wanted states
+    # ES: Consulta el último mensaje enviado hasta que llegue a uno de los estados esperados
+    """Wait until the last outgoing message shows one of the wanted statuses"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if await last_message_status(page) in wanted:
+            return True
+        await asyncio.sleep(0.5)
+    raise ScriptedStepError(f"Last message did not reach {'/'.join(wanted)} in {timeout}s")
+
+
+async def send_message(page, text, timeout=30):
+    # EN: Type the whole message into the composer and click send once
+    # ES: Escribe el mensaje completo en la caja y hace clic en enviar una sola vez
+    """Type a message as a single block and send it"""
+    text = (text or '').strip()
+    if not text:
+        raise ScriptedStepError("Message text is empty")
+
+    composer = await page.query_selector(WHATSAPP_SELECTORS['composer'])
+    if not composer:
+        raise ScriptedStepError("Message input box not found")
+
+    sent_before = len(await page.query_selector_all(WHATSAPP_SELECTORS['outgoing_message']))
+
+    await composer.click()
+    # Enter would send the message early, so line breaks are typed with Shift+Enter
+    lines = text.split('\n')
+    for index, line in enumerate(lines):
+        if line:
+            await page.keyboard.insert_text(line)
+        if index < len(lines) - 1:
+            await page.keyboard.press("Shift+Enter")
+
+    send_button = await page.query_selector(WHATSAPP_SELECTORS['send_button'])
+    if not send_button:
+        raise ScriptedStepError("Send button not found")
+    await send_button.click()
+
+    # The message counts as sent once a new outgoing bubble shows up
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if len(await page.query_selector_all(WHATSAPP_SELECTORS['outgoing_message'])) > sent_before:
+            return True
+        await asyncio.sleep(0.25)
+    raise ScriptedStepError("Sent message bubble did not appear")
+
+
+async def run_action(page, step):
+    # EN: Dispatch a fast_path step from the list YAML to the matching scripted action
+    # ES: Envía un paso fast_path del YAML de la lista a la acción programada correspondiente
+    """Run one scripted step described by a fast_path dictionary"""
+    action = step.get('action')
+    timeout = step.get('timeout', 60)
+    if action == 'open_chat':
+        return await open_chat(page, step.get('phone'), timeout=timeout)
+    if action == 'send_message':
+        if step.get('wait_for') == 'delivered':
+            await wait_for_status(page, CONFIRMED, timeout=timeout)
+        return await send_message(page, step.get('text'), timeout=timeout)
+    raise ScriptedStepError(f"Unknown fast_path action: {action}")
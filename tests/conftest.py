@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# The runner's modules import each other by name from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import metrics  # noqa: E402
+from standins.simulated import VirtualClock, VirtualTimeLoop  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics(tmp_path, monkeypatch):
+    """Every test gets its own metrics registry writing under tmp_path"""
+    monkeypatch.setenv('METRICS_JSONL_PATH', str(tmp_path / 'metrics.jsonl'))
+    monkeypatch.setenv('METRICS_PROM_PATH', str(tmp_path / 'metrics.prom'))
+    monkeypatch.setattr(metrics, '_metrics', None)
+    yield
+    if metrics._metrics is not None:
+        metrics._metrics.close()
+
+
+
+@pytest.fixture
+def virtual_clock():
+    """The simulator's clock; pass it to pacing components and run coroutines with run_virtual"""
+    return VirtualClock(start=1_700_000_000.0)
+
+
+@pytest.fixture
+def run_virtual(virtual_clock):
+    """Run a coroutine on a VirtualTimeLoop, so its sleeps take no real time"""
+    def run(coroutine):
+        loop = VirtualTimeLoop(virtual_clock)
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+    return run
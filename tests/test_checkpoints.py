@@ -0,0 +1,84 @@
+import pytest
+
+from checkpoints import DONE, STARTED, CheckpointStore
+
+
+def navigate(phone='34600111222'):
+    return {'task': 'Open the chat', 'fast_path': {'action': 'open_chat', 'phone': phone}}
+
+
+def send(text):
+    return {'task': f"Send {text}", 'fast_path': {'action': 'send_message', 'text': text}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    checkpoints = CheckpointStore(path=str(tmp_path / 'checkpoints.sqlite3'))
+    yield checkpoints
+    checkpoints.close()
+
+
+def test_fresh_contact_runs_every_step(store):
+    steps = [navigate(), send('Hola'), send('¿Sigues interesado?')]
+    checkpoint = store.contact('list', 1, steps)
+    assert checkpoint.remaining() == steps
+    assert not checkpoint.resumed() and not checkpoint.all_sent()
+
+
+def test_resume_reopens_the_chat_and_skips_done_sends(store):
+    steps = [navigate(), send('Hola'), send('¿Sigues interesado?')]
+    checkpoint = store.contact('list', 1, steps)
+    checkpoint.begin(steps[0], steps[1])
+    checkpoint.complete(steps[0], steps[1])
+    checkpoint.begin(steps[2])
+
+    # A retry (here after a restart: a new store on the same file) starts where the last one stopped
+    reopened = CheckpointStore(path=store.path)
+    resumed = reopened.contact('list', 1, [navigate(), send('Hola'), send('¿Sigues interesado?')])
+    assert resumed.resumed()
+    assert resumed.remaining() == [resumed.steps[0], resumed.steps[2]]
+    assert resumed.state(resumed.steps[1]) == DONE and resumed.state(resumed.steps[2]) == STARTED
+    reopened.close()
+
+
+def test_changed_template_does_not_match_an_old_checkpoint(store):
+    checkpoint = store.contact('list', 1, [navigate(), send('Hola')])
+    checkpoint.complete(*checkpoint.steps)
+    changed = store.contact('list', 1, [navigate(), send('Hola, ¿qué tal?')])
+    assert changed.remaining() == changed.steps
+
+
+def test_only_started_sends_are_uncertain(store):
+    steps = [navigate(), send('Hola'), send('Adiós')]
+    checkpoint = store.contact('list', 1, steps)
+    checkpoint.begin(steps[0], steps[1])
+    assert not checkpoint.uncertain(steps[0])   # Navigation never sends
+    assert checkpoint.uncertain(steps[1])
+    assert not checkpoint.uncertain(steps[2])   # Not started yet
+    checkpoint.complete(steps[1])
+    assert not checkpoint.uncertain(steps[1])
+
+
+def test_occurrence_counts_earlier_sends_of_the_same_text(store):
+    steps = [navigate(), send('Hola'), send('Info'), send('Hola'), send('Hola')]
+    checkpoint = store.contact('list', 1, steps)
+    assert [checkpoint.occurrence(step) for step in steps[1:]] == [1, 1, 2, 3]
+
+
+def test_all_sent_needs_at_least_one_send(store):
+    assert not store.contact('list', 1, [navigate()]).all_sent()
+    assert not store.contact('list', 2, []).all_sent()
+
+    steps = [navigate(), send('Hola')]
+    checkpoint = store.contact('list', 3, steps)
+    checkpoint.complete(steps[1])
+    assert checkpoint.all_sent()
+    checkpoint.complete(steps[0])
+    assert checkpoint.remaining() == []
+
+
+def test_disabled_store_keeps_nothing():
+    checkpoints = CheckpointStore(path='')
+    steps = [navigate(), send('Hola')]
+    checkpoints.contact('list', 1, steps).complete(*steps)
+    assert checkpoints.contact('list', 1, steps).remaining() == steps
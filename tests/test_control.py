@@ -0,0 +1,79 @@
+import pytest
+
+from control import DRAINING, PAUSED, RUNNING, RunControl
+from pacing import Pacer
+
+TOKEN = 'secret-token'
+AUTH = {'authorization': f"Bearer {TOKEN}"}
+
+
+class Scheduler:
+    sources = []
+
+
+@pytest.fixture
+def control(virtual_clock):
+    pacer = Pacer(min_interval=60, max_interval=120, interactive=False, clock=virtual_clock)
+    return RunControl().attach(Scheduler(), {'main': pacer})
+
+
+def post(control, target, headers=AUTH):
+    return control.dispatch('POST', target, headers, TOKEN)
+
+
+def test_status_reports_state_and_pacing(control):
+    status, body = control.dispatch('GET', '/status', AUTH, TOKEN)
+    assert status == 200
+    assert body['state'] == RUNNING
+    assert body['pacing']['main']['min_interval'] == 60
+    assert body['workers'] is None
+
+
+def test_pause_and_resume(control):
+    assert post(control, '/pause') == (200, {'ok': True, 'state': PAUSED})
+    assert control.state == PAUSED
+    assert post(control, '/resume')[1]['state'] == RUNNING
+
+
+def test_wrong_method_and_unknown_command(control):
+    assert control.dispatch('POST', '/status', AUTH, TOKEN)[0] == 405
+    assert control.dispatch('GET', '/pause', AUTH, TOKEN)[0] == 405
+    status, body = post(control, '/explode')
+    assert status == 404 and 'pause' in body['commands']
+
+
+def test_token_is_required(control):
+    assert control.dispatch('GET', '/status', {}, TOKEN)[0] == 401
+    assert control.dispatch('GET', '/status', {'authorization': 'Bearer nope'}, TOKEN)[0] == 401
+    assert post(control, '/pause', {'authorization': TOKEN})[0] == 401
+    assert control.state == RUNNING
+
+
+def test_browser_requests_are_refused_even_with_the_token(control):
+    assert post(control, '/drain', {**AUTH, 'origin': 'https://example.com'})[0] == 403
+    assert control.state == RUNNING
+
+
+def test_pacing_changes_every_pacer_and_validates(control):
+    assert post(control, '/pacing?min=10&max=20&per_hour=30')[0] == 200
+    pacer = control.pacers['main']
+    assert (pacer.min_interval, pacer.max_interval) == (10, 20)
+    assert round(pacer.bucket.rate * 3600) == 30
+
+    for query in ('max=5&min=10', 'min=-1', 'min=abc', ''):
+        status, body = post(control, f"/pacing?{query}")
+        assert status == 400, query
+        assert body['error']
+
+
+def test_workers_only_resize_in_pool_mode(control):
+    status, body = post(control, '/workers?count=3')
+    assert status == 400 and 'worker-pool' in body['error']
+
+
+def test_drain_cuts_pacer_waits_short(control, monkeypatch):
+    skipped = []
+    monkeypatch.setattr(control.pacers['main'], 'skip', lambda: skipped.append('main'))
+    assert post(control, '/drain')[1]['state'] == DRAINING
+    assert skipped == ['main']
+    assert post(control, '/pause')[0] == 400  # Nothing resumes a draining run
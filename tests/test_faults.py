@@ -0,0 +1,54 @@
+import pytest
+import requests
+
+from faults import API, BROWSER, CONTACT, LLM, UNKNOWN, FaultTracker, classify_fault
+from llm import ProviderUnavailableError
+from templates import TemplateError
+from whatsapp import InvalidNumberError, ScriptedStepError
+
+
+def error_from(module, name='Error', base=Exception, **attributes):
+    """An exception whose class looks like it comes from another package (none of them is needed here)"""
+    return type(name, (base,), {'__module__': module, **attributes})('boom')
+
+
+class PaymentRequired(Exception):
+    status_code = 402
+
+
+@pytest.mark.parametrize('error, kind', [
+    (InvalidNumberError('number not on WhatsApp'), CONTACT),
+    (TemplateError('missing message'), CONTACT),
+    (requests.exceptions.ConnectionError('api down'), API),
+    (requests.exceptions.HTTPError('500'), API),
+    (error_from('playwright._impl._errors', 'TimeoutError'), BROWSER),
+    (error_from('browser_use.browser.context'), BROWSER),
+    (error_from('somewhere', 'TargetClosedError'), BROWSER),
+    (ScriptedStepError('composer not found'), BROWSER),
+    (error_from('openai', 'RateLimitError'), LLM),
+    (error_from('langchain_core.exceptions', 'OutputParserException'), LLM),
+    (PaymentRequired('balance'), LLM),
+    (ProviderUnavailableError('probe in flight'), LLM),
+    (error_from('simulator', fault_kind=API), API),
+    (ValueError('something else'), UNKNOWN),
+    (KeyError('id'), UNKNOWN),
+])
+def test_classify_fault(error, kind):
+    assert classify_fault(error) == kind
+
+
+def test_invalid_number_is_a_contact_fault_not_a_page_one():
+    # InvalidNumberError subclasses ScriptedStepError; skipping the contact must win over a tab reload
+    assert issubclass(InvalidNumberError, ScriptedStepError)
+    assert classify_fault(InvalidNumberError('+00')) == CONTACT
+
+
+def test_fault_tracker_counts_each_class_and_a_success_clears_all():
+    tracker = FaultTracker()
+    assert tracker.record(ScriptedStepError('a')) == (BROWSER, 1)
+    assert tracker.record(ScriptedStepError('b')) == (BROWSER, 2)
+    assert tracker.record(requests.exceptions.Timeout('c')) == (API, 1)
+    tracker.clear(API)
+    assert tracker.count(API) == 0 and tracker.count(BROWSER) == 2
+    tracker.clear()
+    assert tracker.count(BROWSER) == 0
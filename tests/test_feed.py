@@ -0,0 +1,219 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import feed as feed_module
+from feed import ClaimFeed, ContactFeed
+
+
+class FakeClaimAPI:
+    """Answers ClaimFeed._post like the claim protocol, with a server clock far from ours"""
+
+    def __init__(self, contacts, server_now=2_000_000_000.0, lease=60):
+        self.contacts = list(contacts)
+        self.server_now = server_now
+        self.lease = lease
+        self.renewable = None       # ids the next renew keeps (None: all)
+        self.calls = []
+        self.fail_with = None
+
+    def __call__(self, action, payload):
+        self.calls.append((action, payload))
+        if self.fail_with is not None:
+            raise self.fail_with
+        expiry = {'lease_expires': self.server_now + self.lease, 'now': self.server_now}
+        if action is None:
+            claimed, self.contacts = self.contacts[:payload['limit']], self.contacts[payload['limit']:]
+            return {'data': claimed, **expiry}
+        if action == 'renew':
+            kept = payload['ids'] if self.renewable is None else [i for i in payload['ids'] if i in self.renewable]
+            return {'renewed': kept, **expiry}
+        return {'released': payload['ids']}
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    """A monotonic clock for feed.py only (the event loop keeps the real one)"""
+    now = [100.0]
+    monkeypatch.setattr(feed_module, 'time', SimpleNamespace(monotonic=lambda: now[0], time=time.time))
+    return now
+
+
+def make_feed(api, **kwargs):
+    claim_feed = ClaimFeed('test-list', batch_size=2, lease_seconds=90, worker='runner-a',
+                           base_url='http://api.invalid', **kwargs)
+    claim_feed._post = api
+    return claim_feed
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_lease_deadline_uses_the_local_clock_not_the_server_one(monotonic):
+    api = FakeClaimAPI([{'id': 1}, {'id': 2}], lease=60)
+    claim_feed = make_feed(api)
+
+    async def scenario():
+        contacts = await claim_feed.pending()
+        claim_feed._renewer.cancel()
+        return contacts
+
+    assert [c['id'] for c in run(scenario())] == [1, 2]
+    # The server's lease_expires is in its own clock; only its length (60 s) counts
+    assert claim_feed._leases == {1: 160.0, 2: 160.0}
+
+
+def test_expired_lease_drops_the_contact(monotonic):
+    claim_feed = make_feed(FakeClaimAPI([{'id': 1}, {'id': 2}, {'id': 3}]))
+
+    async def scenario():
+        await claim_feed.pending()
+        claim_feed._renewer.cancel()
+        monotonic[0] += 61
+        return await claim_feed.pending()
+
+    # Both leases ran out, so the next batch is claimed instead
+    assert [c['id'] for c in run(scenario())] == [3]
+    assert 1 not in claim_feed._leases and 2 not in claim_feed._leases
+
+
+def test_renew_keeps_renewed_leases_and_loses_the_rest(monotonic):
+    api = FakeClaimAPI([{'id': 1}, {'id': 2}])
+    claim_feed = make_feed(api)
+
+    async def scenario():
+        await claim_feed.pending()
+        claim_feed._renewer.cancel()
+        monotonic[0] += 30
+        api.renewable = {1}
+        await claim_feed.renew()
+        return claim_feed.cached()
+
+    assert [c['id'] for c in run(scenario())] == [1]
+    assert claim_feed._leases == {1: 190.0}
+
+
+def test_finished_contacts_are_released_on_the_next_pass(monotonic):
+    api = FakeClaimAPI([{'id': 1}, {'id': 2}])
+    claim_feed = make_feed(api)
+
+    async def scenario():
+        contacts = await claim_feed.pending()
+        claim_feed._renewer.cancel()
+        claim_feed.mark_done(contacts[0])
+        await claim_feed.renew()
+
+    run(scenario())
+    assert ('release', {'ids': [1]}) in api.calls
+    assert ('renew', {'ids': [2], 'lease_seconds': 90}) in api.calls
+    assert not claim_feed._releases
+
+
+def test_failed_release_is_retried_and_does_not_block_renewal(monotonic):
+    api = FakeClaimAPI([{'id': 1}, {'id': 2}])
+    claim_feed = make_feed(api)
+    real_post = claim_feed._post
+
+    def flaky_release(action, payload):
+        if action == 'release':
+            raise requests.exceptions.ConnectionError('down')
+        return real_post(action, payload)
+
+    async def scenario():
+        contacts = await claim_feed.pending()
+        claim_feed._renewer.cancel()
+        claim_feed.reject(contacts[0])
+        claim_feed._post = flaky_release
+        await claim_feed.renew()
+
+    run(scenario())
+    assert claim_feed._releases == {1}
+    assert api.calls[-1][0] == 'renew'
+
+
+def test_renew_loop_survives_errors(monotonic):
+    api = FakeClaimAPI([{'id': 1}])
+    claim_feed = make_feed(api)
+    claim_feed.lease_seconds = 0.03
+
+    async def scenario():
+        await claim_feed.refresh()
+        api.fail_with = RuntimeError('The followups API does not support contact claims')
+        await asyncio.sleep(0.05)
+        api.fail_with = None
+        await asyncio.sleep(0.05)
+        alive = not claim_feed._renewer.done()
+        claim_feed._renewer.cancel()
+        return alive
+
+    assert run(scenario()) is True
+    assert [action for action, _ in api.calls].count('renew') >= 2
+
+
+def test_close_releases_everything_still_held(monotonic):
+    api = FakeClaimAPI([{'id': 1}, {'id': 2}])
+    claim_feed = make_feed(api)
+
+    async def scenario():
+        await claim_feed.pending()
+        await claim_feed.close()
+
+    run(scenario())
+    action, payload = api.calls[-1]
+    assert action == 'release' and sorted(payload['ids']) == [1, 2]
+    assert not claim_feed._leases
+
+
+class PagedAPI:
+    """The PENDING set of a list behind page/limit offsets; contacts leave it once processed"""
+
+    def __init__(self, count):
+        self.pending = [{'id': contact_id} for contact_id in range(1, count + 1)]
+        self.pages = []
+
+    def fetch(self, page=None, limit=3):
+        self.pages.append(page)
+        return 200, self.pending[(page - 1) * limit:page * limit]
+
+    def process(self, contact_feed, contact):
+        contact_feed.mark_done(contact)
+        self.pending.remove(contact)
+
+
+def make_paged_feed(api):
+    contact_feed = ContactFeed('test-list', page_size=3, base_url='http://api.invalid')
+    contact_feed._fetch = api.fetch
+    return contact_feed
+
+
+def test_paged_feed_does_not_skip_contacts_that_moved_up_a_page():
+    api = PagedAPI(7)
+    contact_feed = make_paged_feed(api)
+
+    async def scenario():
+        seen = []
+        while True:
+            contacts = await contact_feed.pending()
+            if not contacts:
+                return seen
+            seen.append(contacts[0]['id'])
+            api.process(contact_feed, contacts[0])
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_paged_feed_reads_past_a_page_of_rejected_contacts():
+    api = PagedAPI(5)
+    contact_feed = make_paged_feed(api)
+
+    async def scenario():
+        for contact in await contact_feed.pending():
+            contact_feed.reject(contact)  # Rejected contacts stay PENDING in the API
+        return await contact_feed.pending()
+
+    assert [contact['id'] for contact in asyncio.run(scenario())] == [4, 5]
+    assert api.pages == [1, 2]
@@ -0,0 +1,121 @@
+import pytest
+
+from llm import CircuitBreaker, ProviderRegistry, ProviderUnavailableError, classify_llm_error
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def cool_down(breaker):
+    """Move the breaker past its reset timeout without waiting"""
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_breaker_opens_after_the_failure_threshold():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allows_calls() and not breaker.acquire()
+
+
+def test_fatal_failure_opens_at_once():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure(fatal=True)
+    assert breaker.state == 'open'
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker()
+    breaker.record_failure(fatal=True)
+    cool_down(breaker)
+    assert breaker.state == 'half-open'
+    assert breaker.acquire() is True
+    assert breaker.probing
+    assert breaker.acquire() is False  # A second caller waits for the probe's result
+
+
+def test_probe_success_closes_and_failure_reopens():
+    breaker = CircuitBreaker()
+    breaker.record_failure(fatal=True)
+    cool_down(breaker)
+    breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+    breaker.record_failure(fatal=True)
+    cool_down(breaker)
+    breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.probing
+
+
+def test_released_or_stale_probe_lets_another_call_through():
+    breaker = CircuitBreaker(probe_timeout=120)
+    breaker.record_failure(fatal=True)
+    cool_down(breaker)
+    breaker.acquire()
+    breaker.release()
+    assert breaker.acquire() is True
+    breaker.probe_started -= 120
+    assert breaker.acquire() is True
+
+
+def test_classify_llm_error():
+    assert classify_llm_error(APIError(402)) == 'fatal'
+    assert classify_llm_error(APIError(429)) == 'transient'
+    assert classify_llm_error(APIError(503)) == 'transient'
+    assert classify_llm_error(TimeoutError()) == 'transient'
+    assert classify_llm_error(APIError(400)) is None
+    assert classify_llm_error(ValueError('bad output')) is None
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setenv('DEEPSEEK_API_KEY', 'test-deepseek')
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-openai')
+    providers = ProviderRegistry()
+    monkeypatch.setattr(providers, 'client', lambda provider, tier='fast': provider)
+    return providers
+
+
+def test_select_fails_over_to_the_next_provider(registry):
+    assert registry.select(acquire=True) == 'deepseek'
+    registry.record_error('deepseek', APIError(402))
+    assert registry.select(acquire=True) == 'openai'
+    assert registry.healthy() == ['openai']
+
+
+def test_unclassified_error_does_not_count_against_the_provider(registry):
+    registry.record_error('deepseek', ValueError('bad output'))
+    assert registry.breakers['deepseek'].failures == 0
+    assert registry.select(acquire=True) == 'deepseek'
+
+
+def test_select_refuses_while_the_only_recovering_provider_is_probed(registry):
+    for name in ('deepseek', 'openai'):
+        registry.record_error(name, APIError(402))
+        cool_down(registry.breakers[name])
+    registry.breakers['openai'].opened_at = None  # openai recovers, then fails again
+    registry.record_error('openai', APIError(402))
+
+    assert registry.select(acquire=True) == 'deepseek'  # deepseek's probe
+    with pytest.raises(ProviderUnavailableError):
+        registry.select(acquire=True)
+
+    registry.record_success('deepseek')
+    assert registry.select(acquire=True) == 'deepseek'
+
+
+def test_last_resort_pick_becomes_the_probe(registry):
+    registry.record_error('deepseek', APIError(402))
+    registry.record_error('openai', APIError(402))
+    assert registry.select(acquire=True) == 'deepseek'  # Opened first
+    with pytest.raises(ProviderUnavailableError) as error:
+        registry.select(acquire=True)
+    assert error.value.fault_kind == 'llm'
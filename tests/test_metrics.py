@@ -0,0 +1,45 @@
+import json
+
+from feed import ContactFeed
+from metrics import get_metrics
+
+
+class Response:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return {'data': self._data}
+
+
+def test_contact_feed_fetches_are_timed(monkeypatch):
+    contact_feed = ContactFeed('test-list', base_url='http://api.invalid')
+    responses = iter([Response(200, [{'id': 1}], {'ETag': '"v1"'}), Response(304)])
+    monkeypatch.setattr(contact_feed._session, 'get', lambda *args, **kwargs: next(responses))
+
+    contact_feed._fetch()
+    contact_feed._fetch()
+    metrics = get_metrics()
+    assert metrics.stage_summary()['fetch_contacts']['count'] == 2
+    assert metrics.total('feed_not_modified') == 1
+    assert 'stage="fetch_contacts",paged="False"' in metrics.render_prometheus()
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = get_metrics()
+    metrics.incr('admin_commands', command='say "hi"\\\nbye')
+    assert 'command="say \\"hi\\"\\\\\\nbye"' in metrics.render_prometheus()
+
+
+def test_jsonl_log_rotates_by_size(tmp_path):
+    metrics = get_metrics()
+    metrics.max_bytes = 200
+    for index in range(20):
+        metrics.emit({'type': 'test', 'index': index})
+        metrics.flush()
+    rotated = sorted(path.name for path in tmp_path.iterdir() if path.name.startswith('metrics.jsonl.'))
+    assert rotated == ['metrics.jsonl.1', 'metrics.jsonl.2', 'metrics.jsonl.3']
+    lines = (tmp_path / 'metrics.jsonl.1').read_text().splitlines()
+    assert all(json.loads(line)['type'] == 'test' for line in lines)
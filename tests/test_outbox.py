@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import outbox as outbox_module
+from outbox import BACKOFF_BASE, BACKOFF_MAX, StatusOutbox
+
+
+class Response:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = StatusOutbox(path=str(tmp_path / 'outbox.sqlite3'), base_url='http://api.invalid', batch_size=3)
+    yield box
+    box._session.close()
+    box._db.close()
+
+
+def rows(box):
+    return box._db.execute("SELECT contact_id, status, version, attempts, next_attempt_at, dead FROM outbox "
+                           "ORDER BY contact_id").fetchall()
+
+
+def test_updates_for_one_contact_collapse_into_the_latest(outbox):
+    outbox.enqueue(1, 'STARTED', 'first')
+    outbox.enqueue(1, 'COMPLETE', 'second')
+    assert outbox.pending_count() == 1
+    assert rows(outbox)[0][:3] == ('1', 'COMPLETE', 2)
+
+
+def test_failed_send_backs_off_exponentially(outbox, monkeypatch):
+    monkeypatch.setattr(outbox_module.random, 'uniform', lambda low, high: 1.0)
+    monkeypatch.setattr(outbox_module.time, 'time', lambda: 1000.0)
+    outbox.enqueue(7, 'COMPLETE', 'done')
+    row = outbox._due_rows()[0]
+
+    outbox._settle(row, *StatusOutbox._classify(Response(503)))
+    assert rows(outbox)[0][3:] == (1, 1000.0 + BACKOFF_BASE * 2, 0)
+
+    outbox._settle(outbox._due_rows(force=True)[0], *StatusOutbox._classify(Response(429)))
+    assert rows(outbox)[0][3:] == (2, 1000.0 + BACKOFF_BASE * 4, 0)
+
+    outbox._db.execute("UPDATE outbox SET attempts = 20")
+    outbox._settle(outbox._due_rows(force=True)[0], False, False, 'HTTP 503')
+    assert rows(outbox)[0][5] == 1  # Past max_attempts the update is parked as dead
+    assert rows(outbox)[0][4] == 1000.0 + BACKOFF_MAX
+
+
+def test_client_errors_are_permanent_but_429_is_retried():
+    assert StatusOutbox._classify(Response(200)) == (True, False, None)
+    assert StatusOutbox._classify(Response(404))[:2] == (False, True)
+    assert StatusOutbox._classify(Response(400, 'bad status'))[2] == 'HTTP 400: bad status'
+    assert StatusOutbox._classify(Response(429))[:2] == (False, False)
+    assert StatusOutbox._classify(Response(500))[:2] == (False, False)
+
+
+def test_update_that_arrives_while_sending_is_not_deleted(outbox):
+    outbox.enqueue(3, 'STARTED', 'first')
+    in_flight = outbox._due_rows()[0]
+    outbox.enqueue(3, 'COMPLETE', 'second')
+    outbox._settle(in_flight, True, False, None)
+    assert rows(outbox)[0][:3] == ('3', 'COMPLETE', 2)
+
+
+def test_forced_flush_sends_rows_sharing_a_timestamp_across_pages(outbox, monkeypatch):
+    for contact_id in range(8):
+        outbox.enqueue(contact_id, 'COMPLETE', 'done')
+    # Same updated_at for every row, and retries scheduled far in the future
+    outbox._db.execute("UPDATE outbox SET updated_at = 5, attempts = 1, next_attempt_at = 1e12")
+    sent = []
+    monkeypatch.setattr(outbox, '_send_one', lambda row: sent.append(row[0]) or (True, False, None))
+
+    assert asyncio.run(outbox.flush()) is True
+    assert sorted(sent, key=int) == [str(contact_id) for contact_id in range(8)]
+    assert outbox.pending_count() == 0
+
+
+def test_regular_drain_waits_for_the_retry_time(outbox, monkeypatch):
+    outbox.enqueue(1, 'COMPLETE', 'done')
+    outbox._db.execute("UPDATE outbox SET next_attempt_at = 1e12")
+    sent = []
+    monkeypatch.setattr(outbox, '_send_one', lambda row: sent.append(row[0]) or (True, False, None))
+
+    delay = asyncio.run(outbox._drain())
+    assert sent == []
+    assert delay > 0
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from pacing import BackoffPolicy, Pacer, TokenBucket
+
+
+class ManualClock:
+    """now()/sleep() like pacing.SystemClock, but sleeps advance the clock instead of taking time"""
+
+    def __init__(self, start=1_700_000_000.0):
+        self.time = start
+        self.slept = []
+
+    def now(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.time += seconds
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock():
+    return ManualClock()
+
+
+def test_token_bucket_allows_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate_per_hour=60, capacity=2, clock=clock)
+    assert bucket.seconds_until_available() == 0
+    bucket.take()
+    bucket.take()
+    assert bucket.seconds_until_available() == pytest.approx(60)
+
+    clock.advance(30)
+    assert bucket.seconds_until_available() == pytest.approx(30)
+    clock.advance(30)
+    assert bucket.seconds_until_available() == 0
+
+
+def test_token_bucket_never_refills_past_capacity(clock):
+    bucket = TokenBucket(rate_per_hour=3600, capacity=1, clock=clock)
+    clock.advance(3600)
+    bucket.take()
+    assert bucket.seconds_until_available() == pytest.approx(1)
+
+
+def test_backoff_linear_and_exponential_are_capped():
+    assert [BackoffPolicy(base=60, maximum=300).delay(n) for n in (1, 2, 5, 9)] == [60, 120, 300, 300]
+    assert [BackoffPolicy(base=2, maximum=30, kind='exponential').delay(n) for n in (1, 2, 3, 10)] == [2, 4, 8, 30]
+    with pytest.raises(ValueError):
+        BackoffPolicy(kind='random')
+
+
+def test_pacer_waits_the_jittered_gap_on_its_clock(clock):
+    pacer = Pacer(min_interval=60, max_interval=120, interactive=False, clock=clock)
+
+    async def scenario():
+        assert await pacer.wait_turn() == 0
+        pacer.record_send()
+        gap = pacer.seconds_until_ready()
+        started = clock.now()
+        await pacer.wait_turn()
+        return gap, clock.now() - started
+
+    gap, waited = asyncio.run(scenario())
+    assert 60 <= gap <= 120
+    assert waited == pytest.approx(gap)
+    assert pacer.seconds_until_ready() == 0
+
+
+def test_pacer_hourly_cap_outlasts_the_gap(clock):
+    pacer = Pacer(min_interval=1, max_interval=1, max_per_hour=4, interactive=False, clock=clock)
+    pacer.record_send()
+    assert pacer.seconds_until_ready() == pytest.approx(900)
+
+    pacer.set_max_per_hour(None)
+    assert pacer.seconds_until_ready() == pytest.approx(1)
+
+
+def test_pacer_skip_cuts_the_wait_short():
+    pacer = Pacer(interactive=False)
+
+    async def scenario():
+        waiter = asyncio.ensure_future(pacer.wait(600))
+        await asyncio.sleep(0.01)
+        pacer.skip()
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_pacer_cancelled_wait_leaves_no_tasks_behind():
+    pacer = Pacer(interactive=False)
+
+    async def scenario():
+        waiter = asyncio.ensure_future(pacer.wait(600))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(scenario()) == []
@@ -0,0 +1,81 @@
+from plans import PlanCache, fill, plan_key, templatize
+
+RECORDED = {'phone': '34600111222', 'message': 'Hola Ana, ¿sigues interesada en el curso?', 'language': 'es'}
+OTHER = {'phone': '525511223344', 'message': 'Hola Luis, ¿sigues interesado en el curso?', 'language': 'es'}
+
+
+def step(action, params, url='https://web.whatsapp.com/'):
+    return {
+        'model_output': {'current_state': {'next_goal': 'send'}, 'action': [{action: params}]},
+        'state': {'url': url, 'screenshot': 'base64-png'},
+        'result': [{'extracted_content': 'done'}],
+    }
+
+
+def history(*steps):
+    return {'history': list(steps)}
+
+
+def recorded_history():
+    return history(
+        step('go_to_url', {'url': f"https://web.whatsapp.com/send?phone={RECORDED['phone']}"}),
+        {'model_output': None, 'state': {}, 'result': [{'error': 'page not ready'}]},
+        step('input_text', {'index': 12, 'text': RECORDED['message']}),
+        step('click_element', {'index': 14}),
+    )
+
+
+def test_templatize_then_fill_replays_for_another_contact():
+    plan = templatize(recorded_history(), RECORDED)
+    assert plan is not None
+    assert len(plan['history']) == 3  # The failed step is dropped
+    assert all(item['state']['screenshot'] is None and item['result'] == [] for item in plan['history'])
+    assert RECORDED['phone'] not in str(plan) and RECORDED['message'] not in str(plan)
+
+    filled = fill(plan, OTHER)
+    actions = [item['model_output']['action'][0] for item in filled['history']]
+    assert actions[0]['go_to_url']['url'].endswith(OTHER['phone'])
+    assert actions[1]['input_text']['text'] == OTHER['message']
+
+
+def test_templatize_refuses_typed_text_that_is_not_a_variable():
+    leaky = history(step('input_text', {'index': 12, 'text': 'Hola Ana, te escribo de nuevo'}))
+    assert templatize(leaky, RECORDED) is None
+
+
+def test_templatize_refuses_urls_with_a_phone_it_cannot_replace():
+    leaky = history(step('go_to_url', {'url': 'https://web.whatsapp.com/send?phone=34699999999'}))
+    assert templatize(leaky, RECORDED) is None
+
+
+def test_short_values_are_not_substituted():
+    plan = templatize(history(step('send_keys', {'keys': 'Enter'}), step('click_element', {'index': 'es'})),
+                      {'language': 'es', 'message': 'Enter'})
+    assert plan['history'][1]['model_output']['action'][0]['click_element']['index'] == 'es'
+    assert plan['history'][0]['model_output']['action'][0]['send_keys']['keys'] == '[[plan:message]]'
+
+
+def test_fill_without_a_variable_returns_none():
+    plan = templatize(recorded_history(), RECORDED)
+    assert fill(plan, {'phone': OTHER['phone']}) is None
+
+
+def test_plan_key_needs_every_step_templated():
+    assert plan_key([{'template': 'a'}, {'template': 'b'}]) == plan_key([{'template': 'a'}, {'template': 'b'}])
+    assert plan_key([{'template': 'a'}, {'template': None}]) is None
+    assert plan_key([]) is None
+
+
+def test_plan_cache_round_trip(tmp_path):
+    cache = PlanCache(path=str(tmp_path / 'plans.sqlite3'))
+    try:
+        assert cache.record('key', 'chat-open', recorded_history(), RECORDED)
+        reopened = PlanCache(path=cache.path)
+        filled = reopened.lookup('key', 'chat-open', OTHER)
+        reopened.close()
+        assert filled['history'][1]['model_output']['action'][0]['input_text']['text'] == OTHER['message']
+
+        cache.invalidate('key', 'chat-open')
+        assert cache.lookup('key', 'chat-open', OTHER) is None
+    finally:
+        cache.close()
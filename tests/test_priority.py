@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from priority import NIGHT_FLOOR, UNKNOWN_VALUE, PriorityIndex, parse_priority
+
+# 22:00 UTC: 17:00 in New York (inside the 9-20 window), 23:00 in Madrid (outside it)
+NOW = datetime(2024, 1, 15, 22, 0, tzinfo=timezone.utc).timestamp()
+
+
+def contact(contact_id, phone=None, created=NOW, **fields):
+    return {'id': contact_id, 'phone': phone, 'created_at': created, **fields}
+
+
+def test_rank_orders_by_local_time_value():
+    index = PriorityIndex()
+    madrid = contact(1, '+34 600 000 000')
+    new_york = contact(2, '+1 305 555 0100')
+    unknown = contact(3)
+    assert [c['id'] for c in index.rank([madrid, unknown, new_york], now=NOW)] == [2, 3, 1]
+    assert index.score(new_york, NOW) == pytest.approx(1.0)
+    assert index.score(unknown, NOW) == pytest.approx(UNKNOWN_VALUE)
+    assert index.score(madrid, NOW) == pytest.approx(NIGHT_FLOOR)
+
+
+def test_rank_prefers_fresh_leads_and_keeps_api_order_on_ties():
+    index = PriorityIndex()
+    old = contact(1, '+1 305 555 0100', created=NOW - 14 * 86400)
+    fresh = contact(2, '+1 305 555 0101')
+    twin = contact(3, '+1 305 555 0102')
+    assert [c['id'] for c in index.rank([old, fresh, twin], now=NOW)] == [2, 3, 1]
+    assert index.score(old, NOW) == pytest.approx(0.75)  # One half-life: freshness 0.5
+
+
+def test_rank_drops_contacts_below_min_score():
+    index = PriorityIndex(parse_priority({'min_score': 0.2}))
+    madrid = contact(1, '+34 600 000 000')
+    new_york = contact(2, '+1 305 555 0100')
+    assert index.rank([madrid, new_york], now=NOW) == [new_york]
+
+
+def test_contact_without_a_message_in_its_language_scores_lower():
+    index = PriorityIndex(languages=['es'])
+    spanish = contact(1, '+1 305 555 0100', utmLanguage='es')
+    english = contact(2, '+1 305 555 0101', utmLanguage='en')
+    assert index.rank([english, spanish], now=NOW) == [spanish, english]
+
+
+def test_ranking_one_contact_keeps_the_others_features():
+    index = PriorityIndex()
+    contacts = [contact(contact_id, '+1 305 555 0100') for contact_id in range(5)]
+    index.rank(contacts, now=NOW)
+    index.rank(contacts[:1], now=NOW + 60)
+    assert set(index._features) == set(range(5))
+
+
+def test_features_of_contacts_gone_for_an_hour_are_pruned():
+    index = PriorityIndex()
+    contacts = [contact(contact_id, '+1 305 555 0100') for contact_id in range(5)]
+    index.rank(contacts, now=NOW)
+    index.rank(contacts[:2], now=NOW + 3600)
+    assert set(index._features) == set(range(5))  # Scored during the previous hour
+    index.rank(contacts[:2], now=NOW + 7200)
+    assert set(index._features) == {0, 1}
+
+
+@pytest.mark.parametrize('config', [
+    {'window': [20, 9]},
+    {'window': [9, 25]},
+    {'half_life_days': 0},
+    {'timezone': 'Nowhere/Atlantis'},
+    ['not', 'a', 'mapping'],
+])
+def test_parse_priority_rejects_bad_settings(config):
+    with pytest.raises(ValueError):
+        parse_priority(config)
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+import receipts as receipts_module
+from receipts import ReceiptWatcher
+
+
+class ChatList:
+    """The WhatsApp sidebar as chat_status reads it: a status icon per phone"""
+
+    def __init__(self):
+        self.icons = {}
+
+    async def evaluate(self, script, args=None):
+        return self.icons.get(args[0])
+
+
+class Agent:
+    def __init__(self):
+        self.page = ChatList()
+        self.closed = False
+
+    async def current_page(self):
+        return None if self.closed else self.page
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    sent = []
+    monkeypatch.setattr(receipts_module, 'update_contact', lambda contact_id, status, message: sent.append((contact_id, status)))
+    return sent
+
+
+@pytest.fixture
+def virtual_time(virtual_clock, run_virtual):
+    """Run a scenario on the virtual loop with time.time following it (receipt deadlines use time.time)"""
+    def run(coroutine):
+        virtual_clock.install()
+        try:
+            return run_virtual(coroutine)
+        finally:
+            virtual_clock.uninstall()
+    return run
+
+
+def contact(contact_id):
+    return {'id': contact_id, 'phone': f"+34 600 000 00{contact_id}"}
+
+
+def deliver(agent, contact_id, icon='msg-dblcheck'):
+    agent.page.icons[f"3460000000{contact_id}"] = icon
+
+
+@pytest.mark.parametrize('icon', ['msg-dblcheck', 'msg-dblcheck-ack'])
+def test_delivered_or_read_reports_complete(updates, virtual_time, icon):
+    agent = Agent()
+
+    async def scenario():
+        watcher = ReceiptWatcher(timeout=900, poll_interval=5)
+        watcher.watch(contact(1), agent)
+        await asyncio.sleep(30)
+        assert updates == []
+        deliver(agent, 1, icon)
+        await asyncio.sleep(6)
+        await watcher.close()
+
+    virtual_time(scenario())
+    assert updates == [(1, 'COMPLETE')]
+
+
+def test_missing_receipt_times_out_as_incomplete(updates, virtual_time):
+    agent = Agent()
+
+    async def scenario():
+        watcher = ReceiptWatcher(timeout=900, poll_interval=5)
+        watcher.watch(contact(1), agent)
+        agent.page.icons['34600000001'] = 'msg-check'
+        await asyncio.sleep(899)
+        assert updates == []
+        await asyncio.sleep(10)
+        assert updates == [(1, 'INCOMPLETE')]
+        await watcher.close()
+
+    virtual_time(scenario())
+
+
+def test_drain_and_close_settle_the_leftovers(updates, virtual_time):
+    first, second = Agent(), Agent()
+
+    async def scenario():
+        watcher = ReceiptWatcher(timeout=900, poll_interval=5)
+        watcher.watch(contact(1), first)
+        watcher.watch(contact(2), second)
+        await watcher.drain(first, timeout=20)
+        assert updates == [(1, 'INCOMPLETE')]
+        assert watcher.pending_count() == 1
+        deliver(second, 2)
+        await watcher.close()
+
+    virtual_time(scenario())
+    assert updates == [(1, 'INCOMPLETE'), (2, 'COMPLETE')]
+
+
+def test_retired_browser_closes_once_its_receipts_settle(updates, virtual_time):
+    agent, idle = Agent(), Agent()
+
+    async def scenario():
+        watcher = ReceiptWatcher(timeout=900, poll_interval=5)
+        watcher.watch(contact(1), agent)
+        await watcher.retire(agent)
+        await watcher.retire(idle)      # Nothing pending: closed right away
+        assert idle.closed and not agent.closed
+        deliver(agent, 1)
+        await asyncio.sleep(6)
+        assert agent.closed
+        await watcher.close()
+
+    virtual_time(scenario())
+    assert updates == [(1, 'COMPLETE')]
+
+
+def test_too_many_retired_browsers_drain_the_oldest(updates, virtual_time):
+    agents = [Agent() for _ in range(3)]
+
+    async def scenario():
+        watcher = ReceiptWatcher(timeout=900, poll_interval=5, max_retired=2)
+        for index, agent in enumerate(agents, start=1):
+            watcher.watch(contact(index), agent)
+            await watcher.retire(agent)
+        assert [agent.closed for agent in agents] == [True, False, False]
+        await watcher.close()
+
+    virtual_time(scenario())
+    assert updates[0] == (1, 'INCOMPLETE')
+    assert all(agent.closed for agent in agents)
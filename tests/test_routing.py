@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from routing import ModelRouter, parse_routing
+from templates import TemplateError, compile_list_config
+
+
+class Registry:
+    def __init__(self):
+        self.selected = []
+
+    def select(self, tier='fast', acquire=False):
+        self.selected.append((tier, acquire))
+        return f"{tier}-client"
+
+
+def agent(failed=False):
+    result = SimpleNamespace(error='element not found' if failed else None)
+    return SimpleNamespace(state=SimpleNamespace(last_result=[result]))
+
+
+ROUTING = {'default': 'fast', 'escalate_to': 'strong', 'escalate_after': 2}
+
+
+def test_parse_routing_defaults_and_validation():
+    assert parse_routing(None) is None
+    assert parse_routing({'default': 'fast'}) == {'default': 'fast', 'escalate_to': 'strong', 'escalate_after': 1}
+    for bad in ({'default': 'huge'}, {'escalate_to': 'tiny'}, {'escalate_after': 0}, ['fast']):
+        with pytest.raises(ValueError):
+            parse_routing(bad)
+
+
+def test_list_yaml_routing_and_task_tiers_are_validated():
+    config = {'agent': {'name': 'Flor', 'routing': {'default': 'fast'}, 'tasks': [{'task': 'a', 'tier': 'strong'}]}}
+    compiled = compile_list_config(config).compiled
+    assert compiled.routing['default'] == 'fast'
+    assert compiled.render_steps({'id': 1})[0]['tier'] == 'strong'
+    with pytest.raises(TemplateError):
+        compile_list_config({'agent': {'name': 'Flor', 'tasks': [{'task': 'a', 'tier': 'medium'}]}})
+    with pytest.raises(TemplateError):
+        compile_list_config({'agent': {'name': 'Flor', 'routing': {'escalate_after': 0}, 'tasks': []}})
+
+
+def test_segments_group_consecutive_tasks_by_tier():
+    router = ModelRouter(Registry(), ROUTING)
+    tasks = ['open', 'send', 'think', 'send again', 'check']
+    tiers = [None, None, 'strong', 'fast', None]
+    assert router.segments(tasks, tiers) == [('fast', ['open', 'send']), ('strong', ['think']),
+                                             ('fast', ['send again', 'check'])]
+    assert router.segments(['a', 'b']) == [('fast', ['a', 'b'])]
+
+
+def test_a_strong_default_is_never_lowered_by_a_task():
+    router = ModelRouter(Registry(), dict(ROUTING, default='strong'))
+    assert router.segments(['a', 'b'], ['fast', None]) == [('strong', ['a', 'b'])]
+
+
+def test_escalates_after_the_configured_failed_steps_and_carries_over():
+    router = ModelRouter(Registry(), ROUTING)
+    router.begin('fast')
+    assert router.next_tier(agent()) == 'fast'
+    assert router.next_tier(agent(failed=True)) == 'fast'
+    assert router.next_tier(agent(failed=True)) == 'strong'
+    router.begin('fast')  # The next segment of the same run stays escalated
+    assert router.tier == 'strong'
+
+
+def test_without_routing_failures_never_escalate():
+    router = ModelRouter(Registry())
+    for _ in range(5):
+        assert router.next_tier(agent(failed=True)) == 'fast'
+
+
+def test_install_routes_each_step_through_the_registry():
+    registry = Registry()
+    router = ModelRouter(registry, dict(ROUTING, escalate_after=1))
+    browser_agent = agent(failed=True)
+    calls = []
+
+    async def get_next_action(*args, **kwargs):
+        calls.append(browser_agent.llm)
+        return 'action'
+
+    browser_agent.get_next_action = get_next_action
+    router.begin('fast')
+    router.install(browser_agent)
+    assert asyncio.run(browser_agent.get_next_action()) == 'action'
+    assert calls == ['strong-client']
+    assert registry.selected == [('strong', True)]
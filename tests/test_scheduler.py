@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import FairScheduler, parse_list_specs
+
+
+class Feed:
+    def __init__(self, contacts):
+        self.contacts = contacts
+
+    async def pending(self):
+        return list(self.contacts)
+
+
+def source(name, weight=1, contacts=({'id': 1},)):
+    return SimpleNamespace(name=name, weight=weight, feed=Feed(list(contacts)), current=0, idle_until=0, served=0)
+
+
+def prepare(contacts, source):
+    return contacts, {contact['id']: [] for contact in contacts}
+
+
+def picks(scheduler, count):
+    async def scenario():
+        return [(await scheduler.next(prepare))[0].name for _ in range(count)]
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler_module, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_parse_list_specs():
+    assert parse_list_specs('4ga-lost') == [('4ga-lost', 1)]
+    assert parse_list_specs(['a:2,b', ' c:3 ']) == [('a', 2), ('b', 1), ('c', 3)]
+
+
+@pytest.mark.parametrize('value', ['a:x', 'a:0', 'a:-1', '', ' , '])
+def test_parse_list_specs_rejects_malformed_values(value):
+    with pytest.raises(ValueError):
+        parse_list_specs(value)
+
+
+def test_smooth_weighted_round_robin_interleaves(clock):
+    scheduler = FairScheduler([source('a', 3), source('b', 1)], idle_wait=300)
+    assert picks(scheduler, 8) == ['a', 'a', 'b', 'a'] * 2
+
+    scheduler = FairScheduler([source('a', 2), source('b', 1), source('c', 1)], idle_wait=300)
+    assert picks(scheduler, 8) == ['a', 'b', 'c', 'a'] * 2
+    assert [s.served for s in scheduler.sources] == [4, 2, 2]
+
+
+def test_empty_list_is_skipped_until_its_idle_wait_passes(clock):
+    empty = source('empty', 5, contacts=())
+    scheduler = FairScheduler([empty, source('b')], idle_wait=300)
+    assert picks(scheduler, 2) == ['b', 'b']
+    assert empty.idle_until == 1300.0
+    assert scheduler.seconds_until_ready() == 0  # b is never idle
+
+    empty.feed.contacts = [{'id': 9}]
+    clock[0] += 299
+    assert picks(scheduler, 1) == ['b']
+    clock[0] += 1
+    assert picks(scheduler, 1) == ['empty']
+
+
+def test_all_idle_returns_none_and_wake_resumes(clock):
+    lists = [source('a', contacts=()), source('b', contacts=())]
+    scheduler = FairScheduler(lists, idle_wait=60)
+    assert asyncio.run(scheduler.next(prepare)) is None
+    assert scheduler.seconds_until_ready() == 60
+
+    lists[1].feed.contacts = [{'id': 2}]
+    scheduler.wake('b')
+    assert picks(scheduler, 1) == ['b']
+    scheduler.wake()
+    assert lists[0].idle_until == 0
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+from faults import LLM
+from pacing import Pacer
+from standins.simulated import FaultModel
+
+
+def test_virtual_sleeps_take_no_real_time(virtual_clock, run_virtual):
+    async def scenario():
+        await asyncio.sleep(7 * 86400)
+        return virtual_clock.now()
+
+    started = time.monotonic()
+    assert run_virtual(scenario()) == pytest.approx(1_700_000_000.0 + 7 * 86400)
+    assert time.monotonic() - started < 5
+
+
+def test_installed_clock_drives_time_time(virtual_clock):
+    virtual_clock.install()
+    try:
+        virtual_clock.advance(3600)
+        assert time.time() == pytest.approx(1_700_003_600.0)
+    finally:
+        virtual_clock.uninstall()
+    assert time.time() != pytest.approx(1_700_003_600.0)
+
+
+def test_pacer_on_the_virtual_loop_waits_its_gap(virtual_clock, run_virtual):
+    pacer = Pacer(min_interval=300, max_interval=300, interactive=False, clock=virtual_clock)
+
+    async def scenario():
+        pacer.record_send()
+        await pacer.wait_turn()
+
+    run_virtual(scenario())
+    assert virtual_clock.elapsed == pytest.approx(300)
+
+
+def test_fault_model_is_reproducible_with_a_seed():
+    first, second = FaultModel(seed=7), FaultModel(seed=7)
+    assert first.plan_outages(0, 30 * 86400) == second.plan_outages(0, 30 * 86400)
+    assert [first.latency('send') for _ in range(5)] == [second.latency('send') for _ in range(5)]
+    for begin, end in first.outages[LLM]:
+        assert first.in_outage(LLM, begin) and not first.in_outage(LLM, end)
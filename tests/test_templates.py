@@ -0,0 +1,92 @@
+import pytest
+
+from templates import TemplateError, compile_list_config
+
+
+def list_config(messages=None, tasks=None, status_tasks=None):
+    return {
+        'agent': {'name': 'Flor', 'tasks': tasks if tasks is not None else [
+            {'task': "Open {{contact.phone}}", 'fast_path': {'action': 'open_chat', 'phone': '{{contact.phone}}'}},
+            {'task': "Send {{get_message('if_current_course_{course}_and_academy_{academy}', contact)}}"},
+        ]},
+        'status_tasks': status_tasks if status_tasks is not None else {'PENDING': [{
+            'type': 'message',
+            'key': 'if_current_course_{course}_and_academy_{academy}',
+            'fallback': 'if_current_course_{course}',
+        }]},
+        'messages': messages if messages is not None else {
+            'if_current_course_generic': {'en': "Hi {{contact.name}}, {agent_name} here", 'es': "Hola {{contact.name}}"},
+            'if_current_course_web_and_academy_miami': {'en': "Hi {{contact.name}}, web in Miami"},
+            'if_current_course_web': {'en': "Hi {{contact.name}}, about {course}"},
+        },
+    }
+
+
+def test_resolve_key_uses_the_academy_then_the_status_tasks_fallback():
+    compiled = compile_list_config(list_config()).compiled
+    template = 'if_current_course_{course}_and_academy_{academy}'
+    assert compiled.resolve_key(template, 'web', 'miami') == 'if_current_course_web_and_academy_miami'
+    assert compiled.resolve_key(template, 'web', 'madrid') == 'if_current_course_web'  # Declared fallback
+    assert compiled.resolve_key(template, 'web', '') == 'if_current_course_web'        # No academy
+    with pytest.raises(TemplateError):
+        compiled.resolve_key(template, 'data', 'miami')
+
+
+def test_render_steps_fills_contact_fields_messages_and_language():
+    compiled = compile_list_config(list_config()).compiled
+    contact = {'id': 1, 'phone': '+34600111222', 'course': 'web', 'academy': 'miami', 'name': 'Ana'}
+    steps = compiled.render_steps(contact)
+    assert steps[0]['task'] == 'Open +34600111222'
+    assert steps[0]['fast_path'] == {'action': 'open_chat', 'phone': '+34600111222'}
+    assert steps[1]['task'] == 'Send Hi Ana, web in Miami'
+
+    spanish = {'id': 2, 'phone': '1', 'utmLanguage': 'es', 'name': ''}
+    assert compiled.render_steps(spanish)[1]['task'] == 'Send Hola amigo'
+    english = {'id': 3, 'phone': '1', 'utmLanguage': 'fr'}  # No French version: English, default name
+    assert compiled.render_steps(english)[1]['task'] == 'Send Hi friend, Flor here'
+
+
+def test_validate_reports_every_unresolvable_combination():
+    config = list_config(messages={
+        'if_current_course_web_and_academy_miami': {'en': 'Miami'},
+        'if_current_course_data': {'es': 'Solo español'},
+    })
+    with pytest.raises(TemplateError) as error:
+        compile_list_config(config)
+    message = str(error.value)
+    assert "'if_current_course_data' has no 'en' version" in message
+    assert 'course=generic' in message and "'if_current_course_generic' not found" in message
+
+
+@pytest.mark.parametrize('text', [
+    "Hi {name}",                          # str.format-style field
+    "Hi {{contact.name}} from {academi}",  # Typo of a known variable
+    "Hi {{ contact_name }}",
+])
+def test_unknown_placeholders_are_rejected_at_compile_time(text):
+    config = list_config(messages={'if_current_course_generic': {'en': text}})
+    with pytest.raises(TemplateError, match='Unknown placeholder'):
+        compile_list_config(config)
+
+
+def test_get_message_inside_a_message_is_rejected():
+    config = list_config(messages={'if_current_course_generic': {'en': "{{get_message('other', contact)}}"}})
+    with pytest.raises(TemplateError, match='cannot be used inside a message'):
+        compile_list_config(config)
+
+
+def test_render_contacts_isolates_the_contact_that_fails():
+    config = list_config(
+        tasks=[{'task': "Send {{get_message('if_current_course_{course}', contact)}}"}],
+        status_tasks={},
+        messages={'if_current_course_generic': {'en': 'generic'}, 'if_current_course_web': {'en': 'web'}},
+    )
+    compiled = compile_list_config(config).compiled
+    rendered, errors = compiled.render_contacts([
+        {'id': 1, 'course': 'web'},
+        {'id': 2, 'course': 'unknown-course'},
+        {'id': 3},
+    ])
+    assert [steps[0]['task'] for steps in rendered.values()] == ['Send web', 'Send generic']
+    assert list(errors) == [2]
+    assert "if_current_course_unknown-course" in errors[2]